@@ -0,0 +1,72 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import gc
+import itertools
+from timeit import default_timer as timer
+
+
+class Benchmark(object):
+    '''
+    A named benchmark run once for every combination of its parameters.
+
+    setup_function is called with one combination of parameters as keyword
+    arguments and must return a tuple(run_function, items). Only
+    run_function() is timed, and items (eg the number of bars processed) is
+    used to compute a throughput. Setup runs again before every repeat, so
+    consumable objects like bar feeds can be rebuilt.
+    '''
+    def __init__(self, name, setup_function, params=None, unit='items', repeat=3):
+        self.__name = name
+        self.__setup_function = setup_function
+        self.__params = params or {}
+        self.__unit = unit
+        self.__repeat = repeat
+
+    def get_name(self):
+        return self.__name
+
+    def param_combinations(self, quick=False):
+        keys = sorted(self.__params.keys())
+        values = [self.__params[key] for key in keys]
+        if quick:
+            # only run the smallest size of every numeric parameter
+            values = [[min(x)] if all(isinstance(y, (int, long, float)) for y in x)
+                      else x for x in values]
+        for combination in itertools.product(*values):
+            yield dict(zip(keys, combination))
+
+    def run(self, quick=False):
+        for params in self.param_combinations(quick):
+            timings = []
+            items = 0
+            for i in xrange(self.__repeat):
+                run_function, items = self.__setup_function(**params)
+                gc.collect()
+                start = timer()
+                run_function()
+                timings.append(timer() - start)
+            best = min(timings)
+            yield {
+                'name': self.__name,
+                'params': params,
+                'unit': self.__unit,
+                'items': items,
+                'seconds': best,
+                'mean_seconds': sum(timings) / len(timings),
+                'items_per_second': items / best if best else None,
+                }
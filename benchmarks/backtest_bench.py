@@ -0,0 +1,152 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+from pytradelib import bar
+from pytradelib import broker
+from pytradelib import barfeed
+from pytradelib import strategy
+from pytradelib import technical
+from pytradelib import dataseries
+from pytradelib.broker import backtesting
+from pytradelib.data.providers import ProviderFactory
+from pytradelib.stratanalyzer import returns
+from pytradelib.stratanalyzer import sharpe
+from pytradelib.stratanalyzer import drawdown
+from pytradelib.stratanalyzer import trades
+
+from benchmarks import Benchmark
+from benchmarks import common
+
+
+def build_feed(symbol_bars):
+    feed = barfeed.BarFeed(bar.Frequency.DAY)
+    for symbol, bars in symbol_bars.iteritems():
+        feed.add_bars_from_sequence(symbol, bars)
+    return feed
+
+
+## --- bar parsing ----------------------------------------------------------
+def setup_parse_samples(copies):
+    provider = ProviderFactory.get_data_provider('yahoo')
+    symbol_rows = common.load_sample_rows().items() * copies
+    def run():
+        for symbol, rows in symbol_rows:
+            provider.rows_to_bars(symbol, rows, bar.Frequency.DAY, False)
+    return run, sum(len(rows) for symbol, rows in symbol_rows)
+
+def setup_parse_synthetic(bars):
+    provider = ProviderFactory.get_data_provider('yahoo')
+    rows = common.synthetic_rows(bars)
+    def run():
+        provider.rows_to_bars('sym', rows, bar.Frequency.DAY, False)
+    return run, len(rows)
+
+
+## --- bar feed merging -----------------------------------------------------
+def setup_feed_merge(symbols, bars):
+    feed = build_feed(common.universe_to_bars(
+        common.synthetic_universe(symbols, bars)))
+    def run():
+        feed.start()
+        while not feed.stop_dispatching():
+            feed.dispatch()
+    return run, symbols * bars
+
+
+## --- indicators -----------------------------------------------------------
+class SMA(technical.DataSeriesFilter):
+    def calculateValue(self, first_idx, last_idx):
+        values = self.get_data_series().get_values_absolute(first_idx, last_idx)
+        if values == None:
+            return None
+        return sum(values) / float(len(values))
+
+def setup_indicator_update(window, bars):
+    bar_list = common.rows_to_bars(common.synthetic_rows(bars))
+    def run():
+        bar_ds = dataseries.BarDataSeries()
+        sma = SMA(bar_ds.get_close_data_series(), window)
+        for bar_ in bar_list:
+            bar_ds.append_value(bar_)
+            sma[-1]
+    return run, bars
+
+
+## --- broker ---------------------------------------------------------------
+def setup_broker_orders(orders_per_bar, bars):
+    symbol_bars = common.universe_to_bars(common.synthetic_universe(1, bars))
+    symbol = symbol_bars.keys()[0]
+    feed = build_feed(symbol_bars)
+    broker_ = backtesting.Broker(10 ** 12, feed)
+    action = broker.Order.Action
+    def run():
+        feed.start()
+        i = 0
+        while not feed.stop_dispatching():
+            side = action.BUY if i % 2 == 0 else action.SELL
+            for j in xrange(orders_per_bar):
+                broker_.place_order(
+                    broker_.create_market_order(side, symbol, 1))
+            feed.dispatch()
+            i += 1
+    return run, orders_per_bar * bars
+
+
+## --- analyzers ------------------------------------------------------------
+class FlipFlopStrategy(strategy.Strategy):
+    # Alternates in and out of a long position in every symbol.
+    def __init__(self, feed):
+        strategy.Strategy.__init__(self, feed, 10 ** 9)
+        self.__positions = {}
+
+    def on_bars(self, bars):
+        for symbol in bars.get_symbols():
+            position = self.__positions.get(symbol, None)
+            if position == None:
+                self.__positions[symbol] = self.enter_long(symbol, 10, True)
+            elif position.entry_filled() and not position.exit_filled():
+                self.exit_position(position)
+            elif position.exit_filled():
+                self.__positions[symbol] = None
+
+def setup_analyzers(analyzers, symbols, bars):
+    feed = build_feed(common.universe_to_bars(
+        common.synthetic_universe(symbols, bars)))
+    strat = FlipFlopStrategy(feed)
+    if analyzers == 'all':
+        for analyzer in [returns.Returns(), sharpe.SharpeRatio(),
+                         drawdown.DrawDown(), trades.Trades()]:
+            strat.attach_analyzer(analyzer)
+    return strat.run, symbols * bars
+
+
+def getBenchmarks():
+    return [
+        Benchmark('parse_sample_csvs', setup_parse_samples,
+                  {'copies': [1, 10]}, 'bars'),
+        Benchmark('parse_synthetic_csv', setup_parse_synthetic,
+                  {'bars': [1000, 10000]}, 'bars'),
+        Benchmark('feed_merge', setup_feed_merge,
+                  {'symbols': [1, 10, 100], 'bars': [250, 2500]}, 'bars'),
+        Benchmark('indicator_update', setup_indicator_update,
+                  {'window': [20, 200], 'bars': [2500, 10000]}, 'bars'),
+        Benchmark('broker_orders', setup_broker_orders,
+                  {'orders_per_bar': [1, 10, 100], 'bars': [250, 2500]}, 'orders'),
+        Benchmark('strategy_analyzers', setup_analyzers,
+                  {'analyzers': ['none', 'all'], 'symbols': [1, 10],
+                   'bars': [250, 2500]}, 'bars'),
+        ]
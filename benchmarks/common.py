@@ -0,0 +1,83 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import os
+import glob
+import datetime
+
+from pytradelib import bar
+from pytradelib.data import synthetic
+
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'samples')
+
+def sample_csv_paths():
+    return sorted(glob.glob(os.path.join(SAMPLES_DIR, '*-yahoofinance.csv')))
+
+def sample_symbol(file_path):
+    return os.path.basename(file_path).split('-')[0]
+
+def load_sample_rows():
+    ''' Returns a dict of symbol: [csv rows], oldest first, without headers.
+    '''
+    ret = {}
+    for file_path in sample_csv_paths():
+        with open(file_path) as f:
+            rows = f.read().strip().split('\n')[1:]
+        if rows[0] > rows[-1]:
+            rows.reverse()
+        ret[sample_symbol(file_path)] = rows
+    return ret
+
+def synthetic_rows(bar_count, seed=0, start_date=None):
+    ''' Returns bar_count Yahoo-formatted daily csv rows (one per weekday from
+    start_date on) from a data.synthetic.Generator.
+    '''
+    if bar_count <= 0:
+        return []
+    start_date = start_date or datetime.date(2000, 1, 3)
+    end_date = start_date
+    weekdays = 0
+    while True:
+        if end_date.weekday() < 5:
+            weekdays += 1
+            if weekdays == bar_count:
+                break
+        end_date += datetime.timedelta(days=1)
+    generator = synthetic.Generator(seed=seed, start_date=start_date,
+        end_date=end_date, missing_day_probability=0)
+    return generator.generate_rows('sym', min_bars=bar_count)
+
+def synthetic_universe(symbol_count, bar_count, seed=0):
+    ''' Returns a dict of symbol: [csv rows] for symbol_count symbols.
+    '''
+    return dict(('sym%04i' % i, synthetic_rows(bar_count, seed + i))
+                for i in xrange(symbol_count))
+
+def rows_to_bars(rows):
+    ret = []
+    for row in rows:
+        row = row.split(',')
+        date_time = datetime.datetime.strptime(row[0], '%Y-%m-%d')
+        ret.append(bar.Bar(date_time, float(row[1]), float(row[2]),
+            float(row[3]), float(row[4]), float(row[5]), float(row[6])))
+    return ret
+
+def universe_to_bars(universe):
+    return dict((symbol, rows_to_bars(rows))
+                for symbol, rows in universe.iteritems())
@@ -0,0 +1,124 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+import os
+import shutil
+import tempfile
+
+from pytradelib import index as index_
+from pytradelib import settings
+from pytradelib.data import db
+from pytradelib.data import indexsnapshot
+from pytradelib.data import synthetic
+
+from benchmarks import Benchmark
+
+
+def save_index(db_, index):
+    with db_.transaction():
+        db_.insert_or_update_sectors(list(index['sectors']))
+        db_.insert_or_update_industries([dict(x) for x in index['industries']])
+        db_.insert_or_update_symbols([dict(x) for x in index['symbols']])
+
+
+## --- index refreshes ------------------------------------------------------
+def setup_index_refresh(existing, symbols):
+    # existing: 'empty' for a first refresh, 'full' to refresh a saved index
+    dir_ = tempfile.mkdtemp()
+    db_ = db.Database(os.path.join(dir_, 'bench.sqlite'))
+    index = synthetic.Generator(seed=0).get_index(symbols)
+    if existing == 'full':
+        save_index(db_, index)
+    def run():
+        try:
+            save_index(db_, index)
+            db_.set_symbol_updated([{'symbol_id': db_.get_symbol_id(x['symbol']),
+                                     'day': '2013-01-02 00:00:00'}
+                                    for x in index['symbols']])
+        finally:
+            shutil.rmtree(dir_)
+    return run, symbols
+
+
+## --- stats table scans ----------------------------------------------------
+def setup_stats_scan(row_type, symbols):
+    dir_ = tempfile.mkdtemp()
+    db_ = db.Database(os.path.join(dir_, 'bench.sqlite'))
+    index = synthetic.Generator(seed=0).get_index(symbols)
+    save_index(db_, index)
+    columns = db_.stats_columns[1:]
+    db_.insert_or_update_stats([dict([('symbol', x['symbol'])] +
+                                     [(column, i * 0.5) for column in columns])
+                                for i, x in enumerate(index['symbols'])])
+    def run():
+        try:
+            db_.get_stats(row_type=row_type)
+        finally:
+            shutil.rmtree(dir_)
+    return run, symbols
+
+
+## --- index.Factory startup ------------------------------------------------
+def setup_factory_startup(symbols):
+    data_dir = settings.DATA_DIR
+    settings.DATA_DIR = tempfile.mkdtemp()
+    db_ = db.Database()
+    save_index(db_, synthetic.Generator(seed=0).get_index(symbols))
+    db_.set_index_updated()
+    def run():
+        try:
+            index_.Factory()
+        finally:
+            shutil.rmtree(settings.DATA_DIR)
+            settings.DATA_DIR = data_dir
+    return run, symbols
+
+
+## --- loading the whole index ----------------------------------------------
+def setup_index_load(source, symbols):
+    # source: 'database' to query the index, 'snapshot' to load its snapshot
+    data_dir = settings.DATA_DIR
+    settings.DATA_DIR = tempfile.mkdtemp()
+    db_ = db.Database()
+    save_index(db_, synthetic.Generator(seed=0).get_index(symbols))
+    db_.set_index_updated()
+    if source == 'snapshot':
+        indexsnapshot.save(db_)
+    def run():
+        try:
+            factory = index_.Factory()
+            factory.symbols()
+            factory.get_industry('Industry 100').get_instruments()
+        finally:
+            shutil.rmtree(settings.DATA_DIR)
+            settings.DATA_DIR = data_dir
+    return run, symbols
+
+
+def getBenchmarks():
+    return [
+        Benchmark('index_refresh', setup_index_refresh,
+                  {'existing': ['empty', 'full'], 'symbols': [1000, 10000]},
+                  'symbols'),
+        Benchmark('stats_scan', setup_stats_scan,
+                  {'row_type': ['dict', 'tuple', 'numpy'],
+                   'symbols': [1000, 10000]}, 'symbols'),
+        Benchmark('factory_startup', setup_factory_startup,
+                  {'symbols': [1000, 10000]}, 'symbols'),
+        Benchmark('index_load', setup_index_load,
+                  {'source': ['database', 'snapshot'],
+                   'symbols': [1000, 10000]}, 'symbols'),
+        ]
@@ -0,0 +1,187 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import shutil
+import datetime
+import tempfile
+
+from collections import OrderedDict
+
+from pytradelib import settings
+from pytradelib import screener
+from pytradelib.data import containers
+from pytradelib.data import db
+from pytradelib.data import barcache
+from pytradelib.data import synthetic
+from pytradelib.data import historical
+
+from benchmarks import Benchmark
+
+
+def populate(store_format, symbols):
+    # returns a function restoring the settings (and removing the data)
+    data_dir, store = settings.DATA_DIR, settings.DATA_STORE_FORMAT
+    settings.DATA_DIR = tempfile.mkdtemp()
+    settings.DATA_STORE_FORMAT = store_format
+    synthetic.Generator(seed=0, start_date=datetime.date(2008, 1, 2)
+        ).populate(symbols, db=db.Database())
+    def restore():
+        shutil.rmtree(settings.DATA_DIR)
+        settings.DATA_DIR, settings.DATA_STORE_FORMAT = data_dir, store
+    return restore
+
+
+## --- 90 day cross sections of every symbol --------------------------------
+def setup_cross_section(store, symbols):
+    restore = populate(store, symbols)
+    reader = historical.Reader()
+    symbol_list = db.Database().get_symbols()
+    from_date_time = datetime.datetime.now() - datetime.timedelta(days=90)
+    def run():
+        try:
+            reader.get_cross_section(symbol_list, from_date_time=from_date_time,
+                                     fields=['high', 'low', 'close', 'volume'])
+        finally:
+            restore()
+    return run, symbols
+
+
+## --- vectorized 90 day screens of every symbol ----------------------------
+class SwingScreener(screener.StockScreener):
+    def screen_columns(self):
+        swing = screener.abs_((screener.Field('high') - screener.Field('low'))
+                              / screener.Field('low')) * 100
+        return OrderedDict([
+            ('MeanPercentChange', screener.mean(swing)),
+            ('MedianPercentChange', screener.median(swing)),
+            ('AverageVolume', screener.rolling_mean(screener.Field('volume'), 20)),
+            ])
+
+    def screen_filter(self):
+        return screener.Column('MedianPercentChange') > 1
+
+    def csv_sort_column(self):
+        return 'MeanPercentChange'
+
+def setup_screen(symbols):
+    restore = populate('Yahoo', symbols)
+    reader = historical.Reader()
+    instruments = [containers.Instrument(x, x, 'Sector', 'Industry', reader)
+                   for x in db.Database().get_symbols()]
+    def run():
+        try:
+            SwingScreener('bench', instruments).run()
+        finally:
+            restore()
+    return run, symbols
+
+
+## --- every symbol's bars as recarrays --------------------------------------
+def setup_recarrays(store, into, symbols):
+    # into: 'memory', or 'mmap' for memory-mapped .npy files
+    restore = populate(store, symbols)
+    reader = historical.Reader()
+    symbol_list = db.Database().get_symbols()
+    mmap_dir = tempfile.mkdtemp() if into == 'mmap' else None
+    def run():
+        try:
+            reader.get_recarrays(symbol_list, mmap_dir=mmap_dir)
+        finally:
+            restore()
+            if mmap_dir:
+                shutil.rmtree(mmap_dir)
+    return run, symbols
+
+
+## --- aligned panels of every field of every symbol ------------------------
+def setup_panel(store, fill, symbols):
+    # fill: 'none' to leave missing bars NaN, or 'ffill'
+    restore = populate(store, symbols)
+    reader = historical.Reader()
+    symbol_list = db.Database().get_symbols()
+    def run():
+        try:
+            reader.get_panel(symbol_list, fill=None if fill == 'none' else fill)
+        finally:
+            restore()
+    return run, symbols
+
+
+## --- every symbol's bars, read again by each of 5 backtests ---------------
+def setup_repeated_bars(store, cache, symbols):
+    # cache: 'on', or 'off' to parse the files every time
+    restore = populate(store, symbols)
+    cache_size = settings.HISTORY_CACHE_SIZE
+    settings.HISTORY_CACHE_SIZE = cache_size if cache == 'on' else 0
+    barcache.get_cache().clear()
+    reader = historical.Reader()
+    symbol_list = db.Database().get_symbols()
+    def run():
+        try:
+            for i in xrange(5):
+                reader.get_bars_dict(symbol_list)
+        finally:
+            restore()
+            settings.HISTORY_CACHE_SIZE = cache_size
+            barcache.get_cache().clear()
+    return run, symbols
+
+
+## --- every symbol's bars and recarrays, in a later run over the same data -
+def setup_later_run(load, parsed, symbols):
+    # load: 'bars' or 'recarrays'. parsed: 'on' to load parsed files saved by
+    # an earlier run, or 'off' to parse the csv files again
+    restore = populate('Yahoo', symbols)
+    parsed_cache, cache_size = settings.PARSED_CACHE, settings.HISTORY_CACHE_SIZE
+    settings.PARSED_CACHE = parsed == 'on'
+    settings.HISTORY_CACHE_SIZE = 0 # a new process starts without any
+    reader = historical.Reader()
+    symbol_list = db.Database().get_symbols()
+    reader.get_bars_dict(symbol_list) # the earlier run
+    def run():
+        try:
+            if load == 'bars':
+                reader.get_bars_dict(symbol_list)
+            else:
+                reader.get_recarrays(symbol_list)
+        finally:
+            restore()
+            settings.PARSED_CACHE = parsed_cache
+            settings.HISTORY_CACHE_SIZE = cache_size
+    return run, symbols
+
+
+def getBenchmarks():
+    return [
+        Benchmark('cross_section', setup_cross_section,
+                  {'store': ['Yahoo', 'SQLite'], 'symbols': [100, 300]},
+                  'symbols'),
+        Benchmark('vectorized_screen', setup_screen,
+                  {'symbols': [100, 300]}, 'symbols'),
+        Benchmark('recarrays', setup_recarrays,
+                  {'store': ['Yahoo', 'SQLite'], 'into': ['memory', 'mmap'],
+                   'symbols': [100, 300]}, 'symbols'),
+        Benchmark('panel', setup_panel,
+                  {'store': ['Yahoo', 'SQLite'], 'fill': ['none', 'ffill'],
+                   'symbols': [100, 300]}, 'symbols'),
+        Benchmark('repeated_bars', setup_repeated_bars,
+                  {'store': ['Yahoo', 'SQLite'], 'cache': ['on', 'off'],
+                   'symbols': [20, 100]}, 'symbols'),
+        Benchmark('later_run', setup_later_run,
+                  {'load': ['bars', 'recarrays'], 'parsed': ['on', 'off'],
+                   'symbols': [100, 300]}, 'symbols'),
+        ]
@@ -0,0 +1,46 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+import os
+import sys
+import subprocess
+
+from benchmarks import Benchmark
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+## --- package imports ------------------------------------------------------
+def setup_import(module):
+    # imports module in a fresh interpreter ('sys' measures the startup alone)
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT_DIR] + [x for x in [env.get('PYTHONPATH')] if x])
+    def run():
+        subprocess.check_call([sys.executable, '-c', 'import %s' % module],
+                              env=env)
+    return run, 1
+
+
+def getBenchmarks():
+    return [
+        Benchmark('import', setup_import,
+                  {'module': ['sys',
+                              'pytradelib.strategy',
+                              'pytradelib.barfeed.instrumentfeed',
+                              'pytradelib.screener']}, 'imports', repeat=5),
+        ]
@@ -0,0 +1,87 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import pickle
+import logging
+
+from pytradelib.optimizer import server
+
+from benchmarks import Benchmark
+from benchmarks import common
+from benchmarks.backtest_bench import build_feed
+from benchmarks.backtest_bench import FlipFlopStrategy
+
+logger = logging.getLogger('benchmarks.optimizer')
+logger.setLevel(logging.ERROR)
+
+
+def setup_job_dispatch(parameters):
+    '''
+    Measures the server side of the optimizer: handing out parameter batches
+    and collecting results, with the same pickling the XML-RPC calls use. The
+    server is called in-process so that network noise stays out of it.
+    '''
+    srv = server.Server('localhost', 0, False)
+    srv.set_logger(logger)
+    def run():
+        srv.set_strategy_parameters(xrange(parameters))
+        while True:
+            job = pickle.loads(srv.get_next_job())
+            if job == None:
+                break
+            # workers push the best result of each job once
+            best = None
+            params = job.get_next_parameters()
+            while params != None:
+                best = max(best, params)
+                params = job.get_next_parameters()
+            srv.push_job_results(pickle.dumps(job.get_id()),
+                pickle.dumps(float(best)), pickle.dumps(best))
+        srv.server_close()
+    return run, parameters
+
+def setup_strategy_jobs(jobs, bars):
+    '''
+    Measures what a worker does for each job: build a feed from already
+    parsed bars and run a strategy over it.
+    '''
+    symbol_bars = common.universe_to_bars(common.synthetic_universe(1, bars))
+    def run():
+        for i in xrange(jobs):
+            FlipFlopStrategy(build_feed(symbol_bars)).run()
+    return run, jobs
+
+def setup_bars_pickling(symbols, bars):
+    # The server pickles every bar once, and each worker unpickles them all.
+    feed = build_feed(common.universe_to_bars(
+        common.synthetic_universe(symbols, bars)))
+    feed.start()
+    loaded_bars = [x for x in feed]
+    def run():
+        pickle.loads(pickle.dumps((feed.keys(), loaded_bars)))
+    return run, symbols * bars
+
+
+def getBenchmarks():
+    return [
+        Benchmark('optimizer_job_dispatch', setup_job_dispatch,
+                  {'parameters': [1000, 10000]}, 'jobs'),
+        Benchmark('optimizer_strategy_jobs', setup_strategy_jobs,
+                  {'jobs': [10, 100], 'bars': [250, 2500]}, 'jobs'),
+        Benchmark('optimizer_bars_pickling', setup_bars_pickling,
+                  {'symbols': [1, 10], 'bars': [250, 2500]}, 'bars'),
+        ]
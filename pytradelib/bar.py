@@ -90,6 +90,12 @@ class Bar(object):
         if errors:
             raise AssertionError('\n'.join(errors))
 
+    def copy(self):
+        """Returns a copy of the bar (without checking its prices again)."""
+        ret = self.__class__.__new__(self.__class__)
+        ret.__dict__.update(self.__dict__)
+        return ret
+
     def get_date_time(self):
         """Returns the :class:`datetime.datetime`."""
         return self.__date_time
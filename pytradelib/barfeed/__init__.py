@@ -41,6 +41,12 @@ class DateRangeFilter(Filter):
         self.__from_date = from_date
         self.__to_date = to_date
 
+    def get_from_date(self):
+        return self.__from_date
+
+    def get_to_date(self):
+        return self.__to_date
+
     def include_bar(self, bar_):
         if self.__to_date and bar_.get_date_time() > self.__to_date:
             return False
@@ -88,6 +94,11 @@ def session_close(current_bar, next_bar):
 
 # Sets session close and bars till session close properties to bars in a sequence. 
 def set_session_close_attributes(bar_seq, session_close_strategy=None):
+    # Clear whatever an earlier sequence the bars were in set.
+    for bar_ in bar_seq:
+        bar_.set_session_close(False)
+        bar_.set_bars_until_session_close(None)
+
     for i in xrange(1, len(bar_seq)):
         if session_close(bar_seq[i-1], bar_seq[i]):
             bar_seq[i-1].set_session_close(True)
@@ -119,6 +130,7 @@ class BarFeed(object):
         self.__bars_left = 0
         self.__next_bar_idx = {}
         self.__prev_date_time = None
+        self.__current_bars = None
         self.__new_bars_event = observer.Event()
 
     def get_frequency(self):
@@ -189,6 +201,19 @@ class BarFeed(object):
     def get_bars_left(self):
         return self.__bars_left
 
+    def get_current_bars(self):
+        """Returns the current :class:`pytradelib.bar.Bars`, or None if no
+        bars were dispatched yet."""
+        return self.__current_bars
+
+    def get_last_bar(self, symbol):
+        """Returns the last :class:`pytradelib.bar.Bar` dispatched for the
+        given symbol, or None."""
+        ds = self.__ds[symbol]
+        if len(ds):
+            return ds[-1]
+        return None
+
     # Dispatch events.
     def dispatch(self):
         bars = self.get_next_bars()
@@ -228,6 +253,7 @@ class BarFeed(object):
                 "%s and current datetime is %s" % (
                     self.__prev_date_time, ret.get_date_time()))
         self.__prev_date_time = ret.get_date_time()
+        self.__current_bars = ret
         return ret
 
     def fetch_next_bars(self):
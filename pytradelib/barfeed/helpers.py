@@ -30,6 +30,11 @@ def session_close(current_bar, next_bar):
 
 # Sets session close and bars till session close properties to bars in a sequence. 
 def set_session_close_attributes(bar_seq, session_close_strategy=None):
+    # Clear whatever an earlier sequence the bars were in set.
+    for bar_ in bar_seq:
+        bar_.set_session_close(False)
+        bar_.set_bars_until_session_close(None)
+
     for i in xrange(1, len(bar_seq)):
         if session_close(bar_seq[i-1], bar_seq[i]):
             bar_seq[i-1].set_session_close(True)
@@ -1,6 +1,6 @@
 from pytradelib import bar
 from pytradelib import barfeed
-from pytradelib import historical
+from pytradelib.data import historical
 
 
 class Feed(barfeed.BarFeed):
@@ -25,7 +25,8 @@ class Feed(barfeed.BarFeed):
 
     def add_bars_from_symbols(self, symbols):
         self._historical_reader.set_bar_filter(self._bar_filter)
-        symbol_bars = self._historical_reader.get_bars_dict(symbols)
+        symbol_bars = self._historical_reader.get_bars_dict(symbols,
+                                                            self.get_frequency())
         for symbol, bars in symbol_bars.items():
             self.add_bars_from_sequence(symbol, bars)
 
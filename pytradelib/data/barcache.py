@@ -0,0 +1,180 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import bisect
+from collections import OrderedDict
+
+from pytradelib import barfeed
+from pytradelib import settings
+
+
+'''
+A process-wide, memory bounded LRU cache of parsed symbol histories, so that
+instruments, bar feeds and strategies asking for the same symbol's bars again
+don't re-read and re-parse its file:
+
+    cache = get_cache()
+    history = cache.get(key, version) # None on a miss
+    if history is None:
+        history = History(bars)
+        cache.put(key, version, history, history.get_size())
+    bars = history.get_bars(from_date_time, to_date_time, bar_filter)
+
+historical.Reader keys the histories by (store, symbol, frequency) and
+versions them with the store's data version of the symbol (for files, their
+path and mtime), so a history is only ever returned while its file hasn't
+changed. Date ranges and bar filters slice the cached bars instead of parsing
+them again. Callers get copies of the cached bar.Bars (bar feeds set their
+session close attributes), so the cached ones always stay as parsed.
+
+The cache holds at most settings.HISTORY_CACHE_SIZE (approximate) bytes of
+bars, evicting the least recently used histories first.
+'''
+
+BAR_SIZE = 1300 # approximate bytes of memory taken by a bar.Bar (and its values)
+
+
+class History(object):
+    ''' A symbol's parsed bars (oldest first).
+    '''
+    def __init__(self, bars):
+        self.__bars = bars
+        self.__date_times = [x.get_date_time() for x in bars]
+
+    def __len__(self):
+        return len(self.__bars)
+
+    def get_size(self):
+        return len(self.__bars) * BAR_SIZE
+
+    def get_bars(self, from_date_time=None, to_date_time=None, bar_filter=None):
+        ''' Returns a new list of copies of the bars with from_date_time <=
+        date time <= to_date_time (either can be None) that bar_filter includes.
+        '''
+        if isinstance(bar_filter, barfeed.DateRangeFilter):
+            # the bars are sorted, so date ranges are just slices
+            if bar_filter.get_from_date():
+                from_date_time = max(from_date_time or bar_filter.get_from_date(),
+                                     bar_filter.get_from_date())
+            if bar_filter.get_to_date():
+                to_date_time = min(to_date_time or bar_filter.get_to_date(),
+                                   bar_filter.get_to_date())
+            if type(bar_filter) == barfeed.DateRangeFilter:
+                bar_filter = None
+        start = 0
+        if from_date_time:
+            start = bisect.bisect_left(self.__date_times, from_date_time)
+        end = len(self.__bars)
+        if to_date_time:
+            end = bisect.bisect_right(self.__date_times, to_date_time)
+        if bar_filter is None:
+            return [x.copy() for x in self.__bars[start:end]]
+        return [x.copy() for x in self.__bars[start:end]
+                if bar_filter.include_bar(x)]
+
+
+class LRUCache(object):
+    ''' Holds values of a given size, up to max_size in total, evicting the
+    least recently used ones first. Every value has a version: getting a
+    key with a different version than the one stored is a miss.
+    '''
+    def __init__(self, max_size):
+        self.__max_size = max_size
+        self.__entries = OrderedDict() # key: (version, value, size), oldest first
+        self.__size = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    def get_max_size(self):
+        return self.__max_size
+
+    def set_max_size(self, max_size):
+        self.__max_size = max_size
+        self.__evict()
+
+    def get_size(self):
+        return self.__size
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key, version):
+        ''' Returns the value stored for key and version, or None.
+        '''
+        entry = self.__entries.pop(key, None)
+        if entry is None or entry[0] != version:
+            if entry is not None:
+                self.__size -= entry[2] # stale
+            self.__misses += 1
+            return None
+        self.__entries[key] = entry # now the most recently used
+        self.__hits += 1
+        return entry[1]
+
+    def put(self, key, version, value, size):
+        self.discard(key)
+        if size > self.__max_size:
+            return
+        self.__entries[key] = (version, value, size)
+        self.__size += size
+        self.__evict()
+
+    def discard(self, key):
+        entry = self.__entries.pop(key, None)
+        if entry is not None:
+            self.__size -= entry[2]
+
+    def clear(self):
+        ''' Removes every value and resets the counters.
+        '''
+        self.__entries.clear()
+        self.__size = 0
+        self.__hits = self.__misses = self.__evictions = 0
+
+    def __evict(self):
+        while self.__size > self.__max_size:
+            key, entry = self.__entries.popitem(last=False)
+            self.__size -= entry[2]
+            self.__evictions += 1
+
+    def get_stats(self):
+        ''' Returns a dict with the keys: hits, misses, evictions, entries,
+        size and max_size (in bytes).
+        '''
+        return {
+            'hits': self.__hits,
+            'misses': self.__misses,
+            'evictions': self.__evictions,
+            'entries': len(self.__entries),
+            'size': self.__size,
+            'max_size': self.__max_size,
+            }
+
+
+_cache = None
+
+def get_cache():
+    ''' Returns the process-wide history cache, sized to
+    settings.HISTORY_CACHE_SIZE.
+    '''
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(settings.HISTORY_CACHE_SIZE)
+    elif _cache.get_max_size() != settings.HISTORY_CACHE_SIZE:
+        _cache.set_max_size(settings.HISTORY_CACHE_SIZE)
+    return _cache
@@ -0,0 +1,224 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import zlib
+import gzip
+import struct
+import StringIO
+
+try: import simplejson as json
+except: import json
+
+
+'''
+A chunked container for compressed csv files: the rows are stored in
+independently compressed blocks, followed by a small index of the blocks and a
+fixed size trailer pointing at the index:
+
+    | magic | block 0 | block 1 | ... | block n | index (json) | trailer |
+
+The index holds the csv header and, for every block, its offset, compressed
+length, row count and the first and last row's date time (the first column).
+Rows are assumed to be sorted, relying on string sorting for date comparisons
+like the rest of the data store. Appending rows only compresses the new rows
+(plus, once in a while, a run of small trailing blocks gets merged into one),
+and reads can decompress every block in turn or just the blocks overlapping a
+date range.
+
+Files stored before the container existed (a single lz4 or gzip stream) can
+still be read, and get converted to containers the first time they're updated.
+'''
+
+MAGIC = 'PTLC'
+VERSION = 1
+BLOCK_ROWS = 2048 # target number of rows per block
+MAX_SMALL_BLOCKS = 32 # max trailing blocks smaller than BLOCK_ROWS before merging
+
+_HEADER = struct.Struct('<4sBBxx') # magic, version, codec id
+_TRAILER = struct.Struct('<QI4s') # index offset, index length, magic
+
+_CODEC_IDS = {'lz4': 1, 'gz': 2}
+_CODEC_NAMES = dict((v, k) for k, v in _CODEC_IDS.items())
+
+
+def _compress(data, codec):
+    if codec == 'lz4':
+        import lz4
+        return lz4.dumps(data)
+    return zlib.compress(data, 6)
+
+def _decompress(data, codec):
+    if codec == 'lz4':
+        import lz4
+        return lz4.loads(data)
+    return zlib.decompress(data)
+
+def _key(row):
+    return row.split(',', 1)[0]
+
+
+class Index(object):
+    ''' The csv header and block list of a container file.
+    '''
+    def __init__(self, codec, header, blocks=None, offset=None):
+        self.codec = codec
+        self.header = header
+        self.blocks = blocks or [] # [offset, length, rows, first_key, last_key]
+        self.offset = offset # where the index starts (ie the end of the last block)
+
+    def get_row_count(self):
+        return sum(block[2] for block in self.blocks)
+
+    def get_first_key(self):
+        return self.blocks[0][3] if self.blocks else None
+
+    def get_last_key(self):
+        return self.blocks[-1][4] if self.blocks else None
+
+    def to_json(self):
+        return json.dumps({'header': self.header, 'blocks': self.blocks})
+
+
+def is_chunked(f):
+    ''' Returns True if f is a container file (f's position is left at 0).
+    '''
+    f.seek(0)
+    magic = f.read(len(MAGIC))
+    f.seek(0)
+    return magic == MAGIC
+
+def read_index(f):
+    f.seek(0)
+    magic, version, codec_id = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC:
+        raise IOError('%s is not a chunked container file' % f.name)
+    if version > VERSION:
+        raise IOError('%s is a newer (v%i) container file' % (f.name, version))
+    f.seek(-_TRAILER.size, 2)
+    index_offset, index_length, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+    if magic != MAGIC:
+        raise IOError('%s is truncated: its trailer is missing' % f.name)
+    f.seek(index_offset)
+    data = json.loads(f.read(index_length))
+    return Index(_CODEC_NAMES[codec_id], str(data['header']),
+                 [[x[0], x[1], x[2], str(x[3]), str(x[4])] for x in data['blocks']],
+                 index_offset)
+
+def read_block(f, index, block):
+    ''' Returns the list of rows stored in block.
+    '''
+    f.seek(block[0])
+    data = _decompress(f.read(block[1]), index.codec)
+    return data.split('\n')[:-1]
+
+def read_rows(f, from_key=None, to_key=None):
+    ''' Returns tuple(header, rows) for the rows with from_key <= key <= to_key
+    (either can be None). Only the blocks overlapping the range get read.
+    '''
+    index = read_index(f)
+    rows = []
+    for block in index.blocks:
+        if (from_key and block[4] < from_key) or (to_key and block[3] > to_key):
+            continue
+        block_rows = read_block(f, index, block)
+        if (from_key and block[3] < from_key) or (to_key and block[4] > to_key):
+            block_rows = [row for row in block_rows
+                          if (not from_key or _key(row) >= from_key)
+                          and (not to_key or _key(row) <= to_key)]
+        rows.extend(block_rows)
+    return index.header, rows
+
+def read(f, codec=None):
+    ''' Returns the csv text (with its header) of a container file or of a
+    file compressed as a single codec stream.
+    '''
+    if is_chunked(f):
+        header, rows = read_rows(f)
+        rows.insert(0, header)
+        return '%s\n' % '\n'.join(rows)
+    return read_legacy(f, codec)
+
+def read_legacy(f, codec):
+    f.seek(0)
+    data = f.read()
+    if not data:
+        return data
+    if codec == 'lz4':
+        return _decompress(data, codec)
+    return gzip.GzipFile(fileobj=StringIO.StringIO(data)).read()
+
+def get_last_key(f, codec=None):
+    ''' Returns the date time (as stored) of the most recent row, without
+    decompressing anything for container files.
+    '''
+    if is_chunked(f):
+        return read_index(f).get_last_key()
+    rows = read(f, codec).strip().split('\n')
+    return _key(rows[-1]) if len(rows) > 1 else None
+
+def write(f, codec, header, rows):
+    ''' Writes a new container file with the header and rows to f.
+    '''
+    f.seek(0)
+    f.truncate()
+    f.write(_HEADER.pack(MAGIC, VERSION, _CODEC_IDS[codec]))
+    index = Index(codec, header)
+    _write_blocks(f, index, rows, _HEADER.size)
+
+def append(f, codec, rows):
+    ''' Appends rows (that must sort after the stored rows) to f, compressing
+    only the new rows. Files that aren't containers yet get converted.
+    '''
+    if not is_chunked(f):
+        existing = read_legacy(f, codec).strip().split('\n')
+        return write(f, codec, existing[0], existing[1:] + list(rows))
+    if not rows:
+        return
+    index = read_index(f)
+
+    # merge the trailing run of small blocks once it adds up to a full block
+    # (or gets too long), so small (daily) appends don't fragment the file
+    small = 0
+    rows_in_small = len(rows)
+    while small < len(index.blocks) and index.blocks[-1 - small][2] < BLOCK_ROWS:
+        rows_in_small += index.blocks[-1 - small][2]
+        small += 1
+    offset = index.offset
+    if small > 1 and (rows_in_small >= BLOCK_ROWS or small >= MAX_SMALL_BLOCKS):
+        merged = []
+        for block in index.blocks[-small:]:
+            merged.extend(read_block(f, index, block))
+        rows = merged + list(rows)
+        offset = index.blocks[-small][0]
+        del index.blocks[-small:]
+    _write_blocks(f, index, rows, offset)
+
+def _write_blocks(f, index, rows, offset):
+    # writes rows as blocks starting at offset, followed by the index and trailer
+    f.seek(offset)
+    f.truncate()
+    for i in xrange(0, len(rows), BLOCK_ROWS):
+        block_rows = rows[i:i + BLOCK_ROWS]
+        data = _compress('%s\n' % '\n'.join(block_rows), index.codec)
+        f.write(data)
+        index.blocks.append([offset, len(data), len(block_rows),
+                             _key(block_rows[0]), _key(block_rows[-1])])
+        offset += len(data)
+    index.offset = offset
+    index_data = index.to_json()
+    f.write(index_data)
+    f.write(_TRAILER.pack(offset, len(index_data), MAGIC))
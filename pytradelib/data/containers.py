@@ -41,7 +41,7 @@ class Instrument(object):
             'Industry': industry,
             'Sector': sector,
             }
-        self.__bar_ds = None
+        self.__bar_ds = {} # frequency: the unfiltered BarDataSeries
 
     def data_folder(self):
         # FIXME: pull from __historical_reader
@@ -97,12 +97,16 @@ class Instrument(object):
         return self.__historical_reader.get_bars(self.__symbol, frequency)
 
     def get_data_series(self, frequency=None, bar_filter=None):
-        self.set_bar_filter(bar_filter)
-        if self.__bar_ds == None:
-            self.__bar_ds = dataseries.BarDataSeries()
-            for bar_ in self.get_bars():
-                self.__bar_ds.appendValue(bar_)
-        return self.__bar_ds
+        # the bars come from the reader's history cache, so only the unfiltered
+        # data series (of each frequency) is worth keeping around
+        if bar_filter is None and frequency in self.__bar_ds:
+            return self.__bar_ds[frequency]
+        ret = dataseries.BarDataSeries()
+        for bar_ in self.get_bars(frequency, bar_filter):
+            ret.append_value(bar_)
+        if bar_filter is None:
+            self.__bar_ds[frequency] = ret
+        return ret
 
     def get_stats(self):
         #if not self.stats_updated():
@@ -157,10 +161,20 @@ class Instrument(object):
 
 
 class Instruments(object):
-    def __init__(self, name=None):
+    def __init__(self, name=None, instruments_loader=None):
         self.__name = name
         self.__bar_filter = None
         self.__instruments = {}
+        # instruments_loader() returns the list of instruments to add (once)
+        # the first time they're needed
+        self.__instruments_loader = instruments_loader
+
+    def __load_instruments(self):
+        if self.__instruments_loader is not None:
+            instruments_loader = self.__instruments_loader
+            self.__instruments_loader = None
+            for instrument in instruments_loader():
+                self.add_instrument(instrument)
 
     def name(self):
         return self.__name
@@ -172,20 +186,24 @@ class Instruments(object):
         return os.path.join(settings.DATA_DIR, 'watchlists', self.slug())
 
     def set_bar_filter(self, bar_filter):
+        self.__load_instruments()
         self.__bar_filter = bar_filter
-        for instrument in self.__instruments:
+        for instrument in self.__instruments.values():
             instrument.set_bar_filter(bar_filter)
 
     def symbols(self):
+        self.__load_instruments()
         return sorted(self.__instruments.keys())
 
     @utils.lower
     def get_instrument(self, symbol=None):
+        self.__load_instruments()
         if symbol == None:
             return self.__instruments.popitem()[1]
         return self.__instruments[symbol]
 
     def get_instruments(self, symbols=None):
+        self.__load_instruments()
         if symbols == None:
             return self.__instruments.values()
         ret = []
@@ -204,9 +222,11 @@ class Instruments(object):
 
     @utils.lower
     def remove_instrument(self, symbol):
+        self.__load_instruments()
         return self.__instruments.pop(symbol)
 
     def update_stats(self, instruments=None):
+        self.__load_instruments()
         instruments = instruments or self.__instruments.values()
         stats = yql.KeyStats.get_data([x.symbol() for x in instruments])
         for symbol_stats in stats:
@@ -217,8 +237,8 @@ class Instruments(object):
 
 
 class Industry(Instruments):
-    def __init__(self, name, sector=None):
-        Instruments.__init__(self, name)
+    def __init__(self, name, sector=None, instruments_loader=None):
+        Instruments.__init__(self, name, instruments_loader)
         self.__sector = sector
 
     def data_folder(self):
@@ -229,32 +249,52 @@ class Industry(Instruments):
 
 
 class Sector(Instruments):
-    def __init__(self, name):
-        Instruments.__init__(self, name)
+    def __init__(self, name, industries_loader=None):
+        # with an industries_loader (returning the list of industries), the
+        # industries and their instruments get loaded when first needed
+        Instruments.__init__(self, name,
+            self.__get_industry_instruments if industries_loader else None)
         self.__industries = {}
+        self.__industries_loader = industries_loader
+
+    def __load_industries(self):
+        if self.__industries_loader is not None:
+            industries_loader = self.__industries_loader
+            self.__industries_loader = None
+            for industry in industries_loader():
+                self.add_industry(industry)
+
+    def __get_industry_instruments(self):
+        ret = []
+        for industry in self.get_industries().values():
+            ret.extend(industry.get_instruments())
+        return ret
 
     def data_folder(self):
         return os.path.join(settings.DATA_DIR, 'sectors', self.slug())
 
     def industries(self):
+        self.__load_industries()
         return sorted(self.__industries.keys())
 
     def get_industry(self, name):
+        self.__load_industries()
         return self.__industries[name]
 
     def get_industries(self):
+        self.__load_industries()
         return self.__industries
 
     def set_industries(self, industries):
+        self.__industries_loader = None
         self.__industries = industries
 
     def add_industry(self, industry):
         self.__industries[industry.name()] = industry
 
     def set_instruments(self):
-        for industry in self.get_industries():
-            for instrument in industry.get_instruments():
-                self.add_instrument(instrument)
+        for instrument in self.__get_industry_instruments():
+            self.add_instrument(instrument)
 
 
 #class SectorIndex(Instruments):
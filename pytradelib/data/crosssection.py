@@ -0,0 +1,146 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import numpy as np
+
+
+'''
+Cross-sectional (date-major) views of the historical data store:
+
+    cross_section = historical.Reader().get_cross_section(symbols,
+        from_date_time=datetime.datetime(2013, 1, 1), fields=['close', 'volume'])
+    closes = cross_section['close'] # a (dates x symbols) float64 array
+    returns = closes[1:] / closes[:-1] - 1
+
+Every field is a 2D array with a row per date (oldest first) and a column
+per symbol (in the order requested). Dates a symbol has no bar for are NaN,
+so screens over many symbols can be computed with vectorized numpy (nan*)
+functions instead of replaying every bar through an event loop.
+
+Reader.get_panel() builds the same structure from every symbol's parsed
+recarray (loading the symbols in parallel), and can fill in missing bars
+(see fill) for indicators that can't handle NaNs.
+'''
+
+FIELDS = ['open', 'high', 'low', 'close', 'volume', 'adj_close']
+
+
+def field_name(column_label):
+    ''' Returns the field name of a csv column label, eg "Adj Close" -> "adj_close".
+    '''
+    return column_label.strip().lower().replace(' ', '_')
+
+def assemble(symbols, symbol_columns, date_keys, values):
+    ''' Scatters per-bar values into date by symbol matrices.
+
+    :param symbols: the list of symbols (the matrices' columns).
+    :param symbol_columns: the column (index into symbols) of every bar.
+    :param date_keys: the date time of every bar, as stored (sortable strings).
+    :param values: a dict of {field: the field's value for every bar}.
+    :returns: tuple(sorted unique date_keys, {field: matrix})
+    '''
+    keys, date_rows = np.unique(np.asarray(date_keys), return_inverse=True)
+    symbol_columns = np.asarray(symbol_columns, dtype=np.intp)
+    matrices = {}
+    for field, field_values in values.items():
+        matrix = np.empty((len(keys), len(symbols)))
+        matrix.fill(np.nan)
+        matrix[date_rows, symbol_columns] = field_values
+        matrices[field] = matrix
+    return keys, matrices
+
+
+def last_values(matrix):
+    ''' Returns the most recent (non-NaN) value of every column of a date by
+    symbol matrix (NaN for columns without any values).
+    '''
+    ret = np.empty(matrix.shape[1])
+    ret.fill(np.nan)
+    if len(matrix):
+        valid = ~np.isnan(matrix)
+        last_rows = len(matrix) - 1 - np.argmax(valid[::-1], axis=0)
+        has_values = valid.any(axis=0)
+        ret[has_values] = matrix[last_rows[has_values], np.nonzero(has_values)[0]]
+    return ret
+
+
+def fill(matrix, policy):
+    ''' Fills in the NaNs (ie missing bars) of a date by symbol matrix, in
+    place.
+
+    :param policy: None to leave them NaN, 'ffill' to carry every symbol's
+        last value forward (leaving the dates before its first one NaN),
+        'bfill' to carry its next value backward, or a number to fill them
+        with (eg 0 for volumes).
+    '''
+    if policy is None or not matrix.size:
+        return matrix
+    elif policy in ('ffill', 'bfill'):
+        view = matrix if policy == 'ffill' else matrix[::-1]
+        # the row of the most recent value (so far) in every column
+        rows = np.where(np.isnan(view), 0, np.arange(len(view))[:, np.newaxis])
+        np.maximum.accumulate(rows, axis=0, out=rows)
+        view[:] = view[rows, np.arange(view.shape[1])]
+    elif isinstance(policy, (int, long, float)):
+        matrix[np.isnan(matrix)] = policy
+    else:
+        raise ValueError('unknown fill policy: %r' % (policy,))
+    return matrix
+
+
+class CrossSection(object):
+    ''' A date by symbol matrix for each of a set of bar fields.
+    '''
+    def __init__(self, date_times, symbols, matrices):
+        self.__date_times = date_times
+        self.__symbols = symbols
+        self.__columns = dict((symbol, i) for i, symbol in enumerate(symbols))
+        self.__matrices = matrices
+
+    def get_date_times(self):
+        return self.__date_times
+
+    def get_symbols(self):
+        return self.__symbols
+
+    def get_fields(self):
+        return sorted(self.__matrices.keys())
+
+    def get(self, field):
+        return self.__matrices[field]
+
+    def __getitem__(self, field):
+        return self.__matrices[field]
+
+    def __len__(self):
+        return len(self.__date_times)
+
+    def get_symbol_values(self, symbol, field):
+        ''' Returns one symbol's column of field (a 1D array, by date).
+        '''
+        return self.__matrices[field][:, self.__columns[symbol.lower()]]
+
+    def get_date_values(self, date_time, field):
+        ''' Returns every symbol's value of field at date_time (a 1D array).
+        '''
+        return self.__matrices[field][self.__date_times.index(date_time)]
+
+    def get_last_values(self, field):
+        ''' Returns every symbol's most recent value of field (NaN for
+        symbols without any bars).
+        '''
+        return last_values(self.__matrices[field])
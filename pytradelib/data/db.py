@@ -18,6 +18,13 @@
 import os
 import sqlite3
 import datetime
+import itertools
+import threading
+import contextlib
+import collections
+
+import greenlet
+import numpy as np
 
 from collections import OrderedDict
 
@@ -25,6 +32,241 @@ from pytradelib import utils
 from pytradelib import settings
 
 
+SCHEMA_VERSION = 2 # stored in the database's user_version pragma
+CACHED_STATEMENTS = 256 # prepared statements cached per connection
+
+# the connection profile: the write-ahead log lets readers and the writer work
+# concurrently, and with it synchronous=NORMAL only fsyncs at checkpoints
+# (a crash can lose the latest commits but never corrupts the database)
+CONNECTION_PRAGMAS = OrderedDict([
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('temp_store', 'MEMORY'),
+    ('cache_size', -32768),      # in KiB when negative, ie 32MB
+    ('mmap_size', 268435456),    # 256MB
+    ('busy_timeout', 30000),     # ms to wait on other processes' writes
+    ])
+MAX_READERS = 4 # pooled read connections per database
+
+# the oldest SQLite supported (for the write-ahead log), and whether it's new
+# enough for upserts (INSERT ... ON CONFLICT DO UPDATE) or insert_or_update
+# has to update and insert rows separately
+MIN_SQLITE_VERSION = (3, 7, 0)
+HAS_UPSERT = sqlite3.sqlite_version_info >= (3, 24, 0)
+
+# the index tables' columns that Database.get_index_version tracks
+INDEX_VERSION_COLUMNS = OrderedDict([
+    ('sector', ['name']),
+    ('industry', ['name', 'sector_id']),
+    ('symbol', ['symbol', 'name', 'industry_id']),
+    ])
+
+
+_NUMERIC_TYPES = set([int, long, float, type(None)])
+
+def _to_structured_array(columns, rows):
+    # numeric columns (NULLs allowed) become float64 fields, others objects
+    values = zip(*rows) if rows else [()] * len(columns)
+    dtype = [(column, np.float64 if set(map(type, column_values)) <= _NUMERIC_TYPES
+                      else object)
+             for column, column_values in zip(columns, values)]
+    return np.array(rows, dtype=dtype)
+
+
+class _Lock(object):
+    ''' A reentrant lock that's safe to share between threads and greenlets.
+    A greenlet waiting for it yields to the others (eg the one holding it)
+    instead of blocking its whole thread.
+    '''
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__owner = None
+        self.__count = 0
+
+    def is_owned(self):
+        return self.__owner is greenlet.getcurrent()
+
+    def acquire(self):
+        if self.is_owned():
+            self.__count += 1
+            return
+        delay = 0.0005
+        while not self.__lock.acquire(False):
+            import gevent
+            gevent.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        self.__owner = greenlet.getcurrent()
+        self.__count = 1
+
+    def release(self):
+        self.__count -= 1
+        if not self.__count:
+            self.__owner = None
+            self.__lock.release()
+
+
+class ConnectionManager(object):
+    ''' Shares the connections to one database file between every thread and
+    greenlet (see get_connection_manager).
+
+    Writes all go through a single writer connection: writers queue up for
+    it and hold it for the length of their transaction. Reads use a pool of
+    read connections (with the write-ahead log, they read the last committed
+    data while a write is going on), except within a transaction, where they
+    use the writer to see its uncommitted changes.
+    '''
+    def __init__(self, db_file_path, max_readers=MAX_READERS):
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise Exception('pytradelib needs SQLite %s or newer, but python '
+                            'is linked against SQLite %s' % (
+                '.'.join(map(str, MIN_SQLITE_VERSION)), sqlite3.sqlite_version))
+        self.__db_file_path = db_file_path
+        self.__max_readers = max_readers
+        self.__writer = self.__connect()
+        self.__file_id = self.__get_file_id()
+        self.__closed = False
+        self.__writer_lock = _Lock()
+        self.__transaction_depth = 0
+        self.__readers_lock = threading.Lock()
+        self.__idle_readers = []
+        self.__reader_count = 0
+
+    def __connect(self):
+        connection = sqlite3.connect(self.__db_file_path,
+            cached_statements=CACHED_STATEMENTS, check_same_thread=False)
+        connection.text_factory=str # FIXME: use unicode
+        for pragma, value in CONNECTION_PRAGMAS.items():
+            connection.execute('PRAGMA %s=%s' % (pragma, value)).fetchall()
+        return connection
+
+    def get_db_file_path(self):
+        return self.__db_file_path
+
+    def __get_file_id(self):
+        try:
+            stat = os.stat(self.__db_file_path)
+        except OSError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def is_current(self):
+        ''' Returns False once the manager has been closed, or its database
+        file has been deleted (or replaced) since it connected.
+        '''
+        return not self.__closed and self.__file_id is not None and \
+            self.__get_file_id() == self.__file_id
+
+    @contextlib.contextmanager
+    def transaction(self):
+        ''' Yields the writer connection. Everything written inside the
+        (outermost) with block gets committed at its end, or rolled back on
+        errors.
+        '''
+        self.__writer_lock.acquire()
+        self.__transaction_depth += 1
+        try:
+            yield self.__writer
+        except:
+            self.__transaction_depth -= 1
+            if not self.__transaction_depth:
+                self.__writer.rollback()
+            raise
+        else:
+            self.__transaction_depth -= 1
+            if not self.__transaction_depth:
+                self.__writer.commit()
+        finally:
+            self.__writer_lock.release()
+
+    @contextlib.contextmanager
+    def reader(self):
+        ''' Yields a read connection.
+        '''
+        if self.__writer_lock.is_owned():
+            yield self.__writer
+            return
+        connection = self.__get_reader()
+        try:
+            yield connection
+        finally:
+            with self.__readers_lock:
+                if self.__closed:
+                    connection.close()
+                    self.__reader_count -= 1
+                else:
+                    self.__idle_readers.append(connection)
+
+    def __get_reader(self):
+        delay = 0.0005
+        while True:
+            with self.__readers_lock:
+                if self.__idle_readers:
+                    return self.__idle_readers.pop()
+                connect = self.__reader_count < self.__max_readers
+                if connect:
+                    self.__reader_count += 1
+            if connect:
+                return self.__connect()
+            import gevent
+            gevent.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    def close(self):
+        self.__closed = True
+        with self.__readers_lock:
+            while self.__idle_readers:
+                self.__idle_readers.pop().close()
+                self.__reader_count -= 1
+        self.__writer_lock.acquire()
+        try:
+            self.__writer.close()
+        finally:
+            self.__writer_lock.release()
+
+
+_connection_managers = {}
+_connection_managers_lock = threading.Lock()
+
+def get_connection_manager(db_file_path):
+    ''' Returns the ConnectionManager shared by everybody using db_file_path.
+    A manager whose file has been deleted (or replaced) since it connected
+    gets closed, and replaced by one connected to the file at db_file_path now.
+    '''
+    db_file_path = os.path.abspath(db_file_path)
+    with _connection_managers_lock:
+        manager = _connection_managers.get(db_file_path)
+        if manager is not None and not manager.is_current():
+            manager.close()
+            manager = None
+        if manager is None:
+            manager = ConnectionManager(db_file_path)
+            _connection_managers[db_file_path] = manager
+        return manager
+
+def close_connection_managers(dir_path=None):
+    ''' Closes (and forgets) the ConnectionManagers of every database file in
+    dir_path (or its subdirectories), or of every database if it's None.
+    '''
+    if dir_path is not None:
+        dir_path = os.path.join(os.path.abspath(dir_path), '')
+    with _connection_managers_lock:
+        for db_file_path in _connection_managers.keys():
+            if dir_path is None or db_file_path.startswith(dir_path):
+                _connection_managers.pop(db_file_path).close()
+
+
+def get_file_key(db_file_path):
+    ''' Returns tuple(database mtime, log mtime, log size), which changes
+    whenever anything gets written to the database.
+    '''
+    db_mtime = os.path.getmtime(db_file_path)
+    wal_file_path = db_file_path + '-wal'
+    if not os.path.exists(wal_file_path):
+        return db_mtime, 0.0, 0
+    return db_mtime, os.path.getmtime(wal_file_path), \
+        os.path.getsize(wal_file_path)
+
+
 class BaseDatabase(object):
     def __init__(self, db_file_path=None):
         if db_file_path is None:
@@ -100,19 +342,84 @@ class BaseDatabase(object):
             'symbol_last_updated': 'symbol_id',
             }
 
+        # in-memory maps of names to ids, loaded (once) when first needed
+        self.__id_maps = {}
+        self.__statement_columns = {}
+
+        # the schema changes made by every version after the first release;
+        # _migrate runs the ones an existing database doesn't have yet
+        self._migrations = [
+            self.__create_indexes, # 1
+            self.__create_index_version, # 2
+            ]
+
         if initialize:
             self._create_tables()
+        self._migrate()
 
     def _connect(self, db_file_path):
         self._db_file_path = db_file_path
         initialize = False
         if not os.path.exists(db_file_path):
-            utils.mkdir_p(settings.DATA_DIR)
+            utils.mkdir_p(os.path.dirname(db_file_path) or settings.DATA_DIR)
             initialize = True
-        self._connection = sqlite3.connect(db_file_path)
-        self._connection.text_factory=str # FIXME: use unicode
+        self._connections = get_connection_manager(db_file_path)
         return initialize
 
+    def get_db_file_path(self):
+        return self._db_file_path
+
+    def get_schema_version(self):
+        with self._connections.reader() as connection:
+            return connection.execute('PRAGMA user_version').fetchone()[0]
+
+    def _migrate(self):
+        ''' Brings the schema of an existing database up to SCHEMA_VERSION.
+        '''
+        version = self.get_schema_version()
+        if version > SCHEMA_VERSION:
+            raise Exception('%s has a newer (v%i) schema than this version of '
+                            'pytradelib supports' % (self._db_file_path, version))
+        for i in xrange(version, SCHEMA_VERSION):
+            with self._connections.transaction() as connection:
+                self._migrations[i](connection)
+                connection.execute('PRAGMA user_version=%i' % (i + 1))
+
+    def __create_indexes(self, connection):
+        # foreign keys (for the index joins), and symbol_last_updated's
+        # frequency columns (for finding the symbols needing updates)
+        indexes = [
+            ('industry', 'sector_id'),
+            ('symbol', 'industry_id'),
+            ('symbol_last_updated', 'day'),
+            ('symbol_last_updated', 'week'),
+            ('symbol_last_updated', 'month'),
+            ]
+        for table_name, column in indexes:
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS %s_%s_idx ON %s (%s)' % (
+                    table_name, column, table_name, column))
+
+    def __create_index_version(self, connection):
+        # a counter bumped (by triggers) on every change to the index tables,
+        # and a random id telling apart databases recreated at the same path
+        connection.execute('CREATE TABLE IF NOT EXISTS index_version '
+                           '(index_id INTEGER NOT NULL, version INTEGER NOT NULL)')
+        connection.execute('INSERT INTO index_version SELECT random(), 0 '
+                           'WHERE NOT EXISTS (SELECT * FROM index_version)')
+        bump = 'UPDATE index_version SET version = version + 1;'
+        for table_name, columns in INDEX_VERSION_COLUMNS.items():
+            for event in ['INSERT', 'DELETE']:
+                connection.execute('CREATE TRIGGER IF NOT EXISTS '
+                    '%s_%s_index_version AFTER %s ON %s BEGIN %s END' % (
+                        table_name, event.lower(), event, table_name, bump))
+            # upserts update rows without changing them; those don't count
+            changed = ' OR '.join(['OLD.%s IS NOT NEW.%s' % (x, x)
+                                   for x in columns])
+            connection.execute('CREATE TRIGGER IF NOT EXISTS '
+                '%s_update_index_version AFTER UPDATE ON %s WHEN %s '
+                'BEGIN %s END' % (table_name, table_name, changed, bump))
+
     def _create_tables(self):
         self.__create_table('sector', self._sector_columns)
         self.__create_table('industry', self._industry_columns)
@@ -124,108 +431,191 @@ class BaseDatabase(object):
                                             self._symbol_last_updated_columns)
 
     def __create_table(self, table_name, column_defs_dict):
-        self._connection.execute("CREATE TABLE %s (%s)" % (table_name,
-            ','.join([' '.join(x) for x in column_defs_dict.items()])))
-        self._connection.commit()
-
-    def select_row(self, sql, params=None):
-        rows = self.select_rows(sql, params)
-        return rows[0] if rows else None
-
-    def select_rows(self, sql, params=None, include_none=True):
-        cursor = self._connection.cursor()
-        if params:
-            cursor.execute(sql, params)
-        else:
-            cursor.execute(sql)
-
-        # figure out the column names and order of selected results
-        sql_columns, junk, select_end = sql[len('SELECT '):].replace(
-            ' from ', ' FROM ').replace(' as ', ' AS ').partition(' FROM ')
-        if ' * ' in sql:
-            table_name = select_end.partition(' ')[0]
-            columns = self.__getattribute__('_%s_columns' % table_name).keys()
-        else:
-            columns = [x.partition(' AS ')[2].strip()
-                        if ' AS ' in x else x.strip()
-                        for x in sql_columns.split(',')]
-
-        # load the results into a list of dicts and return
-        ret = [dict([(x, row[i]) for i, x in enumerate(columns)
-                if row[i] or include_none])
-                for row in cursor]
-        cursor.close()
-        return ret
+        with self._connections.transaction() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS %s (%s)" % (table_name,
+                ','.join([' '.join(x) for x in column_defs_dict.items()])))
+
+    def select_row(self, sql, params=None, row_type='dict'):
+        rows = self.select_rows(sql, params, row_type=row_type)
+        return rows[0] if len(rows) else None
+
+    def __get_statement_columns(self, sql, cursor):
+        # the selected column names (and a namedtuple class for them), cached
+        # per statement
+        if sql not in self.__statement_columns:
+            columns = tuple(x[0] for x in cursor.description)
+            self.__statement_columns[sql] = (columns,
+                collections.namedtuple('Row', columns, rename=True))
+        return self.__statement_columns[sql]
+
+    def select_rows(self, sql, params=None, include_none=True, row_type='dict'):
+        ''' Returns the selected rows.
+
+        :param include_none: if False, falsy values are left out of dict rows.
+        :param row_type: 'dict', 'tuple', 'named' (namedtuples with the column
+            names as attributes) or 'numpy' (a numpy structured array, with
+            a float64 field for every numeric column; NULLs become nans).
+        '''
+        with self._connections.reader() as connection:
+            cursor = connection.cursor()
+            if params:
+                cursor.execute(sql, params)
+            else:
+                cursor.execute(sql)
+            rows = cursor.fetchall()
+            columns, named_row = self.__get_statement_columns(sql, cursor)
+            cursor.close()
+
+        if row_type == 'tuple':
+            return rows
+        elif row_type == 'named':
+            return [named_row._make(row) for row in rows]
+        elif row_type == 'numpy':
+            return _to_structured_array(columns, rows)
+        elif include_none:
+            return [dict(itertools.izip(columns, row)) for row in rows]
+        return [dict(x for x in itertools.izip(columns, row) if x[1])
+                for row in rows]
+
+    @contextlib.contextmanager
+    def transaction(self):
+        ''' Groups every write made inside the with block into one transaction
+        (committed at the end of the outermost block, or rolled back on errors).
+        Other writers wait until it's done.
+        '''
+        try:
+            with self._connections.transaction() as connection:
+                yield connection
+        except:
+            self.__id_maps = {} # they might hold rolled back ids
+            raise
 
     def insert_or_update(self, table_name, list_of_dicts, remove_keys=None):
+        ''' Upserts the rows in list_of_dicts: new rows get inserted, and rows
+        conflicting with a stored row on the table's unique column only update
+        the columns present in their dict. Runs as a single transaction.
+        '''
         if remove_keys:
             for d in list_of_dicts:
                 for key in remove_keys:
                     d.pop(key)
-        if list_of_dicts:
-            columns = list_of_dicts[0].keys()
-            sql = "INSERT INTO %s (%s) VALUES (%s?)" % ( table_name,
+        if not list_of_dicts:
+            return
+
+        # rows with different sets of columns need different statements
+        column_groups = OrderedDict()
+        for d in list_of_dicts:
+            column_groups.setdefault(tuple(d.keys()), []).append(d)
+
+        unique_column = self._update_where_columns[table_name]
+        with self.transaction():
+            for columns, dicts in column_groups.items():
+                if HAS_UPSERT:
+                    self.__upsert(table_name, columns, dicts, unique_column)
+                else:
+                    self.__update_or_insert(table_name, columns, dicts,
+                                            unique_column)
+        if table_name in ('sector', 'industry', 'symbol'):
+            self.__id_maps.pop(table_name, None) # reload with the new ids
+
+    def __upsert(self, table_name, columns, dicts, unique_column):
+        updates = ', '.join(['%s=excluded.%s' % (x, x)
+                             for x in columns if x != unique_column])
+        sql = 'INSERT INTO %s (%s) VALUES (%s?) ON CONFLICT (%s) DO %s' % (
+            table_name, ','.join(columns), '?,' * (len(columns) - 1),
+            unique_column, 'UPDATE SET %s' % updates if updates else 'NOTHING')
+        def param_gen():
+            for d in dicts:
+                yield tuple(d[x] for x in columns)
+        self.execute_many(sql, param_gen)
+
+    def __update_or_insert(self, table_name, columns, dicts, unique_column):
+        # the same as __upsert for SQLite < 3.24: update the row, and insert
+        # it if there wasn't one (row by row, so later duplicates still win)
+        if unique_column not in columns:
+            # nothing to conflict on (eg new system_last_updated rows)
+            sql = 'INSERT INTO %s (%s) VALUES (%s?)' % (table_name,
                 ','.join(columns), '?,' * (len(columns) - 1))
-
-            if table_name == 'symbol':
-                ids = [self.get_symbol_id(x['symbol']) for x in list_of_dicts]
-                self._connection.commit()
-
             def param_gen():
-                for d in list_of_dicts:
-                    yield tuple(v for v in d.values())
-            try:
-                self.execute_many(sql, param_gen)
-            except sqlite3.IntegrityError:
-                sql = 'UPDATE %s SET %s WHERE %s=?' % (
-                    table_name,
-                    ', '.join(['%s=?' % x for x in columns]),
-                    self._update_where_columns[table_name])
-                def update_gen():
-                    for i, t in enumerate(param_gen()):
-                        params = [x for x in t]
-                        unique_column = self._update_where_columns[table_name]
-                        params.append(list_of_dicts[i][unique_column])
-                        yield tuple(params)
-                self.execute_many(sql, update_gen)
+                for d in dicts:
+                    yield tuple(d[x] for x in columns)
+            self.execute_many(sql, param_gen)
+            return
+
+        updates = [x for x in columns if x != unique_column]
+        update_sql = 'UPDATE %s SET %s WHERE %s=?' % (table_name,
+            ', '.join(['%s=?' % x for x in updates]), unique_column)
+        insert_sql = 'INSERT INTO %s (%s) SELECT %s? WHERE NOT EXISTS ' \
+            '(SELECT 1 FROM %s WHERE %s=?)' % (table_name, ','.join(columns),
+                '?,' * (len(columns) - 1), table_name, unique_column)
+        with self.transaction() as connection:
+            cursor = connection.cursor()
+            for d in dicts:
+                if updates:
+                    cursor.execute(update_sql, [d[x] for x in updates]
+                                               + [d[unique_column]])
+                    if cursor.rowcount:
+                        continue
+                cursor.execute(insert_sql, [d[x] for x in columns]
+                                           + [d[unique_column]])
+            cursor.close()
 
     def execute_many(self, sql, params_generator):
-        cursor = self._connection.cursor()
-        cursor.executemany(sql, params_generator())
-        self._connection.commit()
-        cursor.close()
+        with self.transaction() as connection:
+            cursor = connection.cursor()
+            cursor.executemany(sql, params_generator())
+            cursor.close()
+
+    def __get_id_map(self, table_name, reload_=False):
+        if reload_ or table_name not in self.__id_maps:
+            name_column = self._update_where_columns[table_name]
+            sql = 'SELECT %s, %s_id FROM %s' % (name_column, table_name, table_name)
+            self.__id_maps[table_name] = dict(self.select_rows(sql, row_type='tuple'))
+        return self.__id_maps[table_name]
+
+    def __get_id(self, table_name, name):
+        # other databases sharing the file may have added the name since the
+        # id map was loaded
+        ids = self.__get_id_map(table_name)
+        if name not in ids:
+            ids = self.__get_id_map(table_name, reload_=True)
+        return ids[name]
 
     @utils.lower
     def get_symbol_id(self, symbol):
-        try:
-            sql = "SELECT symbol_id FROM symbol WHERE symbol=?"
-            return self.select_row(sql, (symbol,))['symbol_id']
-        except TypeError:
-            sql = 'INSERT INTO symbol (symbol) VALUES (?)'
-            ret = self._connection.execute(sql, (symbol,))
-            # FIXME: potential optimization: shouldn't get_symbol_id() always
-            # be called by somebody who will commit soon thereafter?
-            #self._connection.commit()
-            return ret.lastrowid
+        symbol_ids = self.__get_id_map('symbol')
+        if symbol not in symbol_ids:
+            with self.transaction() as connection:
+                connection.execute(
+                    'INSERT OR IGNORE INTO symbol (symbol) VALUES (?)', (symbol,))
+                symbol_ids[symbol] = connection.execute(
+                    'SELECT symbol_id FROM symbol WHERE symbol=?',
+                    (symbol,)).fetchone()[0]
+        return symbol_ids[symbol]
 
     def get_sector_id(self, sector):
-        sql = "SELECT sector_id FROM sector WHERE name=?"
-        return self.select_row(sql, (sector,))['sector_id']
+        return self.__get_id('sector', sector)
 
     def get_industry_id(self, industry):
-        sql = "SELECT industry_id FROM industry WHERE name=?"
-        return self.select_row(sql, (industry,))['industry_id']
+        return self.__get_id('industry', industry)
 
     @utils.lower
     def delete_symbol(self, symbol):
         id_ = self.get_symbol_id(symbol)
         delete_sql = [
-            "DELETE FROM stats WHERE symbol_id=?"
+            "DELETE FROM stats WHERE symbol_id=?",
             "DELETE FROM symbol WHERE symbol_id=?",
             ]
-        for sql in delete_sql:
-            self._connection.execute(sql, (id_,))
-        self._connection.commit()
+        with self.transaction() as connection:
+            for sql in delete_sql:
+                connection.execute(sql, (id_,))
+        self.__id_maps.pop('symbol', None)
+
+
+_SYMBOL_INFO_SQL = 'SELECT symbol, symbol.name AS name, sector.name AS sector, '\
+    'industry.name AS industry FROM symbol '\
+    'JOIN industry ON (symbol.industry_id = industry.industry_id) '\
+    'JOIN sector ON (industry.sector_id = sector.sector_id)'
 
 
 class Database(object):
@@ -256,6 +646,15 @@ class Database(object):
     def symbol_last_updated_columns(self):
         return self._db._symbol_last_updated_columns.keys()
 
+    def get_db_file_path(self):
+        return self._db.get_db_file_path()
+
+    def transaction(self):
+        ''' Returns a context manager grouping the writes made inside its with
+        block into a single transaction.
+        '''
+        return self._db.transaction()
+
     @utils.lower
     def get_symbol_id(self, symbol):
         return self._db.get_symbol_id(symbol)
@@ -282,6 +681,14 @@ class Database(object):
         sql = 'SELECT yahoo_id from industry'
         return [row['yahoo_id'] for row in self._db.select_rows(sql)]
 
+    def get_index_version(self):
+        ''' Returns tuple(index id, version), which changes whenever a sector,
+        industry or symbol is added, removed or renamed (or moved), and only
+        then.
+        '''
+        return tuple(self._db.select_row(
+            'SELECT index_id, version FROM index_version', row_type='tuple'))
+
     def get_index(self):
         sql = 'SELECT industry.name AS industry, sector.name AS sector FROM '\
             'industry JOIN sector ON (industry.sector_id = sector.sector_id)'
@@ -290,13 +697,51 @@ class Database(object):
             'industry_sectors': [(x['industry'], x['sector'])
                                 for x in self._db.select_rows(sql)]
             }
-        sql = 'SELECT symbol, symbol.name AS name, sector.name AS sector, '\
-            'industry.name AS industry FROM symbol '\
-            'JOIN industry ON (symbol.industry_id = industry.industry_id) '\
-            'JOIN sector ON (industry.sector_id = sector.sector_id)'
-        ret['symbols'] = self._db.select_rows(sql)
+        ret['symbols'] = self.get_symbol_infos()
         return ret
 
+    @utils.lower
+    def get_symbol_info(self, symbol):
+        ''' Returns a dict with the symbol, name, sector and industry of the
+        symbol, or None if it isn't in the index.
+        '''
+        return self._db.select_row(
+            _SYMBOL_INFO_SQL + ' WHERE symbol.symbol = ?', (symbol,))
+
+    def get_symbol_infos(self, industry=None):
+        ''' Returns get_symbol_info() dicts for every symbol (in industry).
+        '''
+        if industry is None:
+            return self._db.select_rows(_SYMBOL_INFO_SQL)
+        return self._db.select_rows(
+            _SYMBOL_INFO_SQL + ' WHERE industry.name = ?', (industry,))
+
+    def get_industry_sector(self, industry):
+        sql = 'SELECT sector.name AS sector FROM industry '\
+            'JOIN sector ON (industry.sector_id = sector.sector_id) '\
+            'WHERE industry.name = ?'
+        row = self._db.select_row(sql, (industry,))
+        return row['sector'] if row else None
+
+    def get_sector_industries(self, sector):
+        sql = 'SELECT industry.name AS industry FROM industry '\
+            'JOIN sector ON (industry.sector_id = sector.sector_id) '\
+            'WHERE sector.name = ?'
+        return [row['industry'] for row in self._db.select_rows(sql, (sector,))]
+
+    def get_stats(self, columns=None, row_type='numpy'):
+        ''' Returns the stats of every symbol, by default as a numpy structured
+        array (with a 'symbol' field) for vectorized screening.
+
+        :param columns: the stats columns to select (default: all of them).
+        :param row_type: see BaseDatabase.select_rows.
+        '''
+        columns = columns or self.stats_columns[1:] # not symbol_id
+        sql = 'SELECT symbol, %s FROM stats '\
+            'JOIN symbol ON (stats.symbol_id = symbol.symbol_id)' % (
+                ', '.join(['stats.%s AS %s' % (x, x) for x in columns]))
+        return self._db.select_rows(sql, row_type=row_type)
+
     def get_updated(self, what, symbol=None):
         sql = 'SELECT %s FROM ' % what
         if what in self.system_last_updated_columns:
@@ -362,16 +807,17 @@ class Database(object):
     def insert_or_update_stats(self, stats):
         # some of the keys in stats belong in the symbol table; separate them
         symbol_dicts = []
-        for d in stats:
-            symbol_d = {'symbol': d.pop('symbol').lower()}
-            d['symbol_id'] = self.get_symbol_id(symbol_d['symbol'])
-            symbol_d['symbol_id'] = d['symbol_id']
-            for key in ['name', 'industry', 'exchange']:
-                if key in d:
-                    symbol_d[key] = d.pop(key)
-            symbol_dicts.append(symbol_d)
-        self.insert_or_update_symbols(symbol_dicts)
-        self._db.insert_or_update('stats', stats)
+        with self._db.transaction():
+            for d in stats:
+                symbol_d = {'symbol': d.pop('symbol').lower()}
+                d['symbol_id'] = self.get_symbol_id(symbol_d['symbol'])
+                symbol_d['symbol_id'] = d['symbol_id']
+                for key in ['name', 'industry', 'exchange']:
+                    if key in d:
+                        symbol_d[key] = d.pop(key)
+                symbol_dicts.append(symbol_d)
+            self.insert_or_update_symbols(symbol_dicts)
+            self._db.insert_or_update('stats', stats)
 
     def insert_or_update_instruments(self, instruments):
         all_symbols = {}
@@ -17,17 +17,17 @@
 
 import os
 import sys
-import lz4
-import gzip
 
-import matplotlib.mlab as mlab
+import numpy as np
 
 from pytradelib import bar
 from pytradelib import utils
 from pytradelib import observer
 from pytradelib import settings
 from pytradelib.utils import printf
-from pytradelib.data import providers
+from pytradelib.data import safeio
+from pytradelib.data import barcache
+from pytradelib.data import crosssection
 from pytradelib.data.providers import ProviderFactory
 from pytradelib.data.failed import Symbols as FailedSymbols
 
@@ -40,50 +40,46 @@ Bookmark that caused this experiment: http://www.dabeaz.com/generators-uk/]
     Initialize the generator pipeline with an Instrument or [Instruments]
         |
         V
- file_path(s) -> file_open -> file_to_rows_reader -> row_filter -> parser/drain
-                                                                        |
-    Return values from Reader.get_X_bars():                             V
+ symbol context(s) -> store reader -> row_filter -> parser/drain
+                                                         |
+    Return values from Reader.get_X_bars():              V
                               for Instrument --------------> [list of bar.Bar]
                               for Instruments --> {"symbol": [list of bar.Bar]}
+
+The store reader is the data store provider's read_rows() (or, for the bars of
+every symbol on one date, its read_date_rows()): the csv file store reads each
+symbol's file, and the SQLite store (settings.DATA_STORE_FORMAT = 'SQLite')
+answers both kinds of queries with an indexed scan of its bar table.
+
+Whole histories skip the pipeline when they can: parsed bars are kept in a
+process-wide cache (see data.barcache), and csv files get parsed copies saved
+next to them (see data.parsedcache), so later runs load the bars' columns
+instead of parsing the csv text again.
 '''
 
 class CSVRowMixin(object):
-    def symbol_rows(self, symbol_contexts):
-        for symbol, context in symbol_contexts:
-            f = context.pop('_open_file')
-            data = f.read()
-            f.close()
-            if settings.DATA_COMPRESSION == 'lz4':
-                data = lz4.loads(data)
-
-            # split the file into rows, slicing off the header labels
-            csv_rows = data.strip().split('\n')[1:]
-            yield csv_rows, context
-
-    # FIXME: For the next three functions, we still read the entire file. How much
-    # is gained by reading only the first/last few lines of the file?
-
-    def newest_and_oldest_symbol_rows(self, symbol_contexts):
-        symbol_rows = self.symbol_rows(symbol_contexts)
-        for symbol, rows in symbol_rows:
+    def symbol_rows(self, row_contexts):
+        for rows, context in row_contexts:
+            yield rows, context
+
+    def newest_and_oldest_symbol_rows(self, row_contexts):
+        for rows, context in row_contexts:
             yield ([rows[-1], rows[0]], context)
 
     # FIXME: For the next two functions, optionally return count bars from beg/end?
 
     # oldest date (assumed to be the IPO date)
-    def oldest_symbol_row(self, symbol_contexts):
-        symbol_rows = self.symbol_rows(symbol_contexts)
-        for symbol, rows in symbol_rows:
+    def oldest_symbol_row(self, row_contexts):
+        for rows, context in row_contexts:
             yield ([rows[0]], context)
 
     # most recent date
-    def newest_symbol_row(self, symbol_contexts):
-        symbol_rows = self.symbol_rows(symbol_contexts)
-        for symbol, rows in symbol_rows:
+    def newest_symbol_row(self, row_contexts):
+        for rows, context in row_contexts:
             yield ([rows[-1]], context)
 
 
-class Reader(providers.OpenFilesMixin, CSVRowMixin):
+class Reader(CSVRowMixin):
     def __init__(self):
         self.set_data_provider(settings.DATA_STORE_FORMAT)
 
@@ -94,37 +90,148 @@ class Reader(providers.OpenFilesMixin, CSVRowMixin):
     def set_bar_filter(self, bar_filter):
         self._data_reader.set_bar_filter(bar_filter)
 
-    def get_recarray(self, symbol, frequency=None):
-        return self.get_recarrays([symbol], frequency)[0]
-        
-    def get_recarrays(self, symbols, frequency=None):
-        frequency = frequency or self._default_frequency
+    def get_recarray(self, symbol, frequency=None, mmap_dir=None):
+        return self.get_recarrays([symbol], frequency, mmap_dir)[0]
 
-        # define the pipeline
-        symbol_contexts = \
-            self.open_files_readable(
-                self._data_reader.get_file_paths([(symbol,
-                                                  {'frequency': frequency})
-                                                  for symbol in symbols]))
+    def get_recarrays(self, symbols, frequency=None, mmap_dir=None):
+        ''' Returns a numpy recarray of the bars of each (initialized) symbol
+        (see providers.historical.Provider.get_recarray_dtype for its fields).
+
+        Symbols with a fresh parsed file (see data.parsedcache) get loaded
+        from it instead of being parsed, and the others' parsed files get saved.
 
-        # start and drain the pipeline
+        :param mmap_dir: if set, every recarray gets parsed into (and returned
+            memory-mapped from) a .npy file in this directory, instead of memory.
+        '''
+        frequency = frequency or self._default_frequency
+        dtype = self._data_reader.get_recarray_dtype(frequency)
         ret = []
-        for symbol, context in symbol_contexts:
-            f = context.pop('_open_file')
-            recarray = mlab.csv2rec(f)
-            recarray.sort()
-            ret.append(recarray)
-            f.close()
+        for symbol in symbols:
+            # prefer the symbol's parsed file, when it's fresh
+            recarray = self._data_reader.read_parsed(symbol, frequency)
+            if recarray is not None:
+                if mmap_dir is not None:
+                    out = self.__open_memmap(mmap_dir, symbol, frequency, dtype,
+                                             len(recarray))
+                    out[:] = recarray
+                    out.flush()
+                    recarray = out.view(np.recarray)
+                ret.append(recarray)
+                continue
+
+            for rows, context in self._data_reader.read_rows(
+                [(symbol, {'frequency': frequency})]
+            ):
+                out = None
+                if mmap_dir is not None:
+                    out = self.__open_memmap(mmap_dir, symbol, frequency, dtype,
+                                             len(rows))
+                recarray = self._data_reader.rows_to_recarray(rows, frequency, out)
+                if out is not None:
+                    out.flush()
+                self._data_reader.save_parsed(context, rows, recarray)
+                ret.append(recarray)
         return ret
 
-    def get_bars(self, symbol, frequency=None):
-        ret = self.__get_bars(
-            [symbol], self.symbol_rows, frequency, use_bar_filter=True)
+    def __open_memmap(self, mmap_dir, symbol, frequency, dtype, length):
+        return np.lib.format.open_memmap(os.path.join(mmap_dir,
+            '%s_%s.npy' % (symbol, bar.FrequencyToStr[frequency])),
+            mode='w+', dtype=dtype, shape=(length,))
+
+    def get_bars(self, symbol, frequency=None,
+        from_date_time=None,
+        to_date_time=None
+    ):
+        ret = self.__get_bars([symbol], self.symbol_rows, frequency,
+            use_bar_filter=True,
+            from_date_time=from_date_time,
+            to_date_time=to_date_time)
         return ret[symbol] # return just the list of bars for the symbol
 
-    def get_bars_dict(self, symbols, frequency=None):
-        return self.__get_bars(
-            symbols, self.symbol_rows, frequency, use_bar_filter=True)
+    def get_bars_dict(self, symbols, frequency=None,
+        from_date_time=None,
+        to_date_time=None
+    ):
+        return self.__get_bars(symbols, self.symbol_rows, frequency,
+            use_bar_filter=True,
+            from_date_time=from_date_time,
+            to_date_time=to_date_time)
+
+    def get_bars_on_date(self, date_time, symbols=None, frequency=None):
+        ''' Returns a dict of {"symbol": bar.Bar} for the symbols with a bar at
+        date_time. symbols can only be None (for every stored symbol) with a
+        store that isn't file based.
+        '''
+        frequency = frequency or self._default_frequency
+        ret = {}
+        for rows, context in self._data_reader.read_date_rows(
+            date_time, frequency, symbols
+        ):
+            symbol, bars = self._data_reader.rows_to_bars(
+                context['symbol'], rows, frequency, use_bar_filter=False)
+            if bars:
+                ret[symbol] = bars[0]
+        return ret
+
+    def get_cross_section(self, symbols=None, frequency=None,
+        from_date_time=None,
+        to_date_time=None,
+        fields=None
+    ):
+        ''' Returns a crosssection.CrossSection: a date by symbol matrix of
+        each of the fields (default: close and volume) for the bars within
+        the date range. symbols can only be None (for every stored symbol)
+        with a store that isn't file based.
+        '''
+        frequency = frequency or self._default_frequency
+        fields = fields or ['close', 'volume']
+        symbols, date_keys, matrices = self._data_reader.read_cross_section(
+            symbols, frequency, fields, from_date_time, to_date_time)
+        date_times = [self._data_reader.row_to_date_time(x, frequency)
+                      for x in date_keys]
+        return crosssection.CrossSection(date_times, symbols, matrices)
+
+    def get_panel(self, symbols, frequency=None,
+        from_date_time=None,
+        to_date_time=None,
+        fields=None,
+        fill=None
+    ):
+        ''' Returns a crosssection.CrossSection of the fields (default: all of
+        them) of the symbols' bars within the date range, aligned on every date
+        time any of the symbols has a bar for. The symbols get loaded and
+        parsed in parallel, in utils.get_process_pool()'s worker processes.
+
+        :param fill: how to fill in missing bars (see crosssection.fill), or
+            a dict of {field: fill} (fields not in it are left NaN).
+        '''
+        frequency = frequency or self._default_frequency
+        symbols = [x.lower() for x in symbols]
+        dtype = self._data_reader.get_recarray_dtype(frequency)
+        date_field = dtype.names[0]
+        fields = fields or list(dtype.names[1:])
+
+        symbol_columns = dict((symbol, i) for i, symbol in enumerate(symbols))
+        bar_columns, date_times, values = [], [], dict((x, []) for x in fields)
+        for symbol, recarray in self._data_reader.read_recarrays(symbols,
+            frequency, from_date_time, to_date_time, utils.get_process_pool()
+        ):
+            bar_columns.append(np.repeat(symbol_columns[symbol], len(recarray)))
+            date_times.append(recarray[date_field])
+            for field in fields:
+                values[field].append(recarray[field])
+        if not date_times:
+            return crosssection.CrossSection([], symbols,
+                dict((x, np.empty((0, len(symbols)))) for x in fields))
+
+        date_times, matrices = crosssection.assemble(symbols,
+            np.concatenate(bar_columns), np.concatenate(date_times),
+            dict((x, np.concatenate(values[x])) for x in fields))
+        for field, matrix in matrices.items():
+            crosssection.fill(matrix,
+                fill.get(field) if isinstance(fill, dict) else fill)
+        return crosssection.CrossSection(date_times.astype('M8[s]').tolist(),
+                                         symbols, matrices)
 
     # FIXME: are all the following public functions *really* needed?
     def get_newest_bar(self, symbol, frequency=None):
@@ -160,31 +267,98 @@ class Reader(providers.OpenFilesMixin, CSVRowMixin):
         return self.__get_bars(symbols, self.newest_and_oldest_symbol_rows,
                                frequency, use_bar_filter=False)
 
-    def __get_bars(self, symbols, row_generator, frequency, use_bar_filter):
+    def __get_bars(self, symbols, row_generator, frequency, use_bar_filter,
+        from_date_time=None,
+        to_date_time=None
+    ):
         frequency = frequency or self._default_frequency
+        bar_filter = self._data_reader.get_bar_filter() if use_bar_filter else None
+        cache = barcache.get_cache()
+        # parse whole histories (for the caches) when they'll all be needed anyway
+        whole_histories = row_generator == self.symbol_rows and \
+            (cache.get_max_size() or settings.PARSED_CACHE)
+
+        # symbols with a cached history (of their current data) get sliced
+        # from it, and whole histories get loaded from fresh parsed files
+        ret = {}
+        uncached = {}
+        for symbol in symbols:
+            key = (self._data_reader.name, symbol.lower(), frequency)
+            version = self._data_reader.get_data_version(symbol, frequency)
+            history = None
+            if version is not None and cache.get_max_size():
+                history = cache.get(key, version)
+            if history is None and version is not None and whole_histories:
+                recarray = self._data_reader.read_parsed(symbol, frequency)
+                if recarray is not None:
+                    history = self.__cache_history(cache, key, version,
+                        self._data_reader.recarray_to_bars(recarray, frequency))
+            if history is None:
+                uncached[symbol] = (key, version)
+                continue
+            bars = history.get_bars(from_date_time, to_date_time, bar_filter)
+            if bars:
+                [(bars, context)] = row_generator([(bars, None)])
+                ret[symbol.lower()] = bars
+
+        if whole_histories:
+            row_generator = self.__cache_rows(uncached)
+            use_bar_filter = False
+            read_from_date_time = read_to_date_time = None
+        else:
+            read_from_date_time, read_to_date_time = from_date_time, to_date_time
 
         # define the pipeline
         row_contexts = \
             row_generator(
-                self.open_files_readable(
-                    self._data_reader.get_file_paths(symbols, frequency)))
+                self._data_reader.read_rows(
+                    [(symbol, {'frequency': frequency}) for symbol in uncached],
+                    read_from_date_time, read_to_date_time))
 
         # start the pipeline and and drain the results into ret
-        ret = {}
         for rows, context in row_contexts:
             symbol, bars = self._data_reader.rows_to_bars(context['symbol'],
                                                           rows,
                                                           frequency,
                                                           use_bar_filter)
+            if bars and whole_histories:
+                self._data_reader.save_parsed(context, rows)
+                history = self.__cache_history(cache, context['cache_key'],
+                                               context['cache_version'], bars)
+                bars = history.get_bars(from_date_time, to_date_time, bar_filter)
             if bars:
                 ret[symbol] = bars
         return ret
 
+    def __cache_history(self, cache, key, version, bars):
+        history = barcache.History(bars)
+        if version is not None:
+            cache.put(key, version, history, history.get_size())
+        return history
+
+    def __cache_rows(self, keys_versions):
+        # returns a row generator tagging contexts with their cache key and version
+        def cache_rows(row_contexts):
+            for rows, context in row_contexts:
+                context['cache_key'], context['cache_version'] = \
+                    keys_versions[context['symbol']]
+                yield rows, context
+        return cache_rows
+
+    def get_cache_stats(self):
+        ''' Returns the hit and miss counters (and size) of the process-wide
+        cache of parsed histories (see barcache.LRUCache.get_stats).
+        '''
+        return barcache.get_cache().get_stats()
 
-class Updater(providers.OpenFilesMixin):
+
+class Updater(object):
     def __init__(self, db):
         self._updated_event = observer.Event()
         self._db = db
+        self._pipeline_metrics = None
+        # roll back writes interrupted by a crash and quarantine corrupt files
+        safeio.check_data_store()
         self.set_provider_formats(settings.DATA_PROVIDER,
                                   settings.DATA_STORE_FORMAT)
 
@@ -201,6 +375,18 @@ class Updater(providers.OpenFilesMixin):
     def get_update_event_handler(self):
         return self._updated_event
 
+    def get_pipeline_metrics(self):
+        ''' Returns the per-stage metrics (see utils.pipeline.Stage.get_metrics)
+        of the last bulk download, or None.
+        '''
+        return self._pipeline_metrics
+
+    def format_pipeline_metrics(self):
+        if not self._pipeline_metrics:
+            return ''
+        from pytradelib.utils import pipeline
+        return pipeline.format_metrics(self._pipeline_metrics)
+
     def initialize_symbol(self, symbol, frequency=None):
         self.initialize_symbols([symbol], frequency)
 
@@ -218,7 +404,7 @@ class Updater(providers.OpenFilesMixin):
         if not symbols:
             printf('no symbols to initialize.')
             return None
-        for context in self.__update_symbols(symbols, frequency, sleep=1):
+        for context in self.__update_symbols(symbols, frequency):
             self._updated_event.emit(context)
 
     def update_symbol(self, symbol, frequency=None):
@@ -240,10 +426,9 @@ class Updater(providers.OpenFilesMixin):
 
         for context in self.__update_symbols(symbols, frequency,
             operation_name='update',
-            open_files_function=self.open_files_updatable,
+            open_files_function=self._data_writer.open_files_updatable,
             process_data_update_function=self._data_writer.update_data,
-            init=False,
-            sleep=1
+            init=False
         ):
             self._updated_event.emit(context)
 
@@ -257,8 +442,7 @@ class Updater(providers.OpenFilesMixin):
         operation_name='download',
         open_files_function=None,
         process_data_update_function=None,
-        init=True,
-        sleep=None
+        init=True
     ):
         '''
         This function contains the actual pipeline logic for downloading,
@@ -266,12 +450,11 @@ class Updater(providers.OpenFilesMixin):
         progress of bulk operation to stdout using display_progress.
         '''
         open_files_function = \
-            open_files_function or self.open_files_writeable
+            open_files_function or self._data_writer.open_files_writeable
         process_data_update_function = \
             process_data_update_function or self.__process_data_to_initialize
         frequency = frequency or self._default_frequency
-        batch_size = 200 if frequency is not bar.Frequency.MINUTE else 500
-        sleep = sleep if frequency is not bar.Frequency.MINUTE else None
+        queue_size = 100 if frequency is not bar.Frequency.MINUTE else 500
 
         display_progress = True if len(symbols) > 1 else False
         # Load the latest stored datetime for the requested combination of
@@ -301,7 +484,7 @@ class Updater(providers.OpenFilesMixin):
 
         for context in self.__bulk_dl_and_save(url_contexts,
             process_data_update_function, open_files_function,
-            batch_size, sleep
+            queue_size
         ):
             if display_progress:
                 current_idx += 1
@@ -315,33 +498,45 @@ class Updater(providers.OpenFilesMixin):
         if display_progress:
             if last_pct != 100:
                 printf('100%')
+            printf(self.format_pipeline_metrics())
 
     def __bulk_dl_and_save(self,
         url_contexts,
         process_data_update_function,
         open_files_function,
-        batch_size=None,
-        sleep=None
+        queue_size=None
     ):
-        # download, process and update/save
-        for url_contexts in utils.batch(url_contexts, size=batch_size, sleep=sleep):
-            # pipeline for downloading data and preprocessing it
-            data_contexts = \
-                self._data_downloader.process_downloaded_data(
-                    self._data_downloader.verify_download(
-                        utils.bulk_download(url_contexts)))
-
-            # if necessary, convert downloaded format into a new storage format
-            if self._data_downloader.name != self._data_writer.name:
-                data_contexts = \
-                    self._data_downloader.convert_data(data_contexts, self._data_writer)
-
-            # drain for opening files and saving/updating downloaded data
-            for context in self._data_writer.save_data(
+        # download -> parse -> write run as concurrent stages joined by bounded
+        # queues, so downloads keep going while earlier symbols get saved (and
+        # pause when the writer falls behind). the downloader's rate limiter
+        # paces the requests.
+        def download(url_contexts):
+            return utils.bulk_download(url_contexts, maxsize=queue_size)
+
+        def parse(data_contexts):
+            # parsing, validating and (if necessary) converting the downloaded
+            # data into the storage format is CPU-bound, so it runs in worker
+            # processes instead of starving the downloads
+            return self._data_downloader.parse_downloaded_data(
+                self._data_downloader.verify_download(data_contexts),
+                self._data_writer, utils.get_process_pool())
+
+        def write(data_contexts):
+            # opening files and saving/updating downloaded data
+            return self._data_writer.save_data(
                 process_data_update_function(
-                    open_files_function(data_contexts))
-            ):
+                    open_files_function(data_contexts)))
+
+        from pytradelib.utils import pipeline
+        pipeline_ = pipeline.Pipeline(queue_size)
+        pipeline_.add_stage('download', download)
+        pipeline_.add_stage('parse', parse)
+        pipeline_.add_stage('write', write)
+        try:
+            for context in pipeline_.run(url_contexts):
                 yield context
+        finally:
+            self._pipeline_metrics = pipeline_.get_metrics()
         yield None # poison pill to signal end of downloads
 
 class StatsUpdater(object):
@@ -0,0 +1,154 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import os
+import zlib
+import struct
+import marshal
+
+from pytradelib.data import safeio
+
+
+'''
+A snapshot of the symbol index (every sector, industry and symbol) stored in
+a compact binary file next to the index database, so that short-lived
+processes can load the prepared index instead of querying and joining the
+database's tables again:
+
+    | header | zlib compressed marshal of (sectors, industries, symbols) |
+
+The header holds a magic string, the format version and the index version
+(see db.Database.get_index_version) the database had when the snapshot was
+taken. A snapshot whose index has changed since then is stale and doesn't get
+loaded, but writes to the database's other tables leave it current. Snapshots
+get saved by whatever updates the index (see updatemanager.Manager and
+synthetic.Generator.populate), never when reading it, and a Snapshot answers
+the same index queries as a db.Database.
+'''
+
+MAGIC = 'PTLI'
+VERSION = 2
+SUFFIX = '.index'
+
+_HEADER = struct.Struct('<4sB3xqq') # magic, version, index id, index version
+
+
+def get_snapshot_path(db_file_path):
+    return db_file_path + SUFFIX
+
+
+class Snapshot(object):
+    ''' The index as loaded from a snapshot file.
+
+    :param sectors: a list of sector names.
+    :param industries: a list of tuple(industry name, sector name)s.
+    :param symbols: a list of tuple(symbol, name, industry's index in industries)s.
+    '''
+    def __init__(self, sectors, industries, symbols):
+        self.__sectors = sectors
+        self.__industries = industries
+        self.__symbols = symbols
+        self.__symbol_positions = dict((x[0], i) for i, x in enumerate(symbols))
+        self.__industry_sectors = dict(industries)
+        self.__industry_ids = dict((x[0], i) for i, x in enumerate(industries))
+        self.__sector_industries = dict((x, []) for x in sectors)
+        for industry, sector in industries:
+            self.__sector_industries[sector].append(industry)
+        self.__industry_symbols = {}
+        for i, x in enumerate(symbols):
+            self.__industry_symbols.setdefault(x[2], []).append(i)
+
+    def __get_symbol_info(self, symbol_tuple):
+        industry, sector = self.__industries[symbol_tuple[2]]
+        return {'symbol': symbol_tuple[0], 'name': symbol_tuple[1],
+                'sector': sector, 'industry': industry}
+
+    def get_symbols(self):
+        return [x[0] for x in self.__symbols]
+
+    def get_sectors(self):
+        return list(self.__sectors)
+
+    def get_industries(self):
+        return [x[0] for x in self.__industries]
+
+    def get_symbol_info(self, symbol):
+        ''' Returns a dict with the symbol, name, sector and industry of the
+        symbol, or None if it isn't in the index.
+        '''
+        position = self.__symbol_positions.get(symbol.lower())
+        if position is None:
+            return None
+        return self.__get_symbol_info(self.__symbols[position])
+
+    def get_symbol_infos(self, industry=None):
+        ''' Returns get_symbol_info() dicts for every symbol (in industry).
+        '''
+        if industry is None:
+            return [self.__get_symbol_info(x) for x in self.__symbols]
+        positions = self.__industry_symbols.get(
+            self.__industry_ids.get(industry), [])
+        return [self.__get_symbol_info(self.__symbols[i]) for i in positions]
+
+    def get_industry_sector(self, industry):
+        return self.__industry_sectors.get(industry)
+
+    def get_sector_industries(self, sector):
+        return list(self.__sector_industries.get(sector, []))
+
+
+def save(database):
+    ''' Saves a snapshot of database's index. Returns False (without saving
+    anything) if another process changed the index while it was read.
+    '''
+    key = database.get_index_version()
+    index = database.get_index()
+    if database.get_index_version() != key:
+        return False
+
+    industries = list(index['industry_sectors'])
+    industry_ids = dict((x[0], i) for i, x in enumerate(industries))
+    symbols = [(x['symbol'], x['name'], industry_ids[x['industry']])
+               for x in index['symbols']]
+    data = zlib.compress(marshal.dumps(
+        (list(index['sectors']), industries, symbols)), 1)
+    with safeio.AtomicFile(get_snapshot_path(database.get_db_file_path()),
+                           'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, *key))
+        f.write(data)
+    return True
+
+def load(database):
+    ''' Returns the Snapshot saved for database's index, or None if there
+    isn't one (or it's stale or from another format version).
+    '''
+    snapshot_path = get_snapshot_path(database.get_db_file_path())
+    if not os.path.exists(snapshot_path):
+        return None
+    with open(snapshot_path, 'rb') as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        return None
+    header = _HEADER.unpack(data[:_HEADER.size])
+    if header[:2] != (MAGIC, VERSION) or header[2:] != database.get_index_version():
+        return None
+    try:
+        sectors, industries, symbols = marshal.loads(
+            zlib.decompress(data[_HEADER.size:]))
+    except (zlib.error, ValueError, EOFError, TypeError):
+        return None
+    return Snapshot(sectors, industries, symbols)
@@ -0,0 +1,140 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import os
+import stat
+import zlib
+import struct
+import tempfile
+import StringIO
+
+import numpy as np
+
+from pytradelib.data import safeio
+
+
+'''
+A parsed copy of a stored csv file, saved next to it so that later runs
+(backtests, optimizations) over unchanged data can load the bars' columns
+straight into a numpy recarray instead of parsing the csv text again:
+
+    | header | .npy of the recarray (see Provider.get_recarray_dtype) |
+
+Parsed files only get saved for rows that passed validation. The header holds
+a magic string, the format version, the size and modification time the csv
+file had when it was read, and checksums of the csv text and of the .npy
+payload. A parsed file is fresh while its csv file's size and mtime match. If
+only the mtime changed (eg the data store was copied) the csv text's checksum
+gets compared instead, and a parsed file with a bad payload checksum is
+ignored. Stale parsed files get replaced the next time their csv file is read.
+
+Parsed files are only a cache: each writer writes its own temporary file
+(renamed over the parsed file when complete, so concurrent readers of a cold
+file don't get in each other's way), and failing to write one (eg in a
+read-only data store) doesn't fail the read that parsed the csv file.
+'''
+
+MAGIC = 'PTLP'
+VERSION = 1
+SUFFIX = '.parsed'
+
+_HEADER = struct.Struct('<4sB3xdqII') # magic, version, csv mtime, csv size, csv checksum, payload checksum
+
+
+def get_parsed_path(file_path):
+    return file_path + SUFFIX
+
+def get_source_key(f):
+    ''' Returns tuple(mtime, size) of the open (csv) file f.
+    '''
+    stat = os.fstat(f.fileno())
+    return stat.st_mtime, stat.st_size
+
+def get_checksum(data):
+    return zlib.adler32(data) & 0xffffffff
+
+def save(file_path, source_key, source_checksum, recarray):
+    ''' Saves the recarray parsed from the csv file at file_path, whose
+    tuple(mtime, size) (see get_source_key) and text's checksum were
+    source_key and source_checksum when it was read. Returns False (leaving
+    any existing parsed file alone) if the parsed file couldn't be written.
+    '''
+    payload = StringIO.StringIO()
+    np.save(payload, np.asarray(recarray).view(np.ndarray))
+    payload = payload.getvalue()
+    parsed_path = get_parsed_path(file_path)
+    temp_path = None
+    try:
+        # the temporary file's suffix lets safeio.check_data_store clean up
+        # after writers that crashed
+        fd, temp_path = tempfile.mkstemp(
+            prefix=os.path.basename(parsed_path) + '.',
+            suffix=safeio.TEMP_SUFFIX,
+            dir=os.path.dirname(parsed_path) or '.')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, source_key[0], source_key[1],
+                                 source_checksum, get_checksum(payload)))
+            f.write(payload)
+        # readable by whoever can read the csv file (mkstemp's are private)
+        os.chmod(temp_path, stat.S_IMODE(os.stat(file_path).st_mode))
+        os.rename(temp_path, parsed_path)
+    except (IOError, OSError):
+        if temp_path is not None and os.path.exists(temp_path):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        return False
+    return True
+
+def load(file_path, dtype, read_text=None):
+    ''' Returns the recarray saved for the csv file at file_path, or None if
+    there isn't one (or it's stale, corrupt, or not of dtype).
+
+    :param read_text: a function returning the csv text, to compare checksums
+        with when only the csv file's mtime changed.
+    '''
+    parsed_path = get_parsed_path(file_path)
+    try:
+        with open(file_path, 'rb') as f:
+            source_key = get_source_key(f)
+        with open(parsed_path, 'rb') as f:
+            data = f.read()
+    except (IOError, OSError):
+        return None
+    if len(data) < _HEADER.size:
+        return None
+    magic, version, mtime, size, source_checksum, checksum = \
+        _HEADER.unpack(data[:_HEADER.size])
+    if (magic, version) != (MAGIC, VERSION) or size != source_key[1]:
+        return None
+    payload = data[_HEADER.size:]
+    if get_checksum(payload) != checksum:
+        return None
+    if mtime != source_key[0]:
+        if read_text is None or get_checksum(read_text()) != source_checksum:
+            return None
+    try:
+        recarray = np.lib.format.read_array(StringIO.StringIO(payload))
+    except ValueError:
+        return None
+    if recarray.dtype != dtype:
+        return None
+    if mtime != source_key[0]:
+        # unchanged after all; don't compare checksums again next time
+        save(file_path, source_key, source_checksum, recarray)
+    return recarray.view(np.recarray)
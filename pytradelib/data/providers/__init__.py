@@ -21,6 +21,7 @@ import importlib
 
 from pytradelib import utils
 from pytradelib import settings
+from pytradelib.data import safeio
 
 
 class ProviderFactory(object):
@@ -97,10 +98,16 @@ class OpenFilesMixin(object):
             file_path = context['file_path']
             if mode == 'w':
                 utils.mkdir_p(os.path.dirname(file_path))
-            compression = settings.DATA_COMPRESSION
-            if compression == 'gz':
-                f = gzip.open(file_path, mode)
-            elif not compression or compression == 'lz4':
+            if settings.DATA_COMPRESSION:
+                # compressed files are chunked containers (see data.chunked)
+                mode += 'b'
+            # writes are crash-safe: new files only replace file_path once
+            # they're complete, and in-place updates are journaled (see safeio)
+            if mode.startswith('w'):
+                f = safeio.AtomicFile(file_path, mode)
+            elif mode.startswith('r+'):
+                f = safeio.JournaledFile(file_path, mode)
+            else:
                 f = open(file_path, mode)
             context['_open_file'] = f
             yield data, context
@@ -17,16 +17,27 @@
 
 import os
 
+import numpy as np
+
 from pytradelib import bar
 from pytradelib import utils
 from pytradelib import barfeed
 from pytradelib import settings
+from pytradelib.data import chunked
 from pytradelib.data import providers
+from pytradelib.data import parsedcache
+from pytradelib.data import crosssection
 from pytradelib.utils import printf
-from pytradelib.failed import Symbols as FailedSymbols
+from pytradelib.data.failed import Symbols as FailedSymbols
 
 
-class Provider(providers.Provider):
+class Provider(providers.Provider, providers.OpenFilesMixin):
+    ''' The base class of historical data providers. Providers double as the
+    data store for their format: the default implementation stores every
+    symbol's rows in a csv file (see get_file_path), and stores that aren't
+    file based override the open_files_*, read_*_rows, update_data and
+    save_data methods.
+    '''
     def __init__(self):
         self.__bar_filter = None
 
@@ -37,6 +48,9 @@ class Provider(providers.Provider):
     def set_bar_filter(self, bar_filter):
         self.__bar_filter = bar_filter
 
+    def get_bar_filter(self):
+        return self.__bar_filter
+
     @utils.lower
     def get_url(self, symbol, context):
         raise NotImplementedError()
@@ -57,7 +71,7 @@ class Provider(providers.Provider):
     def get_file_paths(self, symbol_contexts):
         for symbol, context in symbol_contexts:
             context['symbol'] = symbol
-            context['file_path'] = self.get_file_path(symbol, frequency)
+            context['file_path'] = self.get_file_path(symbol, context['frequency'])
             yield symbol, context
 
     @utils.lower
@@ -66,12 +80,319 @@ class Provider(providers.Provider):
             return True
         return False
 
+    @utils.lower
+    def get_data_version(self, symbol, frequency):
+        ''' Returns a value that changes whenever the symbol's stored data does
+        (the path, mtime and size of its file), or None if it isn't stored.
+        '''
+        file_path = self.get_file_path(symbol, frequency)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return file_path, stat.st_mtime, stat.st_size
+
+    def read_rows(self, symbol_contexts, from_date_time=None, to_date_time=None):
+        ''' Reads stored data, yielding tuple(rows, context)s with the rows
+        (oldest first, without the header) of every symbol in turn, limited to
+        the rows with from_date_time <= date time <= to_date_time (either can
+        be None). Symbols without any matching rows get skipped.
+        '''
+        symbol_contexts = [x for x in symbol_contexts
+                           if self.symbol_initialized(x[0], x[1]['frequency'])]
+        for symbol, context in self.open_files_readable(
+            self.get_file_paths(symbol_contexts)
+        ):
+            f = context.pop('_open_file')
+            if settings.PARSED_CACHE and not (from_date_time or to_date_time):
+                # whole files can be saved as parsed files (see save_parsed)
+                context['source_key'] = parsedcache.get_source_key(f)
+            data = self.__read_file(f, settings.DATA_COMPRESSION)
+            f.close()
+            if 'source_key' in context:
+                context['source_checksum'] = parsedcache.get_checksum(data)
+            rows = self.__split_rows(data, context['frequency'],
+                                     from_date_time, to_date_time)
+            if rows:
+                yield rows, context
+
+    def __read_file(self, f, compression):
+        # returns the csv text of an open file
+        if compression:
+            return chunked.read(f, compression)
+        return f.read()
+
+    def __split_rows(self, data, frequency, from_date_time, to_date_time):
+        # split the file into rows, slicing off the header labels
+        rows = data.strip().split('\n')[1:]
+        if from_date_time or to_date_time:
+            rows = self.__slice_rows(rows, frequency, from_date_time, to_date_time)
+        return rows
+
+    def read_parsed(self, symbol, frequency):
+        ''' Returns the recarray (see rows_to_recarray) of every one of the
+        symbol's rows from its parsed file (see data.parsedcache), or None if
+        it doesn't have a fresh one (or settings.PARSED_CACHE is off).
+        '''
+        if not settings.PARSED_CACHE:
+            return None
+        return self.__load_parsed(self.get_file_path(symbol, frequency),
+                                  frequency, settings.DATA_COMPRESSION)
+
+    def __load_parsed(self, file_path, frequency, compression):
+        def read_text():
+            with open(file_path, 'rb') as f:
+                return self.__read_file(f, compression)
+        return parsedcache.load(file_path, self.get_recarray_dtype(frequency),
+                                read_text)
+
+    def save_parsed(self, context, rows, recarray=None):
+        ''' Saves the parsed file of rows (as read by read_rows) and their
+        recarray (parsed from rows if None). Does nothing unless the rows are
+        all of a file's rows, and valid (see verify_rows).
+        '''
+        if 'source_key' not in context or \
+          not self.verify_rows(rows, context['frequency']):
+            return
+        if recarray is None:
+            recarray = self.rows_to_recarray(rows, context['frequency'])
+        parsedcache.save(context['file_path'], context['source_key'],
+                         context['source_checksum'], recarray)
+
+    def read_file_recarray(self, file_path, frequency,
+        from_date_time=None,
+        to_date_time=None,
+        compression=None,
+        parsed_cache=False
+    ):
+        ''' Returns the recarray (see rows_to_recarray) of the rows stored in
+        file_path within the date range.
+
+        :param parsed_cache: if True, loads the recarray from file_path's
+            parsed file when it's fresh, and (re)saves it when it isn't.
+        '''
+        recarray = None
+        if parsed_cache:
+            recarray = self.__load_parsed(file_path, frequency, compression)
+        if recarray is None:
+            with open(file_path, 'rb') as f:
+                source_key = parsedcache.get_source_key(f)
+                data = self.__read_file(f, compression)
+            if not parsed_cache:
+                return self.rows_to_recarray(self.__split_rows(
+                    data, frequency, from_date_time, to_date_time), frequency)
+            rows = self.__split_rows(data, frequency, None, None)
+            recarray = self.rows_to_recarray(rows, frequency)
+            if rows and self.verify_rows(rows, frequency):
+                parsedcache.save(file_path, source_key,
+                                 parsedcache.get_checksum(data), recarray)
+        return self.slice_recarray(recarray, from_date_time, to_date_time)
+
+    def read_recarrays(self, symbols, frequency,
+        from_date_time=None,
+        to_date_time=None,
+        process_pool=None
+    ):
+        ''' Yields tuple(symbol, recarray)s of the symbols' rows within the
+        date range, in the order they finish. The files get read and parsed in
+        process_pool's worker processes (or in this process if process_pool is
+        None). Symbols without any matching rows get skipped.
+        '''
+        symbol_contexts = [(x, {'frequency': frequency}) for x in symbols
+                           if self.symbol_initialized(x, frequency)]
+        args = ((self.name, symbol, context['file_path'], frequency,
+                 from_date_time, to_date_time, settings.DATA_COMPRESSION,
+                 settings.PARSED_CACHE)
+                for symbol, context in self.get_file_paths(symbol_contexts))
+        if process_pool is None:
+            results = (load_recarray(*x) for x in args)
+        else:
+            results = process_pool.imap(load_recarray, args)
+        for symbol, recarray in results:
+            if len(recarray):
+                yield symbol, recarray
+
+    def read_date_rows(self, date_time, frequency, symbols):
+        ''' Yields tuple(rows, context)s with the row at date_time of each of
+        the symbols that has one.
+        '''
+        for rows, context in self.read_rows(
+            [(x, {'frequency': frequency}) for x in symbols],
+            date_time, date_time
+        ):
+            yield rows, context
+
+    def get_field_columns(self, frequency, fields):
+        ''' Returns the csv column index of each of the fields (see
+        crosssection.FIELDS).
+        '''
+        columns = [crosssection.field_name(x)
+                   for x in self.get_csv_column_labels(frequency).split(',')]
+        return [columns.index(field) for field in fields]
+
+    def read_cross_section(self, symbols, frequency, fields,
+        from_date_time=None,
+        to_date_time=None
+    ):
+        ''' Reads the fields of the symbols' bars within the date range as
+        date by symbol matrices (see crosssection.assemble). Returns
+        tuple(symbols, date_keys, {field: matrix}).
+        '''
+        if symbols is None:
+            raise ValueError('%s stores need a list of symbols' % self.name)
+        symbols = [x.lower() for x in symbols]
+        symbol_columns = dict((symbol, i) for i, symbol in enumerate(symbols))
+        field_columns = self.get_field_columns(frequency, fields)
+        bar_columns, date_keys, values = [], [], dict((x, []) for x in fields)
+        for rows, context in self.read_rows(
+            [(x, {'frequency': frequency}) for x in symbols],
+            from_date_time, to_date_time
+        ):
+            table = np.array(','.join(rows).split(',')).reshape(len(rows), -1)
+            bar_columns.append(
+                np.repeat(symbol_columns[context['symbol']], len(rows)))
+            date_keys.append(table[:, 0])
+            for field, column in zip(fields, field_columns):
+                values[field].append(table[:, column].astype(float))
+        if not date_keys:
+            return symbols, [], dict((x, np.empty((0, len(symbols))))
+                                     for x in fields)
+        date_keys, matrices = crosssection.assemble(symbols,
+            np.concatenate(bar_columns), np.concatenate(date_keys),
+            dict((x, np.concatenate(values[x])) for x in fields))
+        return symbols, date_keys, matrices
+
+    def get_recarray_dtype(self, frequency):
+        ''' Returns the numpy dtype of the structured arrays returned by
+        rows_to_recarray: a field per csv column (named like crosssection's
+        fields), with a datetime64 date time and a float64 or int64 (volume)
+        for the rest. The date time field is the same for every store: a
+        M8[D] 'date' for daily (and longer) bars, and a M8[s] 'date_time' for
+        intraday bars.
+        '''
+        names = [crosssection.field_name(x)
+                 for x in self.get_csv_column_labels(frequency).split(',')]
+        if frequency in (bar.Frequency.DAY, bar.Frequency.WEEK, bar.Frequency.MONTH):
+            date_field = ('date', 'M8[D]')
+        else:
+            date_field = ('date_time', 'M8[s]')
+        return np.dtype([date_field] +
+            [(x, np.int64 if x == 'volume' else np.float64) for x in names[1:]])
+
+    def rows_to_recarray(self, rows, frequency, out=None):
+        ''' Parses rows (sorted, like they're stored) into a numpy recarray
+        of get_recarray_dtype(frequency).
+
+        :param out: a preallocated structured array of that dtype and
+            len(rows) to parse into (eg one memory-mapped with numpy.memmap).
+        '''
+        dtype = self.get_recarray_dtype(frequency)
+        if out is None:
+            out = np.empty(len(rows), dtype)
+        if not rows:
+            return out.view(np.recarray)
+        date_times, values = zip(*[row.split(',', 1) for row in rows])
+        date_times = self.__parse_date_times(date_times)
+        if date_times is None:
+            date_times = np.array([self.row_to_date_time(row, frequency)
+                                   for row in rows], 'M8[s]')
+        out[dtype.names[0]] = date_times
+        # the rest are numbers: parse them all at once
+        values = np.fromstring(','.join(values), sep=',')
+        if len(values) != len(rows) * (len(dtype.names) - 1):
+            raise ValueError('malformed %s rows' % self.name)
+        values = values.reshape(len(rows), -1)
+        for i, field in enumerate(dtype.names[1:]):
+            out[field] = values[:, i]
+        return out.view(np.recarray)
+
+    def slice_recarray(self, recarray, from_date_time=None, to_date_time=None):
+        ''' Returns the rows of a recarray (sorted, like they're stored) with
+        from_date_time <= date time <= to_date_time (either can be None).
+        '''
+        if not (from_date_time or to_date_time) or not len(recarray):
+            return recarray
+        date_times = recarray[recarray.dtype.names[0]].astype('M8[s]')
+        start, end = 0, len(recarray)
+        if from_date_time:
+            start = np.searchsorted(date_times,
+                np.datetime64(from_date_time, 's'), 'left')
+        if to_date_time:
+            end = np.searchsorted(date_times,
+                np.datetime64(to_date_time, 's'), 'right')
+        return recarray[start:end]
+
+    def recarray_to_bars(self, recarray, frequency):
+        ''' Returns the list of bar.Bars of a (validated) recarray. Formats
+        without an adjusted close (eg minute bars) use the close for it, like
+        their row_to_bar does.
+        '''
+        names = recarray.dtype.names
+        date_times = recarray[names[0]].astype('M8[us]').tolist()
+        columns = dict((x, recarray[x].astype(float).tolist()) for x in names[1:])
+        columns.setdefault('adj_close', columns['close'])
+        return [bar.Bar(*x) for x in zip(date_times, *[columns[x] for x in
+            ['open', 'high', 'low', 'close', 'volume', 'adj_close']])]
+
+    def __parse_date_times(self, date_times):
+        # vectorized parsing of ISO 8601 dates (and date times), or None
+        if date_times[0].isdigit():
+            return None # unix timestamps
+        try:
+            return np.array(date_times, 'M8[s]')
+        except ValueError:
+            return None
+
+    def __slice_rows(self, rows, frequency, from_date_time, to_date_time):
+        # rows are sorted, so binary search for the ends of the range
+        def bisect(date_time, right):
+            lo, hi = 0, len(rows)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                row_date_time = self.row_to_date_time(rows[mid], frequency)
+                if row_date_time < date_time or right and row_date_time == date_time:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            return lo
+        start = bisect(from_date_time, False) if from_date_time else 0
+        end = bisect(to_date_time, True) if to_date_time else len(rows)
+        return rows[start:end]
+
     def get_csv_column_labels(self, frequency):
         raise NotImplementedError()
 
     def row_to_bar(self, row, frequency):
         raise NotImplementedError()
 
+    def row_to_date_time(self, row, frequency):
+        ''' Returns the datetime.datetime of a row without parsing the rest of it.
+        '''
+        raise NotImplementedError()
+
+    def verify_rows(self, rows, frequency):
+        ''' Quickly checks that every row's prices and volume are numbers that
+        would make a valid Bar, with vectorized comparisons instead of creating
+        Bars. Returns False if any row might be invalid (rows_to_bars tells
+        exactly which ones are).
+        '''
+        if not rows:
+            return True
+        columns = self.get_csv_column_labels(frequency).split(',')
+        values = ','.join(rows).split(',')
+        if len(values) != len(rows) * len(columns):
+            return False
+        try:
+            # every column but the date time is numeric
+            table = np.array(values).reshape(len(rows), len(columns))[:, 1:] \
+                .astype(float)
+        except ValueError:
+            return False
+        open_, high, low, close = [table[:, columns.index(x) - 1]
+                                   for x in ['Open', 'High', 'Low', 'Close']]
+        return bool(((high >= open_) & (high >= low) & (high >= close)
+                     & (low <= open_) & (low <= close)).all())
+
     @utils.lower
     def rows_to_bars(self, symbol, rows, frequency, use_bar_filter=True):
         bars = []
@@ -87,14 +408,14 @@ class Provider(providers.Provider):
 
             # check if we should add the bar when using a DateRangeFilter
             elif isinstance(self.__bar_filter, barfeed.DateRangeFilter):
-                if self.__bar_filter.includeBar(bar_):
+                if self.__bar_filter.include_bar(bar_):
                     bars.append(bar_)
                 # make sure we've gotten to the start of the date range before breaking
                 elif len(bars) > 0:
                     break
 
             # otherwise check if we should add bar_ against some other type of BarFilter
-            elif self.__bar_filter == None or self.__bar_filter.includeBar(bar_):
+            elif self.__bar_filter == None or self.__bar_filter.include_bar(bar_):
                 bars.append(bar_)
         if errors:
             return (symbol, None)
@@ -139,6 +460,30 @@ class Provider(providers.Provider):
         for data, context in data_contexts:
             yield (data.strip().split('\n')[1:], context)
 
+    def parse_downloaded_data(self, data_contexts, to_provider, process_pool=None):
+        ''' Processes, validates and (if necessary) converts downloaded data
+        into to_provider's format, in process_pool's worker processes (or in
+        this process if process_pool is None). Yields tuple(rows, context)s in
+        the order they finish; symbols with invalid rows get added to the
+        failed symbols instead.
+        '''
+        args = ((self.name, to_provider.name, data, context)
+                for data, context in data_contexts)
+        if process_pool is None:
+            results = (parse_download(*x) for x in args)
+        else:
+            results = process_pool.imap(parse_download, args)
+        for rows, context in results:
+            if context.get('error'):
+                symbol = context['symbol']
+                errors = FailedSymbols.get_error(symbol) \
+                    if symbol in FailedSymbols else None
+                if isinstance(errors, dict):
+                    errors.update(context['error'])
+                FailedSymbols.add_failed(symbol, errors or context['error'])
+                continue
+            yield rows, context
+
     def convert_data(self, data_contexts, to_provider):
         for rows, context in data_contexts:
             symbol = context['symbol']
@@ -154,26 +499,25 @@ class Provider(providers.Provider):
         for update_rows, context in data_contexts:
             f = context['_open_file']
             # read existing data, relying on string sorting for date comparisons
-            if utils.supports_seeking(settings.DATA_COMPRESSION):
+            if settings.DATA_COMPRESSION:
+                # the newest stored datetime is in the container's block index
+                newest_existing_datetime = chunked.get_last_key(
+                    f, settings.DATA_COMPRESSION) or ''
+            else:
                 # read the tail of the file to rows and get newest stored datetime
-                new_rows = []
                 try: f.seek(-512, 2)
                 except IOError: f.seek(0)
-                newest_existing_datetime = f.read().split('\n')[-1].split(',')[0]
-
-            elif settings.DATA_COMPRESSION == 'lz4':
-                # read entire file to rows and get newest stored datetime
-                new_rows = lz4.loads(f.read()).strip().split('\n')
-                newest_existing_datetime = new_rows[-1].split(',')[0]
+                newest_existing_datetime = f.read().strip().split('\n')[-1].split(',')[0]
 
             # only add new rows if row datetime is greater than stored datetime
+            new_rows = []
             for row in update_rows:
                 row_datetime = row.split(',')[0]
                 if row_datetime > newest_existing_datetime:
                     new_rows.append(row)
 
             # seek to the proper place in the file in preparation for write_data
-            if utils.supports_seeking(settings.DATA_COMPRESSION):
+            if not settings.DATA_COMPRESSION:
                 # jump to the end of the file so we only update existing data
                 try: f.seek(-1, 2)
                 except IOError: printf('unexpected file seeking bug :(', f.name)
@@ -181,9 +525,6 @@ class Provider(providers.Provider):
                 last_char = f.read()
                 if last_char != '\n':
                     f.write('\n')
-            elif settings.DATA_COMPRESSION == 'lz4':
-                # jump to the beginning of the file so we rewrite everything
-                f.seek(0)
 
             yield (new_rows, context)
 
@@ -191,19 +532,20 @@ class Provider(providers.Provider):
         for rows, context in data_contexts:
             f = context.pop('_open_file')
             if rows:
-                bar_ = self.row_to_bar(
-                    rows[-1], context['frequency'])
-                if isinstance(bar_, bar.Bar):
-                    context['to_date_time'] = bar_.get_date_time()
-                else:
+                try:
+                    context['to_date_time'] = self.row_to_date_time(
+                        rows[-1], context['frequency'])
+                except ValueError as e:
                     printf('latest datetime for %s was invalid: %s' % (
-                                           context['symbol'], bar_))
-
-                data = '%s\n' % '\n'.join(rows)
-                if settings.DATA_COMPRESSION == 'lz4':
-                    data = lz4.dumps(data)
+                                           context['symbol'], e))
 
-                f.write(data)
+                if settings.DATA_COMPRESSION and f.mode.startswith('r'):
+                    # only compress and append the new rows
+                    chunked.append(f, settings.DATA_COMPRESSION, rows)
+                elif settings.DATA_COMPRESSION:
+                    chunked.write(f, settings.DATA_COMPRESSION, rows[0], rows[1:])
+                else:
+                    f.write('%s\n' % '\n'.join(rows))
                 f.close()
                 yield context
             else:
@@ -213,3 +555,49 @@ class Provider(providers.Provider):
                     os.remove(file_path)
                 continue
 
+
+def load_recarray(provider_name, symbol, file_path, frequency, from_date_time,
+    to_date_time, compression, parsed_cache
+):
+    ''' Returns tuple(symbol, recarray) for a symbol's file (see
+    Provider.read_file_recarray). This runs in worker processes, so it takes
+    every setting it needs as an argument.
+    '''
+    provider = providers.ProviderFactory.get_data_provider(provider_name)
+    return symbol, provider.read_file_recarray(file_path, frequency,
+        from_date_time, to_date_time, compression, parsed_cache)
+
+def parse_download(from_provider_name, to_provider_name, data, context):
+    ''' Turns one download's raw text into a list of rows in the to provider's
+    format (oldest first, without the header), validating every row. This runs
+    in worker processes, so it takes and returns only plain data: returns
+    tuple(rows, context), with context['error'] set to a dict of
+    {line_number: error} (and rows None) if any rows were invalid.
+    '''
+    from_provider = providers.ProviderFactory.get_data_provider(from_provider_name)
+    to_provider = providers.ProviderFactory.get_data_provider(to_provider_name)
+    frequency = context['frequency']
+    [(rows, context)] = from_provider.process_downloaded_data([(data, context)])
+
+    # when the formats match, valid rows get stored exactly as downloaded
+    if from_provider.name == to_provider.name \
+      and from_provider.verify_rows(rows, frequency):
+        return rows, context
+
+    bars = []
+    errors = {}
+    for i, row in enumerate(rows):
+        try:
+            bar_ = from_provider.row_to_bar(row, frequency)
+        except (ValueError, IndexError) as e:
+            bar_ = 'unparsable row "%s": %s' % (row, e)
+        if isinstance(bar_, str):
+            errors['%i' % (i + 2)] = bar_ # +2 for the header and 0-indexing
+        else:
+            bars.append(bar_)
+    if errors:
+        context['error'] = errors
+        return None, context
+    if from_provider.name != to_provider.name:
+        rows = [to_provider.bar_to_row(bar_, frequency) for bar_ in bars]
+    return rows, context
@@ -21,9 +21,10 @@ try: import simplejson as json
 except: import json
 
 from pytradelib import utils
+from pytradelib import settings
 from pytradelib.data import db
 from pytradelib.data import providers
-from pytradelib.failed import Symbols as FailedSymbols
+from pytradelib.data.failed import Symbols as FailedSymbols
 
 
 class YQLMixin(object):
@@ -31,7 +32,7 @@ class YQLMixin(object):
         return 'YahooYQL' + suffix if suffix else 'YahooYQL'
 
     def _get_yql_url(self, yql):
-        base_url = 'http://query.yahooapis.com/v1/public/yql'
+        base_url = settings.YAHOO_YQL_URL
         query = urllib.urlencode({
             'q': yql,
             'env': 'store://datatables.org/alltableswithkeys',
@@ -124,8 +125,9 @@ class Sectors(YQLMixin, providers.Provider):
 
     def save_data(self, data_context):
         data, context = [x for x in data_context][0]
-        self._db.insert_or_update_sectors(data['sectors'])
-        self._db.insert_or_update_industries(data['industries'])
+        with self._db.transaction():
+            self._db.insert_or_update_sectors(data['sectors'])
+            self._db.insert_or_update_industries(data['industries'])
         yield context
 
 
@@ -0,0 +1,361 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import os
+import sqlite3
+import datetime
+
+import numpy as np
+
+from pytradelib import bar
+from pytradelib import utils
+from pytradelib import settings
+from pytradelib.utils import printf
+from pytradelib.data import db
+from pytradelib.data import crosssection
+from pytradelib.data.providers import historical
+
+
+'''
+A data store keeping every symbol's bars in one SQLite table (in a database
+next to the index database, data_dir/bars.sqlite) instead of in csv files.
+Select it with settings.DATA_STORE_FORMAT = 'SQLite'.
+
+The bar table is clustered on its primary key (symbol_id, frequency,
+date_time), so a symbol's bars for any date range are a single range scan
+of the table, and an index on (frequency, date_time) makes the bars of every
+symbol on one date another single scan.
+
+Rows are exchanged with the rest of the pipeline in the same csv format the
+file stores use (with the date time formatted as settings.DATE_FORMAT, and
+prices as their repr, so that they read back exactly).
+
+It needs SQLite 3.8.2 or newer (for its WITHOUT ROWID table).
+'''
+
+COLUMNS = ['Date Time', 'Open', 'High', 'Low', 'Close', 'Volume', 'Adj Close']
+MIN_SQLITE_VERSION = (3, 8, 2)
+
+# the columns of a bar, and their csv row (like Provider.bar_to_row's; SQL's
+# own formatting would round the prices to 15 significant digits)
+_ROW_COLUMNS = 'date_time, open, high, low, close, volume, adj_close'
+_ROW_FORMAT = '%s,%r,%r,%r,%r,%i,%r'
+
+
+class BarDatabase(object):
+    def __init__(self, db_file_path):
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise Exception('the SQLite data store needs SQLite %s or newer, but '
+                            'python is linked against SQLite %s' % (
+                '.'.join(map(str, MIN_SQLITE_VERSION)), sqlite3.sqlite_version))
+        utils.mkdir_p(os.path.dirname(db_file_path) or settings.DATA_DIR)
+        self._connections = db.get_connection_manager(db_file_path)
+        self.__symbol_ids = None
+        with self._connections.transaction() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS bar_symbol ('
+                'symbol_id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'symbol TEXT UNIQUE NOT NULL)')
+            connection.execute('CREATE TABLE IF NOT EXISTS bar ('
+                'symbol_id INTEGER NOT NULL REFERENCES bar_symbol (symbol_id), '
+                'frequency TEXT NOT NULL, '
+                'date_time TEXT NOT NULL, '
+                'open REAL, high REAL, low REAL, close REAL, volume INTEGER, '
+                'adj_close REAL, '
+                'PRIMARY KEY (symbol_id, frequency, date_time)) WITHOUT ROWID')
+            connection.execute('CREATE INDEX IF NOT EXISTS '
+                'bar_frequency_date_time_idx ON bar (frequency, date_time)')
+
+    def transaction(self):
+        return self._connections.transaction()
+
+    def is_current(self):
+        return self._connections.is_current()
+
+    def get_symbol_ids(self):
+        if self.__symbol_ids is None:
+            with self._connections.reader() as connection:
+                self.__symbol_ids = dict(connection.execute(
+                    'SELECT symbol, symbol_id FROM bar_symbol').fetchall())
+        return self.__symbol_ids
+
+    def get_symbol_id(self, symbol, create=False):
+        symbol_ids = self.get_symbol_ids()
+        if symbol not in symbol_ids and create:
+            with self._connections.transaction() as connection:
+                connection.execute(
+                    'INSERT OR IGNORE INTO bar_symbol (symbol) VALUES (?)', (symbol,))
+                symbol_ids[symbol] = connection.execute(
+                    'SELECT symbol_id FROM bar_symbol WHERE symbol=?',
+                    (symbol,)).fetchone()[0]
+        return symbol_ids.get(symbol)
+
+    def get_newest_date_time(self, symbol_id, frequency):
+        with self._connections.reader() as connection:
+            return connection.execute('SELECT max(date_time) FROM bar '
+                'WHERE symbol_id=? AND frequency=?',
+                (symbol_id, frequency)).fetchone()[0]
+
+    def has_bars(self, symbol_id, frequency):
+        with self._connections.reader() as connection:
+            return connection.execute('SELECT 1 FROM bar '
+                'WHERE symbol_id=? AND frequency=? LIMIT 1',
+                (symbol_id, frequency)).fetchone() is not None
+
+    def get_rows(self, symbol_id, frequency, from_date_time=None, to_date_time=None):
+        sql = ['SELECT %s FROM bar WHERE symbol_id=? AND frequency=?' % _ROW_COLUMNS]
+        params = [symbol_id, frequency]
+        if from_date_time:
+            sql.append('AND date_time >= ?')
+            params.append(from_date_time)
+        if to_date_time:
+            sql.append('AND date_time <= ?')
+            params.append(to_date_time)
+        sql.append('ORDER BY date_time')
+        with self._connections.reader() as connection:
+            return [_ROW_FORMAT % x for x in connection.execute(' '.join(sql), params)]
+
+    def get_date_rows(self, frequency, date_time):
+        ''' Returns a list of tuple(symbol, row)s.
+        '''
+        sql = 'SELECT bar_symbol.symbol, %s FROM bar ' \
+              'JOIN bar_symbol ON bar_symbol.symbol_id=bar.symbol_id ' \
+              'WHERE frequency=? AND date_time=?' % _ROW_COLUMNS
+        with self._connections.reader() as connection:
+            return [(x[0], _ROW_FORMAT % x[1:]) for x in
+                    connection.execute(sql, (frequency, date_time))]
+
+    def get_date_range_values(self, frequency, fields,
+        from_date_time=None,
+        to_date_time=None
+    ):
+        ''' Returns a list of tuple(symbol_id, date_time, *fields) for every
+        bar within the date range, in one scan of the date time index.
+        '''
+        sql = ['SELECT symbol_id, date_time, %s FROM bar '
+               'INDEXED BY bar_frequency_date_time_idx WHERE frequency=?'
+               % ', '.join(fields)]
+        params = [frequency]
+        if from_date_time:
+            sql.append('AND date_time >= ?')
+            params.append(from_date_time)
+        if to_date_time:
+            sql.append('AND date_time <= ?')
+            params.append(to_date_time)
+        with self._connections.reader() as connection:
+            return connection.execute(' '.join(sql), params).fetchall()
+
+    def save_rows(self, symbol_id, frequency, rows, replace=False):
+        ''' Saves csv rows, replacing all of the symbol's bars at frequency if
+        replace is True.
+        '''
+        def param_gen():
+            for row in rows:
+                row = row.split(',')
+                yield (symbol_id, frequency, row[0], float(row[1]),
+                       float(row[2]), float(row[3]), float(row[4]),
+                       int(float(row[5])), float(row[6]))
+        with self._connections.transaction() as connection:
+            if replace:
+                connection.execute(
+                    'DELETE FROM bar WHERE symbol_id=? AND frequency=?',
+                    (symbol_id, frequency))
+            connection.executemany(
+                'INSERT OR REPLACE INTO bar VALUES (?,?,?,?,?,?,?,?,?)',
+                param_gen())
+
+    def delete_symbol(self, symbol_id):
+        with self._connections.transaction() as connection:
+            connection.execute('DELETE FROM bar WHERE symbol_id=?', (symbol_id,))
+
+
+class Provider(historical.Provider):
+    def __init__(self):
+        historical.Provider.__init__(self)
+        self.__databases = {}
+
+    @property
+    def name(self):
+        return 'SQLite'
+
+    def get_database(self):
+        ''' Returns the BarDatabase in the current settings.DATA_DIR.
+        '''
+        db_file_path = self.get_file_path(None, None)
+        database = self.__databases.get(db_file_path)
+        # (a database whose file got deleted or replaced gets reconnected)
+        if database is None or not database.is_current():
+            database = self.__databases[db_file_path] = BarDatabase(db_file_path)
+        return database
+
+    def get_csv_column_labels(self, frequency):
+        return ','.join(COLUMNS)
+
+    def row_to_date_time(self, row, frequency):
+        return datetime.datetime(int(row[:4]), int(row[5:7]), int(row[8:10]),
+                                 int(row[11:13]), int(row[14:16]), int(row[17:19]))
+
+    def row_to_bar(self, row, frequency):
+        date_time = self.row_to_date_time(row, frequency)
+        row = row.split(',')
+        try:
+            return bar.Bar(date_time, float(row[1]), float(row[2]),
+                float(row[3]), float(row[4]), float(row[5]), float(row[6]))
+        except AssertionError as e:
+            return str(e)
+
+    def bar_to_row(self, bar_, frequency):
+        return ','.join([
+            bar_.get_date_time().strftime(settings.DATE_FORMAT),
+            repr(bar_.get_open()),
+            repr(bar_.get_high()),
+            repr(bar_.get_low()),
+            repr(bar_.get_close()),
+            '%i' % bar_.get_volume(),
+            repr(bar_.get_adj_close())
+            ])
+
+    def get_file_path(self, symbol, frequency):
+        # every symbol is stored in the same database
+        return os.path.join(settings.DATA_DIR, 'bars.sqlite')
+
+    @utils.lower
+    def symbol_initialized(self, symbol, frequency):
+        database = self.get_database()
+        symbol_id = database.get_symbol_id(symbol)
+        return symbol_id is not None and \
+            database.has_bars(symbol_id, bar.FrequencyToStr[frequency])
+
+    def get_data_version(self, symbol, frequency):
+        # any write to the database changes every symbol's version
+        db_file_path = self.get_file_path(symbol, frequency)
+        if not os.path.exists(db_file_path):
+            return None
+        return (db_file_path,) + db.get_file_key(db_file_path)
+
+    def read_parsed(self, symbol, frequency):
+        return None # there are no csv files to keep parsed copies of
+
+    def __date_time_key(self, date_time):
+        if date_time is None:
+            return None
+        return date_time.strftime(settings.DATE_FORMAT)
+
+    def read_rows(self, symbol_contexts, from_date_time=None, to_date_time=None):
+        database = self.get_database()
+        from_key = self.__date_time_key(from_date_time)
+        to_key = self.__date_time_key(to_date_time)
+        for symbol, context in symbol_contexts:
+            context['symbol'] = symbol
+            symbol_id = database.get_symbol_id(symbol.lower())
+            if symbol_id is None:
+                continue
+            rows = database.get_rows(symbol_id,
+                bar.FrequencyToStr[context['frequency']], from_key, to_key)
+            if rows:
+                yield rows, context
+
+    def read_recarrays(self, symbols, frequency,
+        from_date_time=None,
+        to_date_time=None,
+        process_pool=None
+    ):
+        # the bars all come from one database, so process_pool goes unused
+        for rows, context in self.read_rows(
+            [(x, {'frequency': frequency}) for x in symbols],
+            from_date_time, to_date_time
+        ):
+            yield context['symbol'], self.rows_to_recarray(rows, frequency)
+
+    def read_date_rows(self, date_time, frequency, symbols=None):
+        if symbols is not None:
+            symbols = set(x.lower() for x in symbols)
+        for symbol, row in self.get_database().get_date_rows(
+            bar.FrequencyToStr[frequency], self.__date_time_key(date_time)
+        ):
+            if symbols is None or symbol in symbols:
+                yield [row], {'symbol': symbol, 'frequency': frequency}
+
+    def read_cross_section(self, symbols, frequency, fields,
+        from_date_time=None,
+        to_date_time=None
+    ):
+        # every symbol's bars come from one (date-major) scan of the index
+        database = self.get_database()
+        symbol_ids = database.get_symbol_ids()
+        if symbols is None:
+            symbols = sorted(symbol_ids.keys())
+        symbols = [x.lower() for x in symbols]
+        id_columns = dict((symbol_ids[x], i) for i, x in enumerate(symbols)
+                          if x in symbol_ids)
+        for field in fields:
+            if field not in crosssection.FIELDS:
+                raise ValueError('unknown field "%s"' % field)
+        results = [x for x in database.get_date_range_values(
+            bar.FrequencyToStr[frequency], fields,
+            self.__date_time_key(from_date_time),
+            self.__date_time_key(to_date_time)) if x[0] in id_columns]
+        if not results:
+            return symbols, [], dict((x, np.empty((0, len(symbols))))
+                                     for x in fields)
+        columns = zip(*results)
+        date_keys, matrices = crosssection.assemble(symbols,
+            [id_columns[x] for x in columns[0]], columns[1],
+            dict((field, np.array(columns[i + 2], dtype=float))
+                 for i, field in enumerate(fields)))
+        return symbols, date_keys, matrices
+
+    # nothing to open: the bars go straight to (and from) the database
+    def open_files_readable(self, data_contexts):
+        return data_contexts
+
+    def open_files_writeable(self, data_contexts):
+        return data_contexts
+
+    def open_files_updatable(self, data_contexts):
+        return data_contexts
+
+    def update_data(self, data_contexts):
+        database = self.get_database()
+        for update_rows, context in data_contexts:
+            symbol_id = database.get_symbol_id(context['symbol'].lower())
+            newest_existing_datetime = symbol_id and database.get_newest_date_time(
+                symbol_id, bar.FrequencyToStr[context['frequency']]) or ''
+
+            # only add new rows if row datetime is greater than stored datetime
+            new_rows = [row for row in update_rows
+                        if row.split(',', 1)[0] > newest_existing_datetime]
+            yield (new_rows, context)
+
+    def save_data(self, data_contexts):
+        database = self.get_database()
+        for rows, context in data_contexts:
+            frequency = context['frequency']
+            # initializing rows start with the column labels (see
+            # historical.Updater): they replace whatever was stored before
+            replace = bool(rows) and rows[0] == self.get_csv_column_labels(frequency)
+            if replace:
+                rows = rows[1:]
+            if not rows:
+                continue
+            try:
+                context['to_date_time'] = self.row_to_date_time(rows[-1], frequency)
+            except ValueError as e:
+                printf('latest datetime for %s was invalid: %s' % (
+                                       context['symbol'], e))
+            symbol_id = database.get_symbol_id(context['symbol'].lower(), create=True)
+            database.save_rows(symbol_id, bar.FrequencyToStr[frequency], rows, replace)
+            yield context
@@ -25,7 +25,7 @@ from pytradelib import utils
 from pytradelib.data import db
 from pytradelib.data import providers
 from pytradelib.data.providers.index import YQLMixin
-from pytradelib.failed import Symbols as FailedSymbols
+from pytradelib.data.failed import Symbols as FailedSymbols
 
 
 class Provider(YQLMixin, providers.Provider):
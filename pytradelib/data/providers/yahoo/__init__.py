@@ -46,6 +46,9 @@ class Provider(historical.Provider):
     def row_to_bar(self, row, frequency):
         return self.__managers[frequency].row_to_bar(row)
 
+    def row_to_date_time(self, row, frequency):
+        return self.__managers[frequency].row_to_date_time(row)
+
     def bar_to_row(self, bar_, frequency):
         return self.__managers[frequency].bar_to_row(bar_)
 
@@ -19,6 +19,7 @@ import datetime
 
 from pytradelib import utils
 from pytradelib import bar
+from pytradelib import settings
 
 
 class YahooFrequencyProvider(object):
@@ -29,10 +30,12 @@ class YahooFrequencyProvider(object):
     def get_csv_column_labels(self):
         return ','.join(self.__columns)
 
+    def row_to_date_time(self, row):
+        return datetime.datetime(int(row[:4]), int(row[5:7]), int(row[8:10]))
+
     def row_to_bar(self, row):
+        date = self.row_to_date_time(row)
         row = row.split(',')
-        dt = row[0]
-        date = datetime.datetime(int(dt[:4]), int(dt[5:7]), int(dt[8:10]))
         open_ = float(row[1])
         high = float(row[2])
         low = float(row[3])
@@ -67,7 +70,7 @@ class YahooFrequencyProvider(object):
         if frequency not in \
           [bar.Frequency.DAY, bar.Frequency.WEEK, bar.Frequency.MONTH]:
             frequency = bar.Frequency.DAY
-        url = 'http://ichart.finance.yahoo.com/table.csv'\
+        url = settings.YAHOO_ICHART_URL + \
             '?s=%s&a=%d&b=%d&c=%d&d=%d&e=%d&f=%d&g=%s&ignore=.csv' % (
                 symbol,
                 from_date.month-1, # Yahoo's months are 0-indexed
@@ -21,7 +21,7 @@ import calendar
 from pytradelib import utils
 from pytradelib import bar
 from pytradelib import settings
-from pytradelib.failed import Symbols as FailedSymbols
+from pytradelib.data.failed import Symbols as FailedSymbols
 
 
 class YahooFrequencyProvider(object):
@@ -41,12 +41,16 @@ class YahooFrequencyProvider(object):
     def get_csv_column_labels(self):
         return ','.join(self.__columns)
 
-    def row_to_bar(self, row):
-        row = row.split(',')
+    def row_to_date_time(self, row):
+        dt = row.split(',', 1)[0]
         try:
-            date = datetime.datetime.fromtimestamp(int(row[0]))
+            return datetime.datetime.fromtimestamp(int(dt))
         except ValueError:
-            date = datetime.datetime.strptime(row[0], settings.DATE_FORMAT)
+            return datetime.datetime.strptime(dt, settings.DATE_FORMAT)
+
+    def row_to_bar(self, row):
+        date = self.row_to_date_time(row)
+        row = row.split(',')
         close = float(row[1])
         high = float(row[2])
         low = float(row[3])
@@ -22,11 +22,12 @@ try: import simplejson as json
 except: import json
 
 from pytradelib import utils
-from pytradelib.failed import Symbols as FailedSymbols
+from pytradelib import settings
+from pytradelib.data.failed import Symbols as FailedSymbols
 
 
 def __get_yql_url(yql):
-    base_url = 'http://query.yahooapis.com/v1/public/yql'
+    base_url = settings.YAHOO_YQL_URL
     query = urllib.urlencode({
         'q': yql,
         'env': 'store://datatables.org/alltableswithkeys',
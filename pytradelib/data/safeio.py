@@ -0,0 +1,311 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import os
+import base64
+
+try: import simplejson as json
+except: import json
+
+from pytradelib import settings
+from pytradelib.utils import printf
+from pytradelib.data import chunked
+
+
+'''
+Crash-safe writes for the historical data store.
+
+New files are written through an AtomicFile: the data goes to a temporary
+file that's fsync'd and then renamed over the real path, so a file either has
+all of its new contents or (if we crash) none of them.
+
+Files updated in place (appends, and the tail rewrites of chunked containers)
+are opened as JournaledFiles: before the first byte of a file gets modified,
+its original length and any bytes about to be overwritten are saved to a
+journal next to it. The journal is removed once the update has been fsync'd,
+so a journal that's still around at startup means the update didn't finish,
+and rolling it back restores the file exactly as it was.
+
+check_data_store() recovers interrupted writes and then validates only the
+tail of every stored file (not its whole history), quarantining files it
+can't repair so that they get downloaded again.
+'''
+
+TEMP_SUFFIX = '.tmp'
+JOURNAL_SUFFIX = '.journal'
+CORRUPT_SUFFIX = '.corrupt'
+
+
+def fsync_dir(path):
+    ''' Makes a rename (or delete) in the directory path durable.
+    '''
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return # eg on platforms that can't open directories
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _write_durably(path, data):
+    temp_path = path + TEMP_SUFFIX
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(temp_path, path)
+    fsync_dir(os.path.dirname(path) or '.')
+
+
+class _FileWrapper(object):
+    def __init__(self, f, name, mode):
+        self._f = f
+        self.name = name
+        self.mode = mode
+
+    @property
+    def closed(self):
+        return self._f.closed
+
+    def read(self, *args):
+        return self._f.read(*args)
+
+    def readline(self, *args):
+        return self._f.readline(*args)
+
+    def seek(self, *args):
+        return self._f.seek(*args)
+
+    def tell(self):
+        return self._f.tell()
+
+    def flush(self):
+        return self._f.flush()
+
+    def fileno(self):
+        return self._f.fileno()
+
+    def __iter__(self):
+        return iter(self._f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class AtomicFile(_FileWrapper):
+    ''' A new file that only replaces path (atomically) once it's closed.
+    '''
+    def __init__(self, path, mode='w'):
+        _FileWrapper.__init__(self, open(path + TEMP_SUFFIX, mode), path, mode)
+
+    def write(self, data):
+        return self._f.write(data)
+
+    def truncate(self, *args):
+        return self._f.truncate(*args)
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+        os.rename(self.name + TEMP_SUFFIX, self.name)
+        fsync_dir(os.path.dirname(self.name) or '.')
+
+    def discard(self):
+        ''' Closes the file, leaving whatever was at path untouched.
+        '''
+        if not self._f.closed:
+            self._f.close()
+            os.remove(self.name + TEMP_SUFFIX)
+
+
+class JournaledFile(_FileWrapper):
+    ''' An existing file whose in-place modifications can be rolled back
+    (see recover) until it has been closed.
+    '''
+    def __init__(self, path, mode='r+'):
+        _FileWrapper.__init__(self, open(path, mode), path, mode)
+        self.__size = os.fstat(self._f.fileno()).st_size
+        self.__journal_start = None # the journal holds the original bytes from here on
+        self.__journal_data = ''
+
+    def __protect(self, position):
+        # journal the original bytes from position on, before modifying them
+        if self.__journal_start is not None and position >= self.__journal_start:
+            return
+        start = min(position, self.__size)
+        end = self.__size if self.__journal_start is None else self.__journal_start
+        current = self._f.tell()
+        self._f.seek(start)
+        self.__journal_data = self._f.read(end - start) + self.__journal_data
+        self._f.seek(current)
+        self.__journal_start = start
+        _write_durably(self.name + JOURNAL_SUFFIX, json.dumps({
+            'size': self.__size,
+            'start': start,
+            'data': base64.b64encode(self.__journal_data),
+            }))
+
+    def write(self, data):
+        self.__protect(self._f.tell())
+        return self._f.write(data)
+
+    def truncate(self, size=None):
+        if size is None:
+            size = self._f.tell()
+        self.__protect(size)
+        return self._f.truncate(size)
+
+    def close(self):
+        if self._f.closed:
+            return
+        if self.__journal_start is not None:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+        self._f.close()
+        if self.__journal_start is not None:
+            os.remove(self.name + JOURNAL_SUFFIX)
+            fsync_dir(os.path.dirname(self.name) or '.')
+
+    def discard(self):
+        ''' Closes the file and rolls back any modifications.
+        '''
+        if not self._f.closed:
+            self._f.close()
+            recover(self.name)
+
+
+def recover(path):
+    ''' Rolls back an interrupted JournaledFile update of path, and removes any
+    unfinished AtomicFile. Returns True if there was anything to recover.
+    '''
+    recovered = False
+    if os.path.exists(path + TEMP_SUFFIX):
+        os.remove(path + TEMP_SUFFIX)
+        recovered = True
+    journal_path = path + JOURNAL_SUFFIX
+    if os.path.exists(journal_path):
+        with open(journal_path, 'rb') as f:
+            journal = json.loads(f.read())
+        with open(path, 'r+b') as f:
+            f.seek(journal['start'])
+            f.truncate()
+            f.write(base64.b64decode(journal['data']))
+            f.flush()
+            os.fsync(f.fileno())
+        assert os.path.getsize(path) == journal['size']
+        os.remove(journal_path)
+        fsync_dir(os.path.dirname(path) or '.')
+        recovered = True
+    return recovered
+
+
+def check_tail(path, compression=None, repair=True):
+    ''' Quickly validates the end of a stored file, without parsing it all.
+    Uncompressed files must end with a complete row (with as many columns as
+    the header); if repair is True a partially written last row gets cut off.
+    Chunked containers must have an intact trailer and index. Returns True if
+    the file is (now) valid.
+    '''
+    with open(path, 'r+b' if repair else 'rb') as f:
+        if compression:
+            try:
+                index = chunked.read_index(f)
+            except (IOError, ValueError, KeyError):
+                return False
+            return index.offset <= os.path.getsize(path)
+
+        header = f.readline()
+        if not header.endswith('\n'):
+            return False
+        columns = header.count(',')
+        size = os.fstat(f.fileno()).st_size
+        tail_start = max(len(header), size - 1024)
+        f.seek(tail_start)
+        tail = f.read()
+        if not tail or tail.endswith('\n') and \
+          tail[:-1].rsplit('\n', 1)[-1].count(',') == columns:
+            return True
+        if not repair:
+            return False
+
+        # cut the file back to the end of its last complete row
+        end = tail.rfind('\n')
+        while end != -1:
+            previous = tail.rfind('\n', 0, end)
+            if tail[previous + 1:end].count(',') == columns:
+                break
+            end = previous
+        if end == -1 and tail_start != len(header):
+            return False # no complete row anywhere in the tail
+        f.seek(tail_start + end + 1)
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+        printf('repaired the partially written last row of %s' % path)
+        return True
+
+
+def check_data_store(data_dir=None, repair=True):
+    ''' Recovers interrupted writes and tail-validates every stored file.
+    Files that can't be repaired are renamed to path + ".corrupt" (so their
+    symbols get downloaded again). Returns the list of quarantined paths.
+    '''
+    symbols_dir = os.path.join(data_dir or settings.DATA_DIR, 'symbols')
+    if not os.path.isdir(symbols_dir):
+        return []
+    file_names = sorted(os.listdir(symbols_dir))
+    for file_name in file_names:
+        for suffix in (TEMP_SUFFIX, JOURNAL_SUFFIX):
+            if file_name.endswith(suffix):
+                path = os.path.join(symbols_dir, file_name[:-len(suffix)])
+                if recover(path):
+                    printf('recovered an interrupted write of %s' % path)
+
+    from pytradelib.data import parsedcache # (it writes through this module)
+    quarantined = []
+    for file_name in file_names:
+        path = os.path.join(symbols_dir, file_name)
+        if not os.path.exists(path) or file_name.endswith(
+          (TEMP_SUFFIX, JOURNAL_SUFFIX, CORRUPT_SUFFIX, parsedcache.SUFFIX)):
+            continue
+        if file_name.endswith('.lz4'):
+            compression = 'lz4'
+        elif file_name.endswith('.gz'):
+            compression = 'gz'
+        else:
+            compression = None
+        if compression:
+            with open(path, 'rb') as f:
+                if not chunked.is_chunked(f):
+                    continue # a legacy single stream file; can't check it cheaply
+        if not check_tail(path, compression, repair):
+            os.rename(path, path + CORRUPT_SUFFIX)
+            quarantined.append(path)
+            printf('%s is corrupt; moved it out of the way' % path)
+    return quarantined
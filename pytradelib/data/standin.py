@@ -0,0 +1,535 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import re
+import time
+import zlib
+import struct
+import random
+import socket
+import urlparse
+import datetime
+import threading
+import SocketServer
+import BaseHTTPServer
+
+try: import simplejson as json
+except: import json
+
+import pytradelib.logger
+from pytradelib import settings
+from pytradelib.data import synthetic
+
+logger = pytradelib.logger.get_logger("standin")
+
+
+'''
+A local stand-in for the Yahoo ichart and YQL web services, serving synthetic
+data (see pytradelib.data.synthetic) so that the download pipelines can be
+load tested repeatably and without hammering (or being throttled by) Yahoo:
+
+    from pytradelib.data import standin
+    server = standin.Server(symbol_count=5000, latency=0.05,
+                            error_rates={'404': 0.01, 'reset': 0.01})
+    server.start()
+    server.install() # points settings.YAHOO_*_URL at the server
+    ...
+    print server.get_stats()
+    server.stop()
+
+It can also be run on its own with python -m pytradelib.data.standin.
+
+Failure injection:
+    latency, latency_jitter: seconds to wait before every response
+    error_rates: probabilities for each of the following to happen per request:
+        '404': an HTTP 404 Not Found
+        'reset': the connection gets reset by the server
+        'server_failed': a malformed "HTTP/1.1 server failed" status line, so
+            the client raises the same "server failed" error it gets (and
+            retries) on upstream DNS failures
+    max_requests_per_second: above this rate requests are denied with Yahoo's
+        HTTP 999 throttling response
+'''
+
+ERRORS = ['404', 'reset', 'server_failed']
+
+_QUOTES_RE = re.compile(
+    r'select\s+(.*?)\s+from\s+yahoo\.finance\.quotes\s+where\s+symbol\s+in\s*\((.*)\)',
+    re.IGNORECASE)
+_INDUSTRY_RE = re.compile(
+    r'from\s+yahoo\.finance\.industry\s+where\s+id\s+in\s*\((.*)\)',
+    re.IGNORECASE)
+_SECTORS_RE = re.compile(r'from\s+yahoo\.finance\.sectors', re.IGNORECASE)
+
+
+def _split_quoted(in_clause):
+    return [x.strip().strip('"\'') for x in in_clause.split(',') if x.strip()]
+
+def _one_or_many(list_):
+    # YQL returns a bare object instead of a list when there's only one result
+    return list_[0] if len(list_) == 1 else list_
+
+
+class TokenBucket(object):
+    ''' Allows rate requests per second on average, in bursts of up to burst.
+    '''
+    def __init__(self, rate, burst=None):
+        self.__rate = float(rate)
+        self.__burst = float(burst or max(1, rate))
+        self.__tokens = self.__burst
+        self.__last = time.time()
+        self.__lock = threading.Lock()
+
+    def take(self):
+        with self.__lock:
+            now = time.time()
+            self.__tokens = min(self.__burst,
+                self.__tokens + (now - self.__last) * self.__rate)
+            self.__last = now
+            if self.__tokens >= 1:
+                self.__tokens -= 1
+                return True
+            return False
+
+
+class DataSource(object):
+    ''' Builds the ichart csv and YQL json responses for a synthetic universe.
+    Every symbol's history is generated from its own seed, so responses are the
+    same for every request without keeping every symbol's history in memory.
+    '''
+    def __init__(self, symbol_count, seed=None, start_date=None):
+        self.__seed = seed or 0
+        self.__start_date = start_date
+        self.__end_date = datetime.date.today()
+        self.__index = synthetic.Generator(seed).get_index(symbol_count)
+        self.__symbols = dict((x['symbol'], x) for x in self.__index['symbols'])
+        self.__quotes = {}
+        self.__lock = threading.Lock()
+
+    def has_symbol(self, symbol):
+        return symbol.lower() in self.__symbols
+
+    def get_rows(self, symbol):
+        ''' Returns the symbol's Yahoo csv rows, oldest first, without the header.
+        '''
+        symbol = symbol.lower()
+        seed = (self.__seed + zlib.crc32(symbol)) & 0xffffffff
+        generator = synthetic.Generator(seed,
+            start_date=self.__start_date, end_date=self.__end_date)
+        return generator.generate_rows(symbol)
+
+    def get_csv(self, symbol, from_date, to_date, frequency='d'):
+        rows = [row for row in self.get_rows(symbol)
+                if from_date <= row[:10] <= to_date]
+        if frequency in ('w', 'm'):
+            rows = self.__resample(rows, frequency)
+        rows.reverse() # yahoo serves the most recent bar first
+        rows.insert(0, 'Date,Open,High,Low,Close,Volume,Adj Close')
+        return '\n'.join(rows) + '\n'
+
+    def __resample(self, rows, frequency):
+        def period(date):
+            date = datetime.date(int(date[:4]), int(date[5:7]), int(date[8:10]))
+            if frequency == 'w':
+                return date.isocalendar()[:2]
+            return date.year, date.month
+
+        ret = []
+        periods = []
+        for row in rows:
+            row = row.split(',')
+            key = period(row[0])
+            if not periods or periods[-1][0] != key:
+                periods.append((key, []))
+            periods[-1][1].append(row)
+        for key, period_rows in periods:
+            ret.append('%s,%s,%.2f,%.2f,%s,%i,%s' % (
+                period_rows[0][0],
+                period_rows[0][1],
+                max(float(x[2]) for x in period_rows),
+                min(float(x[3]) for x in period_rows),
+                period_rows[-1][4],
+                sum(int(x[5]) for x in period_rows) / len(period_rows),
+                period_rows[-1][6]))
+        return ret
+
+    def get_sectors(self):
+        industries = {}
+        for industry in self.__index['industries']:
+            industries.setdefault(industry['sector'], []).append({
+                'id': str(industry['yahoo_id']),
+                'name': industry['name'],
+                })
+        return [{'name': sector, 'industry': _one_or_many(industries[sector])}
+                for sector in self.__index['sectors']]
+
+    def get_industries(self, ids):
+        ret = []
+        for industry in self.__index['industries']:
+            if str(industry['yahoo_id']) not in ids:
+                continue
+            companies = [{'name': x['name'], 'symbol': x['symbol'].upper()}
+                         for x in self.__index['symbols']
+                         if x['industry'] == industry['name']]
+            result = {'id': str(industry['yahoo_id']), 'name': industry['name']}
+            if companies:
+                result['company'] = _one_or_many(companies)
+            ret.append(result)
+        return ret
+
+    def get_quotes(self, properties, symbols):
+        ret = []
+        for symbol in symbols:
+            quote = self.__get_quote(symbol)
+            if properties != ['*']:
+                quote = dict((key, quote.get(key, None)) for key in properties)
+            ret.append(quote)
+        return ret
+
+    def __get_quote(self, symbol):
+        with self.__lock:
+            if symbol in self.__quotes:
+                return self.__quotes[symbol]
+
+        quote = {'Symbol': symbol.upper()}
+        if not self.has_symbol(symbol):
+            quote['ErrorIndicationreturnedforsymbolchangedinvalid'] = \
+                'No such ticker symbol. <a href="/l">Try Symbol Lookup</a>'
+        else:
+            rows = [row.split(',') for row in self.get_rows(symbol)[-252:]]
+            closes = [float(x[4]) for x in rows]
+            volumes = [int(x[5]) for x in rows]
+            last = rows[-1]
+            last_date = datetime.date(
+                int(last[0][:4]), int(last[0][5:7]), int(last[0][8:10]))
+            quote.update({
+                'ErrorIndicationreturnedforsymbolchangedinvalid': None,
+                'Name': self.__symbols[symbol.lower()]['name'],
+                'StockExchange': 'NasdaqNM',
+                'LastTradePriceOnly': last[4],
+                'LastTradeDate': '%i/%i/%i' % (
+                    last_date.month, last_date.day, last_date.year),
+                'LastTradeTime': '4:00pm',
+                'Volume': last[5],
+                'AverageDailyVolume': '%i' % (sum(volumes[-63:]) / len(volumes[-63:])),
+                'FiftydayMovingAverage': '%.2f' % (sum(closes[-50:]) / len(closes[-50:])),
+                'TwoHundreddayMovingAverage': '%.2f' % (sum(closes[-200:]) / len(closes[-200:])),
+                'YearHigh': '%.2f' % max(float(x[2]) for x in rows),
+                'YearLow': '%.2f' % min(float(x[3]) for x in rows),
+                'MarketCapitalization': '%.2fB' % (closes[-1] * volumes[-1] / 1e7),
+                })
+        with self.__lock:
+            self.__quotes[symbol] = quote
+        return quote
+
+    def execute_yql(self, yql):
+        ''' Returns the (http status, json dict) for a YQL query.
+        '''
+        match = _QUOTES_RE.search(yql)
+        if match:
+            properties = [x.strip() for x in match.group(1).split(',')]
+            results = {'quote': _one_or_many(
+                self.get_quotes(properties, _split_quoted(match.group(2))))}
+            return 200, self.__query_results(results)
+        match = _INDUSTRY_RE.search(yql)
+        if match:
+            industries = self.get_industries(_split_quoted(match.group(1)))
+            results = {'industry': _one_or_many(industries)} if industries else None
+            return 200, self.__query_results(results)
+        if _SECTORS_RE.search(yql):
+            return 200, self.__query_results({'sector': self.get_sectors()})
+        return 400, {'error': {'lang': 'en-US',
+            'description': 'Query syntax error(s) [line 1:0 unsupported query]'}}
+
+    def __query_results(self, results):
+        count = 0
+        if results:
+            result = results.values()[0]
+            count = len(result) if isinstance(result, list) else 1
+        return {'query': {
+            'count': count,
+            'created': datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'lang': 'en-US',
+            'results': results,
+            }}
+
+
+class RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # so clients can keep their connections alive
+    server_version = 'YTS/1.0'
+    timeout = 30 # seconds before idle keep-alive connections get dropped
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.add_connection(self.connection)
+
+    def finish(self):
+        self.server.remove_connection(self.connection)
+        BaseHTTPServer.BaseHTTPRequestHandler.finish(self)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse.urlparse(self.path)
+        params = dict(urlparse.parse_qsl(url.query))
+        if url.path == '/stats':
+            return self.__send(200, json.dumps(server.get_stats()), 'application/json')
+
+        server.count('requests')
+        server.wait()
+        if not server.allow_request():
+            server.count('throttled')
+            return self.__send(999, 'Request denied', 'text/html', 'Request denied')
+
+        error = server.pick_error()
+        if error == 'reset':
+            return self.__reset()
+        elif error == 'server_failed':
+            return self.__server_failed()
+        elif error == '404':
+            return self.__not_found()
+
+        if url.path.endswith('/table.csv'):
+            self.__ichart(params)
+        elif url.path.endswith('/yql'):
+            self.__yql(params)
+        else:
+            self.__not_found(injected=False)
+
+    def __ichart(self, params):
+        source = self.server.get_data_source()
+        symbol = params.get('s', '')
+        if not source.has_symbol(symbol):
+            return self.__not_found(injected=False)
+        try:
+            from_date = '%04i-%02i-%02i' % (
+                int(params['c']), int(params['a']) + 1, int(params['b']))
+            to_date = '%04i-%02i-%02i' % (
+                int(params['f']), int(params['d']) + 1, int(params['e']))
+        except (KeyError, ValueError):
+            from_date, to_date = '0000-00-00', '9999-99-99'
+        self.server.count('ok')
+        self.__send(200, source.get_csv(symbol, from_date, to_date,
+            params.get('g', 'd')), 'text/csv')
+
+    def __yql(self, params):
+        status, data = self.server.get_data_source().execute_yql(params.get('q', ''))
+        self.server.count('ok' if status == 200 else 'yql_error')
+        self.__send(status, json.dumps(data), 'application/json')
+
+    def __send(self, status, body, content_type, message=None):
+        self.send_response(status, message)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count('bytes', len(body))
+
+    def __not_found(self, injected=True):
+        self.server.count('404' if injected else 'not_found')
+        self.__send(404, '<html><body>Not Found</body></html>', 'text/html', 'Not Found')
+
+    def __reset(self):
+        # SO_LINGER with a timeout of 0 makes close() send a RST
+        self.server.count('reset')
+        self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER,
+                                   struct.pack('ii', 1, 0))
+        self.connection.close()
+        self.close_connection = 1
+
+    def __server_failed(self):
+        self.server.count('server_failed')
+        self.wfile.write('HTTP/1.1 server failed\r\n')
+        self.close_connection = 1
+
+
+class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    ''' Serves synthetic Yahoo ichart csv and YQL json data.
+
+    :param host: the interface to listen on.
+    :param port: the port to listen on; 0 picks a free one (see get_url).
+    :param symbol_count: how many synthetic symbols exist.
+    :param seed: seed for the synthetic data.
+    :param start_date: the earliest possible bar date (shorter histories are faster to serve).
+    :param latency: seconds to wait before every response.
+    :param latency_jitter: up to this many random seconds get added to the latency.
+    :param error_rates: dict of per-request error probabilities, keyed by the names in ERRORS.
+    :param max_requests_per_second: requests above this rate get an HTTP 999; None to disable throttling.
+    '''
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, host='localhost', port=0, symbol_count=1000,
+        seed=None,
+        start_date=None,
+        latency=0,
+        latency_jitter=0,
+        error_rates=None,
+        max_requests_per_second=None
+    ):
+        BaseHTTPServer.HTTPServer.__init__(self, (host, port), RequestHandler)
+        error_rates = error_rates or {}
+        for error in error_rates:
+            assert error in ERRORS, 'invalid error "%s"' % error
+        assert sum(error_rates.values()) <= 1
+        self.__data_source = DataSource(symbol_count, seed, start_date)
+        self.__latency = latency
+        self.__latency_jitter = latency_jitter
+        self.__error_rates = error_rates
+        self.__bucket = None
+        if max_requests_per_second:
+            self.__bucket = TokenBucket(max_requests_per_second)
+        self.__random = random.Random(seed)
+        self.__stats = {}
+        self.__lock = threading.Lock()
+        self.__thread = None
+        self.__installed_urls = None
+        self.__connections = set()
+
+    def get_url(self):
+        host, port = self.server_address[:2]
+        return 'http://%s:%i' % (host, port)
+
+    def get_ichart_url(self):
+        return self.get_url() + '/table.csv'
+
+    def get_yql_url(self):
+        return self.get_url() + '/v1/public/yql'
+
+    def get_data_source(self):
+        return self.__data_source
+
+    def add_connection(self, connection):
+        with self.__lock:
+            self.__connections.add(connection)
+
+    def remove_connection(self, connection):
+        with self.__lock:
+            self.__connections.discard(connection)
+
+    def count(self, key, amount=1):
+        with self.__lock:
+            self.__stats[key] = self.__stats.get(key, 0) + amount
+
+    def get_stats(self):
+        ''' Returns a dict of request counts by outcome (and bytes served).
+        '''
+        with self.__lock:
+            return dict(self.__stats)
+
+    def reset_stats(self):
+        with self.__lock:
+            self.__stats = {}
+
+    def wait(self):
+        with self.__lock:
+            delay = self.__latency + self.__random.random() * self.__latency_jitter
+        if delay:
+            time.sleep(delay)
+
+    def allow_request(self):
+        return self.__bucket is None or self.__bucket.take()
+
+    def pick_error(self):
+        with self.__lock:
+            roll = self.__random.random()
+        for error in ERRORS:
+            rate = self.__error_rates.get(error, 0)
+            if roll < rate:
+                return error
+            roll -= rate
+        return None
+
+    def start(self):
+        ''' Serves requests from a background thread.
+        '''
+        self.__thread = threading.Thread(target=self.serve_forever)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        self.uninstall()
+        self.shutdown()
+        self.server_close()
+        with self.__lock:
+            connections = list(self.__connections)
+        for connection in connections: # close any idle keep-alive connections
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+        for i in xrange(100): # give their handler threads a moment to finish
+            with self.__lock:
+                if not self.__connections:
+                    break
+            time.sleep(0.01)
+        if self.__thread:
+            self.__thread.join()
+            self.__thread = None
+
+    def install(self):
+        ''' Points the Yahoo providers at this server (until uninstall is called).
+        '''
+        if self.__installed_urls is None:
+            self.__installed_urls = (settings.YAHOO_ICHART_URL, settings.YAHOO_YQL_URL)
+        settings.YAHOO_ICHART_URL = self.get_ichart_url()
+        settings.YAHOO_YQL_URL = self.get_yql_url()
+
+    def uninstall(self):
+        if self.__installed_urls is not None:
+            settings.YAHOO_ICHART_URL, settings.YAHOO_YQL_URL = self.__installed_urls
+            self.__installed_urls = None
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Serve synthetic Yahoo ichart and YQL data for load testing.')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--symbols', type=int, default=1000,
+        help='number of symbols to serve (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--latency', type=float, default=0, help='seconds')
+    parser.add_argument('--latency-jitter', type=float, default=0, help='seconds')
+    parser.add_argument('--error-404', type=float, default=0, help='probability')
+    parser.add_argument('--error-reset', type=float, default=0, help='probability')
+    parser.add_argument('--error-server-failed', type=float, default=0, help='probability')
+    parser.add_argument('--max-rps', type=float, default=None,
+        help='throttle above this many requests per second')
+    args = parser.parse_args()
+
+    server = Server(args.host, args.port, args.symbols,
+        seed=args.seed,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rates={
+            '404': args.error_404,
+            'reset': args.error_reset,
+            'server_failed': args.error_server_failed,
+            },
+        max_requests_per_second=args.max_rps)
+    print 'Serving synthetic data for %i symbols. Point PyTradeLib at it with:' % args.symbols
+    print "    settings.YAHOO_ICHART_URL = '%s'" % server.get_ichart_url()
+    print "    settings.YAHOO_YQL_URL = '%s'" % server.get_yql_url()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print server.get_stats()
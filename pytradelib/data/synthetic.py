@@ -0,0 +1,256 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import string
+import datetime
+import numpy as np
+
+from pytradelib import bar
+from pytradelib import utils
+from pytradelib import settings
+from pytradelib.utils import printf
+from pytradelib.data import db as db_
+from pytradelib.data import indexsnapshot
+from pytradelib.data.providers import ProviderFactory
+
+
+'''
+Generates realistic looking (but entirely made up) daily OHLCV histories and a
+matching sector/industry/symbol index, so that the data pipelines can be load
+tested without any network access:
+
+    from pytradelib import settings
+    from pytradelib.data import synthetic
+    settings.DATA_DIR = '/tmp/pytradelib_load_test'
+    synthetic.Generator(seed=42).populate(5000)
+
+Prices follow a geometric brownian motion with overnight gaps, the odd stock
+split (Close is unadjusted, Adj Close is) and randomly missing days, and are
+stored exactly like the historical.Updater would store downloaded data.
+'''
+
+def symbol_name(i):
+    ''' Returns a unique, lower-cased symbol for i: 0 -> "aaa", 1 -> "aab", ...
+    '''
+    letters = string.ascii_lowercase
+    ret = ''
+    while True:
+        i, remainder = divmod(i, 26)
+        ret = letters[remainder] + ret
+        if i == 0:
+            break
+    return ret.rjust(3, 'a')
+
+
+class Generator(object):
+    ''' Generates synthetic daily bars and symbol index data.
+
+    :param seed: seed for the random number generator; the same seed always generates the same data.
+    :param start_date: the earliest possible IPO date.
+    :param end_date: the date of the most recent bar (defaults to today).
+    :param gap_probability: daily probability of an overnight price gap.
+    :param split_probability: yearly probability of a stock split.
+    :param missing_day_probability: daily probability of a missing bar.
+    '''
+    def __init__(self, seed=None, start_date=None, end_date=None,
+        sector_count=10,
+        industries_per_sector=10,
+        gap_probability=0.02,
+        split_probability=0.05,
+        missing_day_probability=0.005
+    ):
+        self.__random = np.random.RandomState(seed)
+        self.__start_date = start_date or datetime.date(1990, 1, 2)
+        self.__end_date = end_date or datetime.date.today()
+        self.__sector_count = sector_count
+        self.__industries_per_sector = industries_per_sector
+        self.__gap_probability = gap_probability
+        self.__split_probability = split_probability
+        self.__missing_day_probability = missing_day_probability
+        self.__trading_days = None
+
+    def trading_days(self):
+        ''' Returns a list of all weekdays between start_date and end_date.
+        '''
+        if self.__trading_days is None:
+            ret = []
+            day = self.__start_date
+            one_day = datetime.timedelta(days=1)
+            while day <= self.__end_date:
+                if day.weekday() < 5:
+                    ret.append(day)
+                day += one_day
+            self.__trading_days = ret
+        return self.__trading_days
+
+    def get_index(self, symbol_count):
+        ''' Returns a dict with the following key/value pairs:
+        'sectors': ['sector names']
+        'industries': [{ keys: name, sector, yahoo_id }]
+        'symbols': [{ keys: symbol, name, industry }]
+        '''
+        ret = {'sectors': [], 'industries': [], 'symbols': []}
+        for i in xrange(self.__sector_count):
+            sector = 'Sector %02i' % (i + 1)
+            ret['sectors'].append(sector)
+            for j in xrange(self.__industries_per_sector):
+                yahoo_id = (i + 1) * 100 + j
+                ret['industries'].append({
+                    'name': 'Industry %i' % yahoo_id,
+                    'sector': sector,
+                    'yahoo_id': yahoo_id,
+                    })
+        for i in xrange(symbol_count):
+            symbol = symbol_name(i)
+            industry = ret['industries'][i % len(ret['industries'])]
+            ret['symbols'].append({
+                'symbol': symbol,
+                'name': '%s Corp.' % symbol.upper(),
+                'industry': industry['name'],
+                })
+        return ret
+
+    def generate_rows(self, symbol, min_bars=250):
+        ''' Returns a list of Yahoo formatted csv rows for the symbol, ordered
+        with the oldest bar first and without the header row.
+        '''
+        days = self.trading_days()
+        rng = self.__random
+        ipo_idx = rng.randint(0, max(1, len(days) - min_bars))
+        days = days[ipo_idx:]
+        keep = rng.random_sample(len(days)) >= self.__missing_day_probability
+        days = [day for day, kept in zip(days, keep) if kept]
+        n = len(days)
+        if n == 0:
+            return []
+
+        # the (split adjusted) close follows a geometric brownian motion
+        dt = 1 / 252.0
+        drift = rng.normal(0.07, 0.1)
+        volatility = rng.uniform(0.15, 0.6)
+        log_returns = (drift - volatility ** 2 / 2) * dt \
+            + volatility * np.sqrt(dt) * rng.standard_normal(n)
+        adj_close = rng.uniform(5, 200) * np.exp(np.cumsum(log_returns))
+        adj_close = np.maximum(adj_close, 0.05) # no bankruptcies, please
+
+        # opens gap away from the previous close every so often
+        gaps = rng.normal(0, 0.002, n)
+        is_gap = rng.random_sample(n) < self.__gap_probability
+        gaps[is_gap] = rng.normal(0, 0.05, is_gap.sum())
+        adj_open = np.empty(n)
+        adj_open[0] = adj_close[0] * np.exp(gaps[0])
+        adj_open[1:] = adj_close[:-1] * np.exp(gaps[1:])
+        adj_high = np.maximum(adj_open, adj_close) \
+            * (1 + np.abs(rng.normal(0, 0.01, n)))
+        adj_low = np.minimum(adj_open, adj_close) \
+            * (1 - np.minimum(np.abs(rng.normal(0, 0.01, n)), 0.5))
+        adj_volume = rng.lognormal(np.log(rng.uniform(1e4, 1e7)), 0.5, n)
+
+        # unadjusted prices are higher (and volumes lower) before each split
+        split_factor = np.ones(n)
+        for i in np.nonzero(rng.random_sample(n) < self.__split_probability * dt)[0]:
+            split_factor[:i] *= rng.choice([2, 3, 1.5])
+
+        rows = []
+        for i in xrange(n):
+            factor = split_factor[i]
+            rows.append('%s,%.2f,%.2f,%.2f,%.2f,%i,%.2f' % (
+                days[i].strftime('%Y-%m-%d'),
+                adj_open[i] * factor,
+                adj_high[i] * factor,
+                adj_low[i] * factor,
+                adj_close[i] * factor,
+                adj_volume[i] / factor,
+                adj_close[i]))
+        return rows
+
+    def populate(self, symbol_count, frequency=None, db=None):
+        ''' Writes bars for symbol_count symbols to settings.DATA_DIR/symbols
+        (in settings.DATA_STORE_FORMAT) and saves the matching index to the db.
+        Returns the list of generated symbols.
+        '''
+        frequency = frequency or bar.Frequency.DAY
+        if frequency != bar.Frequency.DAY:
+            raise NotImplementedError('only daily bars can be generated.')
+        db = db or db_.Database()
+
+        index = self.get_index(symbol_count)
+        with db.transaction():
+            db.insert_or_update_sectors(index['sectors'])
+            db.insert_or_update_industries(index['industries'])
+            db.insert_or_update_symbols([dict(x) for x in index['symbols']])
+            db.set_index_updated()
+        indexsnapshot.save(db)
+        symbols = [x['symbol'] for x in index['symbols']]
+
+        writer = Writer()
+        updated = []
+        for i, context in enumerate(writer.save(self, symbols, frequency)):
+            updated.append({
+                'symbol_id': db.get_symbol_id(context['symbol']),
+                bar.FrequencyToStr[frequency]:
+                    context['to_date_time'].strftime(settings.DATE_FORMAT),
+                })
+            if (i + 1) % 1000 == 0:
+                printf('generated %i/%i symbols' % (i + 1, symbol_count))
+        db.set_symbol_updated(updated)
+        return symbols
+
+
+class Writer(object):
+    ''' Saves generated rows with the same pipeline historical.Updater uses.
+    '''
+    def __init__(self):
+        self._generator_format = ProviderFactory.get_data_provider('yahoo')
+        self._data_writer = ProviderFactory.get_data_provider(
+                                                settings.DATA_STORE_FORMAT)
+
+    def __generate(self, generator, symbols, frequency):
+        for symbol in symbols:
+            context = {
+                'symbol': symbol,
+                'frequency': frequency,
+                'file_path': self._data_writer.get_file_path(symbol, frequency),
+                }
+            rows = generator.generate_rows(symbol)
+            rows.insert(0, self._generator_format.get_csv_column_labels(frequency))
+            yield rows, context
+
+    def save(self, generator, symbols, frequency):
+        data_contexts = self.__generate(generator, symbols, frequency)
+        if self._generator_format.name != self._data_writer.name:
+            data_contexts = self._generator_format.convert_data(
+                data_contexts, self._data_writer)
+        for context in self._data_writer.save_data(
+            self._data_writer.open_files_writeable(data_contexts)
+        ):
+            yield context
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Generate synthetic historical data for load testing.')
+    parser.add_argument('symbols', type=int, help='number of symbols to generate')
+    parser.add_argument('--data-dir', default=settings.DATA_DIR,
+        help='where to write the data (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    settings.DATA_DIR = args.data_dir
+    utils.mkdir_p(settings.DATA_DIR)
+    Generator(args.seed).populate(args.symbols)
@@ -26,6 +26,7 @@ from daemon.runner import DaemonRunner
 from pytradelib import bar
 from pytradelib.data import db as db_
 from pytradelib.data import historical
+from pytradelib.data import indexsnapshot
 from pytradelib.data.failed import Symbols as FailedSymbols
 from pytradelib.data.providers.yahoo import yql
 
@@ -154,6 +155,7 @@ class Manager(object):
             self._db.delete_symbol(symbol)
         self.__init_or_update_index(new_index)
         self._db.set_index_updated()
+        indexsnapshot.save(self._db)
 
         # FIXME: emit these changes instead of printing them
         if new_symbols:
@@ -173,9 +175,10 @@ class Manager(object):
         self._historical_updater.update_symbols(symbols, frequency)
 
     def __init_or_update_index(self, index):
-        self._db.insert_or_update_sectors(index['sectors'])
-        self._db.insert_or_update_industries(index['industry_sectors'])
-        self._db.insert_or_update_symbols(index['symbols'])
+        with self._db.transaction():
+            self._db.insert_or_update_sectors(index['sectors'])
+            self._db.insert_or_update_industries(index['industry_sectors'])
+            self._db.insert_or_update_symbols(index['symbols'])
 
     def __historical_updated_event(self, context):
         if not context or len(self.__update_cache) > 1000:
@@ -21,79 +21,110 @@ from pytradelib import utils
 from pytradelib import settings
 from pytradelib.data import db
 from pytradelib.data import containers
+from pytradelib.data import historical
+from pytradelib.data import indexsnapshot
 from pytradelib.data import updatemanager
 
 
 class Factory(object):
+    ''' The index of every sector, industry and instrument.
+
+    Nothing gets loaded up front: instruments are looked up the first time
+    each symbol is asked for, and sectors and industries only load their
+    industries and instruments once they're used. Lookups use the index's
+    snapshot (see indexsnapshot, saved whenever the index gets updated) when
+    it's up to date, and otherwise query the database (by its indexes).
+    '''
     def __init__(self):
         self.__db = db.Database()
-        self.__update_manager = updatemanager.Manager(self.__db)
-        self.__historical_manager = self.__update_manager.historical_reader
-        self.__index = self.__load_index()
+        self.__update_manager = None
+        self.__historical_reader = None
+        self.__index = None # the index snapshot, or the database
 
         self.__sectors = {}     # cache for Sector instances
         self.__industries = {}  # cache for Industry instances
         self.__instruments = {} # cache for Instrument instances
 
-    def __load_index(self):
-        if not self.__update_manager.index_initialized():
-            self.__update_manager.update_index()
-        index = self.__db.get_index()
-        index['symbols'] = dict((x['symbol'], x) for x in index['symbols'])
-        index['industry_sectors'] = dict((x, y) for x, y in index['industry_sectors'])
-        index['sector_industries'] = dict((x, []) for x in index['sectors'])
-        for industry, sector in index['industry_sectors'].items():
-            index['sector_industries'][sector].append(industry)
-        return index
+    def __get_update_manager(self):
+        if self.__update_manager is None:
+            self.__update_manager = updatemanager.Manager(self.__db)
+        return self.__update_manager
+
+    def __get_historical_reader(self):
+        if self.__historical_reader is None:
+            self.__historical_reader = historical.Reader()
+        return self.__historical_reader
+
+    def __get_index(self):
+        if self.__index is None:
+            snapshot = indexsnapshot.load(self.__db)
+            if snapshot is None and not self.__db.get_updated('symbol_index'):
+                # download the index if it's never been (which saves a snapshot)
+                self.__get_update_manager().update_index()
+                snapshot = indexsnapshot.load(self.__db)
+            self.__index = snapshot or self.__db
+        return self.__index
 
     def set_bar_filter(self, bar_filter):
-        self.__historical_manager.set_bar_filter(bar_filter)
+        self.__get_historical_reader().set_bar_filter(bar_filter)
 
     def symbols(self):
-        return sorted(self.__index['symbols'].keys())
+        return sorted(self.__get_index().get_symbols())
 
     def sectors(self):
-        return sorted(self.__index['sectors'])
+        return sorted(self.__get_index().get_sectors())
 
     def industries(self):
-        return sorted(self.__index['industry_sectors'].keys())
+        return sorted(self.__get_index().get_industries())
+
+    def __get_instrument(self, symbol_info):
+        symbol = symbol_info['symbol'].lower()
+        if symbol not in self.__instruments:
+            self.__instruments[symbol] = containers.Instrument(symbol,
+                symbol_info['name'],
+                symbol_info['sector'],
+                symbol_info['industry'],
+                self.__get_historical_reader())
+        return self.__instruments[symbol]
 
     @utils.lower
     def get_instrument(self, symbol):
         if symbol not in self.__instruments:
-            self.__instruments[symbol] = containers.Instrument(symbol,
-                self.__index['symbols'][symbol]['name'],
-                self.__index['symbols'][symbol]['sector'],
-                self.__index['symbols'][symbol]['industry'],
-                self.__historical_manager)
+            symbol_info = self.__get_index().get_symbol_info(symbol)
+            if symbol_info is None:
+                raise KeyError(symbol)
+            self.__get_instrument(symbol_info)
         return self.__instruments[symbol]
 
     def get_instruments(self, symbols=None):
-        symbols = symbols or self.__index['symbols'].keys()
+        if symbols is None:
+            # every instrument, in one query
+            return [self.__get_instrument(x)
+                    for x in self.__get_index().get_symbol_infos()]
         ret = []
         for symbol in symbols:
             ret.append(self.get_instrument(symbol))
         return ret
 
     def get_watch_list(self, list_name, symbols=None):
-        symbols = symbols or self.__index['symbols'].keys()
-        watch_list = containers.WatchList(list_name)
-        for symbol in symbols:
-            watch_list.add_instrument(self.get_instrument(symbol))
+        watch_list = containers.Instruments(list_name)
+        watch_list.set_instruments(self.get_instruments(symbols))
         return watch_list
 
     def get_industry(self, name):
         if name not in self.__industries:
-            self.__industries[name] = containers.Industry(name, self.__index['industry_sectors'][name])
-            for symbol in self.__index['industry_symbols'][name]:
-                self.__industries[name].add_instrument(self.get_instrument(symbol))
+            sector = self.__get_index().get_industry_sector(name)
+            if sector is None:
+                raise KeyError(name)
+            self.__industries[name] = containers.Industry(name, sector,
+                lambda: [self.__get_instrument(x)
+                         for x in self.__get_index().get_symbol_infos(name)])
         return self.__industries[name]
 
     def get_sector(self, name):
         if name not in self.__sectors:
-            sector = containers.Sector(name)
-            for industry_name in self.__index['sector_industries'][name]:
-                sector.add_industry(self.get_industry(industry_name))
-            sector.set_instruments()
-            self.__sectors[name] = sector
+            self.__get_index()
+            self.__sectors[name] = containers.Sector(name, lambda: [
+                self.get_industry(x)
+                for x in self.__get_index().get_sector_industries(name)])
         return self.__sectors[name]
@@ -47,6 +47,13 @@ class Event(object):
         else:
             self.__handlers.remove(handler)
 
+    def replace(self, handler, new_handler):
+        # Swaps a subscribed handler in place, so that it keeps its turn.
+        self.__handlers[self.__handlers.index(handler)] = new_handler
+
+    def get_handlers(self):
+        return list(self.__handlers)
+
     def emit(self, *parameters):
         self.__emitting = True
         for handler in self.__handlers:
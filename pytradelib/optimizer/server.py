@@ -139,6 +139,11 @@ class Server(SimpleXMLRPCServer.SimpleXMLRPCServer):
     def get_bars_frequency(self):
         return str(self.__bars_freq)
 
+    def set_strategy_parameters(self, strategy_parameters):
+        # Jobs are built from these, default_batch_size parameters at a time.
+        with self.__parameters_lock:
+            self.__parameters_iterator = iter(strategy_parameters)
+
     def get_best_job(self):
         return self.__best_job
 
@@ -212,7 +217,7 @@ class Server(SimpleXMLRPCServer.SimpleXMLRPCServer):
             self.__symbols_and_bars = pickle.dumps((symbols, loaded_bars))
             self.__bars_freq = bar_feed.get_frequency()
 
-            self.__parameters_iterator = iter(strategy_parameters)
+            self.set_strategy_parameters(strategy_parameters)
 
             if self.__auto_stop_thread:
                 self.__auto_stop_thread.start()
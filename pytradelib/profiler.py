@@ -0,0 +1,193 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import pstats
+import cProfile
+import StringIO
+from timeit import default_timer as timer
+
+import pytradelib.logger
+
+logger = pytradelib.logger.get_logger("profiler")
+
+
+class Phase(object):
+    FEED = 'feed.get_next_bars'
+    BROKER = 'broker.on_bars'
+    ANALYZERS = 'analyzers'
+    STRATEGY = 'strategy.on_bars'
+    BARS_PROCESSED = 'bars_processed' # plotter and other subscribers
+
+    ALL = [FEED, BROKER, ANALYZERS, STRATEGY, BARS_PROCESSED]
+
+
+class PhaseTimer(object):
+    def __init__(self, name):
+        self.__name = name
+        self.__total = 0.0
+        self.__calls = 0
+
+    def get_name(self):
+        return self.__name
+
+    def get_total(self):
+        """Returns the cumulative time spent in this phase, in seconds."""
+        return self.__total
+
+    def get_calls(self):
+        return self.__calls
+
+    def add(self, elapsed):
+        self.__total += elapsed
+        self.__calls += 1
+
+    def wrap(self, fn):
+        def timed(*args, **kwargs):
+            start = timer()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(timer() - start)
+        return timed
+
+
+class Profiler(object):
+    """Collects per-phase timings while a :class:`pytradelib.strategy.Strategy` runs.
+
+    :param profile_from_bar: The (0-indexed) bar at which to start capturing a cProfile. None disables cProfile capture.
+    :type profile_from_bar: int.
+    :param profile_bars: How many bars to capture with cProfile. None captures until the end of the run.
+    :type profile_bars: int.
+    :param log_report: True if the report should be logged when the run finishes.
+    :type log_report: boolean.
+
+    .. note::
+        The broker phase includes the order updated callbacks that the broker
+        emits (ie Strategy.on_enter_ok and friends).
+    """
+
+    def __init__(self, profile_from_bar=None, profile_bars=None, log_report=True):
+        assert(profile_from_bar == None or profile_from_bar >= 0)
+        assert(profile_bars == None or profile_bars > 0)
+        self.__profile_from_bar = profile_from_bar
+        self.__profile_bars = profile_bars
+        self.__log_report = log_report
+        self.__timers = dict((x, PhaseTimer(x)) for x in Phase.ALL)
+        self.__c_profile = None
+        self.__profiling = False
+        self.__bars = 0
+        self.__start_time = None
+        self.__elapsed = 0.0
+
+    def get_timer(self, phase):
+        return self.__timers[phase]
+
+    def wrap(self, phase, fn):
+        """Returns fn wrapped so that its run time counts towards phase."""
+        return self.__timers[phase].wrap(fn)
+
+    def start(self):
+        self.__bars = 0
+        self.__elapsed = 0.0
+        self.__start_time = timer()
+
+    def stop(self):
+        if self.__start_time != None:
+            self.__elapsed = timer() - self.__start_time
+            self.__start_time = None
+        self.__disable_c_profile()
+        if self.__log_report:
+            logger.info('\n%s' % self.format_report())
+
+    def on_bars(self, bars):
+        # Called once per bar, before the bars are dispatched.
+        if self.__profile_from_bar != None:
+            if self.__bars == self.__profile_from_bar:
+                self.__enable_c_profile()
+            elif self.__profiling and self.__profile_bars != None \
+              and self.__bars >= self.__profile_from_bar + self.__profile_bars:
+                self.__disable_c_profile()
+        self.__bars += 1
+
+    def __enable_c_profile(self):
+        if self.__c_profile == None:
+            self.__c_profile = cProfile.Profile()
+        self.__c_profile.enable()
+        self.__profiling = True
+
+    def __disable_c_profile(self):
+        if self.__profiling:
+            self.__c_profile.disable()
+            self.__profiling = False
+
+    def get_bars(self):
+        """Returns the number of bars processed."""
+        return self.__bars
+
+    def get_elapsed(self):
+        """Returns the wall clock time of the run, in seconds."""
+        if self.__start_time != None:
+            return timer() - self.__start_time
+        return self.__elapsed
+
+    def get_bars_per_second(self):
+        elapsed = self.get_elapsed()
+        if elapsed > 0:
+            return self.__bars / elapsed
+        return 0.0
+
+    def get_profile_stats(self):
+        """Returns a :class:`pstats.Stats` for the captured bar window, or None if nothing was captured."""
+        if self.__c_profile == None:
+            return None
+        return pstats.Stats(self.__c_profile)
+
+    def get_report(self):
+        """Returns a dict with the run totals and a dict of per-phase totals
+        (keys: total, calls, pct)."""
+        elapsed = self.get_elapsed()
+        phases = {}
+        for name, phase_timer in self.__timers.iteritems():
+            phases[name] = {
+                'total': phase_timer.get_total(),
+                'calls': phase_timer.get_calls(),
+                'pct': phase_timer.get_total() / elapsed * 100 if elapsed else 0.0,
+                }
+        return {
+            'bars': self.__bars,
+            'elapsed': elapsed,
+            'bars_per_second': self.get_bars_per_second(),
+            'phases': phases,
+            }
+
+    def format_report(self, profile_lines=20):
+        report = self.get_report()
+        lines = ['%i bars in %.3f seconds (%.1f bars/sec)' % (
+            report['bars'], report['elapsed'], report['bars_per_second'])]
+        lines.append('%-20s %12s %10s %7s' % ('phase', 'seconds', 'calls', '%'))
+        for name in Phase.ALL:
+            phase = report['phases'][name]
+            lines.append('%-20s %12.4f %10i %6.1f%%' % (
+                name, phase['total'], phase['calls'], phase['pct']))
+
+        stats = self.get_profile_stats()
+        if stats != None:
+            stream = StringIO.StringIO()
+            stats.stream = stream
+            stats.strip_dirs().sort_stats('cumulative').print_stats(profile_lines)
+            lines.append(stream.getvalue())
+        return '\n'.join(lines)
@@ -17,27 +17,320 @@
 
 import os
 import csv
+import warnings
+import datetime
+
+import numpy as np
 
 from pytradelib import utils
 from pytradelib import settings
 from pytradelib import barfeed
+from pytradelib.data import db
 from pytradelib.data import containers
+from pytradelib.data import historical
+from pytradelib.data import crosssection
 from pytradelib.barfeed import instrumentfeed
 
 
+'''
+A StockScreener computes columns for a list of instruments, filters and sorts
+them and saves the result as a csv watchlist. Screeners run in one of two
+modes:
+
+By default the instruments' bars get replayed through a bar feed, calling
+on_bars() for every date so the screener can accumulate its statistics, and
+csv_custom_columns() once per instrument at the end.
+
+Screeners defining screen_columns() are vectorized instead: their columns are
+expressions evaluated over a cross section (see data.crosssection) of every
+instrument at once, and the filter and sort order get applied in bulk:
+
+    class MyScreener(screener.StockScreener):
+        def screen_columns(self):
+            swing = abs_((Field('high') - Field('low')) / Field('low')) * 100
+            return OrderedDict([
+                ('Liquidity', Value('AverageDailyVolume') / (6.5 * 60)
+                              / floor(10000 / Value('LastTradePriceOnly'))),
+                ('MeanPercentChange', mean(swing)),
+                ('MedianPercentChange', median(swing)),
+                ])
+
+        def screen_filter(self):
+            return (Column('Liquidity') > 1) & (Column('MedianPercentChange') > 2.5)
+
+Fields are (dates x symbols) matrices of bar fields within the bar filter's
+date range, with NaN for missing bars; Values, Stats and the reductions
+(mean, median, last, ...) have one value per symbol. Columns that are still
+matrices once evaluated take each symbol's latest value.
+'''
+
+class ScreenData(object):
+    ''' What screen expressions get evaluated against.
+    '''
+    def __init__(self, cross_section, instruments):
+        self.__cross_section = cross_section
+        self.__instruments = instruments
+        self.__stats = None
+        self.__columns = {}
+
+    def get_symbols(self):
+        return self.__cross_section.get_symbols()
+
+    def get_field(self, name):
+        return self.__cross_section[name]
+
+    def get_value(self, key):
+        ret = np.empty(len(self.__instruments))
+        for i, instrument in enumerate(self.__instruments):
+            try:
+                ret[i] = float(instrument[key])
+            except (TypeError, ValueError):
+                ret[i] = np.nan
+        return ret
+
+    def get_stat(self, column):
+        if self.__stats is None:
+            stats = db.Database().get_stats()
+            rows = dict((symbol, i) for i, symbol in enumerate(stats['symbol']))
+            self.__stats = (stats, [rows.get(x) for x in self.get_symbols()])
+        stats, rows = self.__stats
+        return np.array([np.nan if i is None else stats[column][i] for i in rows])
+
+    def get_column(self, name):
+        return self.__columns[name]
+
+    def set_column(self, name, values):
+        self.__columns[name] = values
+
+
+class Expression(object):
+    ''' A screen column, evaluated lazily (see ScreenData).
+    '''
+    def evaluate(self, data):
+        raise NotImplementedError()
+
+    def get_fields(self):
+        ''' Returns the set of bar fields the expression needs.
+        '''
+        return set()
+
+    def __add__(self, other):
+        return Function(np.add, self, other)
+
+    def __radd__(self, other):
+        return Function(np.add, other, self)
+
+    def __sub__(self, other):
+        return Function(np.subtract, self, other)
+
+    def __rsub__(self, other):
+        return Function(np.subtract, other, self)
+
+    def __mul__(self, other):
+        return Function(np.multiply, self, other)
+
+    def __rmul__(self, other):
+        return Function(np.multiply, other, self)
+
+    def __div__(self, other):
+        return Function(np.true_divide, self, other)
+
+    def __rdiv__(self, other):
+        return Function(np.true_divide, other, self)
+
+    __truediv__ = __div__
+    __rtruediv__ = __rdiv__
+
+    def __neg__(self):
+        return Function(np.negative, self)
+
+    def __abs__(self):
+        return Function(np.abs, self)
+
+    def __lt__(self, other):
+        return Function(np.less, self, other)
+
+    def __le__(self, other):
+        return Function(np.less_equal, self, other)
+
+    def __gt__(self, other):
+        return Function(np.greater, self, other)
+
+    def __ge__(self, other):
+        return Function(np.greater_equal, self, other)
+
+    def __and__(self, other):
+        return Function(np.logical_and, self, other)
+
+    def __or__(self, other):
+        return Function(np.logical_or, self, other)
+
+    def __invert__(self):
+        return Function(np.logical_not, self)
+
+
+def _expression(value):
+    if isinstance(value, Expression):
+        return value
+    return Constant(value)
+
+
+class Constant(Expression):
+    def __init__(self, value):
+        self.__value = value
+
+    def evaluate(self, data):
+        return self.__value
+
+
+class Field(Expression):
+    ''' A bar field (see crosssection.FIELDS) as a (dates x symbols) matrix.
+    '''
+    def __init__(self, name):
+        if name not in crosssection.FIELDS:
+            raise ValueError('unknown field "%s"' % name)
+        self.__name = name
+
+    def evaluate(self, data):
+        return data.get_field(self.__name)
+
+    def get_fields(self):
+        return set([self.__name])
+
+
+class Value(Expression):
+    ''' An instrument value (eg "AverageDailyVolume"); NaN if it's not a number.
+    '''
+    def __init__(self, key):
+        self.__key = key
+
+    def evaluate(self, data):
+        return data.get_value(self.__key)
+
+
+class Stat(Expression):
+    ''' A column of the database's stats table (eg "average_daily_volume").
+    '''
+    def __init__(self, column):
+        self.__column = column
+
+    def evaluate(self, data):
+        return data.get_stat(self.__column)
+
+
+class Column(Expression):
+    ''' A screen column that's already been computed.
+    '''
+    def __init__(self, name):
+        self.__name = name
+
+    def evaluate(self, data):
+        return data.get_column(self.__name)
+
+
+class Function(Expression):
+    ''' function(*evaluated args, **kwargs).
+    '''
+    def __init__(self, function, *args, **kwargs):
+        self.__function = function
+        self.__args = [_expression(x) for x in args]
+        self.__kwargs = kwargs
+
+    def evaluate(self, data):
+        return self.__function(*[x.evaluate(data) for x in self.__args],
+                               **self.__kwargs)
+
+    def get_fields(self):
+        return set().union(*[x.get_fields() for x in self.__args])
+
+
+def _pct_change(matrix, periods):
+    ret = np.empty(matrix.shape)
+    ret.fill(np.nan)
+    ret[periods:] = matrix[periods:] / matrix[:-periods] - 1
+    return ret
+
+def _rolling(matrix, window, reducer):
+    ret = np.empty(matrix.shape)
+    ret.fill(np.nan)
+    if len(matrix) >= window:
+        windows = np.lib.stride_tricks.as_strided(matrix,
+            shape=(len(matrix) - window + 1, window, matrix.shape[1]),
+            strides=(matrix.strides[0],) + matrix.strides)
+        ret[window - 1:] = reducer(windows, axis=1)
+    return ret
+
+def _reduce(matrix, reducer, window):
+    if np.ndim(matrix) != 2:
+        raise ValueError('only (dates x symbols) matrices can be reduced')
+    return reducer(matrix[-window:] if window else matrix, axis=0)
+
+def _count(matrix, axis):
+    return (~np.isnan(matrix)).sum(axis=axis)
+
+def _last(matrix, axis):
+    return crosssection.last_values(matrix)
+
+
+def abs_(x):
+    return Function(np.abs, x)
+
+def floor(x):
+    return Function(np.floor, x)
+
+def pct_change(x, periods=1):
+    ''' The change of every symbol's values since periods dates before.
+    '''
+    return Function(_pct_change, x, periods=periods)
+
+def rolling_mean(x, window):
+    return Function(_rolling, x, window=window, reducer=np.nanmean)
+
+def rolling_median(x, window):
+    return Function(_rolling, x, window=window, reducer=np.nanmedian)
+
+# reductions of every symbol's values (of the last window dates, or all of
+# them) to one value, ignoring missing bars
+def mean(x, window=None):
+    return Function(_reduce, x, reducer=np.nanmean, window=window)
+
+def median(x, window=None):
+    return Function(_reduce, x, reducer=np.nanmedian, window=window)
+
+def std(x, window=None):
+    return Function(_reduce, x, reducer=np.nanstd, window=window)
+
+def minimum(x, window=None):
+    return Function(_reduce, x, reducer=np.nanmin, window=window)
+
+def maximum(x, window=None):
+    return Function(_reduce, x, reducer=np.nanmax, window=window)
+
+def count(x, window=None):
+    return Function(_reduce, x, reducer=_count, window=window)
+
+def last(x):
+    return Function(_reduce, x, reducer=_last, window=None)
+
+
 class StockScreener(containers.Instruments):
     def __init__(self, name, instruments, bar_feed=None, bar_filter=None):
         containers.Instruments.__init__(self, name)
 
         if bar_filter == None:
             fromDate = datetime.datetime.now() - datetime.timedelta(days=90)
-            bar_filter = csvfeed.DateRangeFilter(fromDate)
+            bar_filter = barfeed.DateRangeFilter(fromDate)
+        self.__bar_filter = bar_filter
+        self.__screened = None
 
-        if bar_feed != None:
+        if self.screen_columns() is not None:
+            # vectorized screens read their cross section when they run
+            self.__feed = None
+        elif bar_feed != None:
             # passed barfeeds should already be populated with bars for all symbols in instruments
             self.__feed = bar_feed
         else:
-            self.__feed = instrumentfeed.Feed(bar_filter)
+            self.__feed = instrumentfeed.Feed(bar_filter=bar_filter)
             self.__feed.add_bars_from_instruments(instruments)
         containers.Instruments.set_instruments(self, instruments)
 
@@ -58,6 +351,21 @@ class StockScreener(containers.Instruments):
     def csv_sort_descending(self):
         return False
 
+    def csv_filter(self, instrument):
+        return True
+
+    def screen_columns(self):
+        ''' Override to vectorize the screen: returns an OrderedDict of
+        {column name: Expression}.
+        '''
+        return None
+
+    def screen_filter(self):
+        ''' Returns a boolean Expression selecting the instruments that pass
+        a vectorized screen, or None for all of them.
+        '''
+        return None
+
     def on_bars(self, bars):
         pass
 
@@ -67,9 +375,11 @@ class StockScreener(containers.Instruments):
     def csv_custom_columns(self, instrument):
         pass
 
-    def save_to_csv(self, file_name=None):
-        ordered_columns = self.csv_column_order()
-        column_header_dict = dict((x, x) for x in ordered_columns)
+    def get_screened_instruments(self):
+        ''' Returns the instruments that pass the screen, in csv sort order.
+        '''
+        if self.__screened is not None:
+            return self.__screened
         instruments = self.get_instruments()
 
         instrumentCmp = lambda x, y: cmp(
@@ -79,6 +389,11 @@ class StockScreener(containers.Instruments):
         instruments.sort(instrumentCmp)
         if self.csv_sort_descending():
             instruments.reverse()
+        return [x for x in instruments if self.csv_filter(x)]
+
+    def save_to_csv(self, file_name=None):
+        ordered_columns = self.csv_column_order()
+        column_header_dict = dict((x, x) for x in ordered_columns)
 
         file_name = file_name or '%s.csv' % self.slug()
         file_path = os.path.join(self.data_folder(), file_name)
@@ -86,16 +401,68 @@ class StockScreener(containers.Instruments):
         with open(file_path, 'w') as f:
             csvwriter = csv.DictWriter(f, fieldnames=ordered_columns, extrasaction='ignore')
             csvwriter.writerow(column_header_dict)
-            for instrument in instruments:
-                if self.csv_filter(instrument):
-                    #csvwriter.writerow(instrument.dict())
-                    csvwriter.writerow(instrument.get_values(ordered_columns))
+            for instrument in self.get_screened_instruments():
+                #csvwriter.writerow(instrument.dict())
+                csvwriter.writerow(instrument.get_values(ordered_columns))
 
     def __on_bars(self, bars):
         self.on_bars(bars)
         #self.__barsProcessedEvent.emit(self, bars)
 
+    def __run_vectorized(self):
+        columns = self.screen_columns()
+        filter_ = self.screen_filter()
+        instruments = self.get_instruments()
+        fields = set().union(*[x.get_fields() for x in
+                               columns.values() + [filter_] if x is not None])
+        from_date_time = to_date_time = None
+        if isinstance(self.__bar_filter, barfeed.DateRangeFilter):
+            from_date_time = self.__bar_filter.get_from_date()
+            to_date_time = self.__bar_filter.get_to_date()
+        cross_section = historical.Reader().get_cross_section(
+            [x.symbol() for x in instruments],
+            from_date_time=from_date_time,
+            to_date_time=to_date_time,
+            fields=sorted(fields) or ['close'])
+        data = ScreenData(cross_section, instruments)
+
+        # NaNs (missing bars and values) propagate quietly
+        with warnings.catch_warnings(), np.errstate(all='ignore'):
+            warnings.simplefilter('ignore', RuntimeWarning)
+            for name, expression in columns.items():
+                values = np.asarray(expression.evaluate(data), dtype=float)
+                if values.ndim == 2:
+                    values = crosssection.last_values(values)
+                data.set_column(name, values * np.ones(len(instruments)))
+            if filter_ is None:
+                selected = np.ones(len(instruments), dtype=bool)
+            else:
+                selected = np.asarray(filter_.evaluate(data), dtype=bool) \
+                    & np.ones(len(instruments), dtype=bool)
+
+        for name in columns:
+            for instrument, value in zip(instruments, data.get_column(name)):
+                instrument[name] = None if np.isnan(value) else float(value)
+
+        sort_column = self.csv_sort_column()
+        if sort_column in columns:
+            # NaNs sort last either way
+            values = data.get_column(sort_column)
+            order = np.argsort(-values if self.csv_sort_descending() else values,
+                               kind='mergesort')
+        else:
+            order = sorted(range(len(instruments)),
+                           key=lambda i: instruments[i][sort_column],
+                           reverse=self.csv_sort_descending())
+        self.__screened = [instruments[i] for i in order if selected[i]]
+
     def run(self, save=False):
+        if self.__feed is None:
+            self.__run_vectorized()
+            if save:
+                self.save_to_csv()
+            return
+
         try:
             self.__feed.get_new_bars_event().subscribe(self.__on_bars)
             self.__feed.start()
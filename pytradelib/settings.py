@@ -24,9 +24,26 @@ DATE_FORMAT = '%Y-%m-%d %H:%M:%S' # YYYY-MM-DD HH:MM:SS
 
 DATA_DIR = os.path.join(os.environ['HOME'], 'pytradelib_data')
 DATA_PROVIDER = 'Yahoo'
-DATA_STORE_FORMAT = 'Yahoo'
+DATA_STORE_FORMAT = 'Yahoo' # or 'SQLite' (to store bars in DATA_DIR/bars.sqlite)
 DATA_COMPRESSION = None # 'lz4', 'gz', or None (for uncompressed csv)
 
+# point these at a pytradelib.data.standin server to load test without Yahoo
+YAHOO_ICHART_URL = 'http://ichart.finance.yahoo.com/table.csv'
+YAHOO_YQL_URL = 'http://query.yahooapis.com/v1/public/yql'
+
+DOWNLOAD_CONCURRENCY = 50 # max downloads in flight at once
+DOWNLOAD_CONNECTIONS_PER_HOST = None # max keep-alive connections per host
+DOWNLOAD_REQUESTS_PER_SECOND = 20 # initial rate limit per host (it adapts)
+DOWNLOAD_MAX_REQUESTS_PER_SECOND = 200
+DOWNLOAD_MAX_RETRIES = 5
+# downloads run concurrently by making the socket module cooperative (with
+# gevent's monkey patching) when the first download starts; processes that
+# never download never get patched
+DOWNLOAD_PATCH_SOCKET = True
+PARSE_PROCESSES = None # processes parsing downloads; None for one per cpu, 0 for none
+HISTORY_CACHE_SIZE = 256 * 2**20 # bytes of parsed bars kept in memory; 0 for no cache
+PARSED_CACHE = True # keep a parsed (binary) copy next to every stored csv file
+
 SYMBOL_INDEX_PATH = os.path.join(DATA_DIR, 'symbol_index.json')
 FAILED_SYMBOLS_PATH = os.path.join(DATA_DIR, 'failed_symbols.json')
 DATA_LAST_UPDATED_PATH = os.path.join(DATA_DIR, '.last_updated_times.json')
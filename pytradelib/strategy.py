@@ -21,6 +21,7 @@
 import broker
 import broker.backtesting
 import observer
+import profiler
 from stratanalyzer import returns
 import warninghelpers
 
@@ -294,6 +295,7 @@ class Strategy(object):
         self.__bars_processed_event = observer.Event()
         self.__analyzers = []
         self.__named_analyzers = {}
+        self.__profiler = None
 
         if broker_ == None:
             # When doing backtesting (broker_ == None), the broker should subscribe to bar_feed events before the strategy.
@@ -355,6 +357,13 @@ class Strategy(object):
     def get_named_analyzer(self, name):
         return self.__named_analyzers.get(name, None)
 
+    def set_profiler(self, profiler_):
+        """Sets a :class:`pytradelib.profiler.Profiler` to time the phases of :meth:`run`. Set to None (the default) to disable profiling."""
+        self.__profiler = profiler_
+
+    def get_profiler(self):
+        return self.__profiler
+
     def get_feed(self):
         """Returns the :class:`pytradelib.barfeed.BarFeed` that this strategy is using."""
         return self.__feed
@@ -658,10 +667,54 @@ class Strategy(object):
         # 3: Notify that the bars were processed.
         self.__bars_processed_event.emit(self, bars)
 
+    # Same as __on_bars, but timing each step. Only used while profiling.
+    def __on_bars_profiled(self, bars):
+        self.__profiler.on_bars(bars)
+        self.__timed_notify_analyzers(lambda s: s.before_on_bars(self))
+        self.__timed_strategy_on_bars(bars)
+        self.__timed_bars_processed(self, bars)
+
+    def __strategy_on_bars(self, bars):
+        self.on_bars(bars)
+        self.__check_exit_on_session_close(bars)
+
+    def __instrument(self):
+        # Wrap each phase of a bar once, up front, so that nothing changes
+        # for the regular (unprofiled) run.
+        profiler_ = self.__profiler
+        self.__timed_notify_analyzers = profiler_.wrap(
+            profiler.Phase.ANALYZERS, self.__notify_analyzers)
+        self.__timed_strategy_on_bars = profiler_.wrap(
+            profiler.Phase.STRATEGY, self.__strategy_on_bars)
+        self.__timed_bars_processed = profiler_.wrap(
+            profiler.Phase.BARS_PROCESSED, self.__bars_processed_event.emit)
+
+        self.__feed.get_next_bars = profiler_.wrap(
+            profiler.Phase.FEED, self.__feed.get_next_bars)
+        if isinstance(self.__broker, broker.backtesting.Broker):
+            # The broker must keep handling bars before the strategy (and any
+            # other subscriber), so swap the handler in place.
+            self.__timed_broker_on_bars = profiler_.wrap(
+                profiler.Phase.BROKER, self.__broker.on_bars)
+            self.__feed.get_new_bars_event().replace(
+                self.__broker.on_bars, self.__timed_broker_on_bars)
+        return self.__on_bars_profiled
+
+    def __uninstrument(self):
+        del self.__feed.get_next_bars
+        if isinstance(self.__broker, broker.backtesting.Broker):
+            self.__feed.get_new_bars_event().replace(
+                self.__timed_broker_on_bars, self.__broker.on_bars)
+            del self.__timed_broker_on_bars
+
     def run(self):
         """Call once (**and only once**) to backtest the strategy. """
+        on_bars = self.__on_bars
+        if self.__profiler != None:
+            on_bars = self.__instrument()
+            self.__profiler.start()
         try:
-            self.__feed.get_new_bars_event().subscribe(self.__on_bars)
+            self.__feed.get_new_bars_event().subscribe(on_bars)
             self.__feed.start()
             self.__broker.start()
             self.on_start()
@@ -682,7 +735,10 @@ class Strategy(object):
             else:
                 raise Exception("Feed was empty")
         finally:
-            self.__feed.get_new_bars_event().unsubscribe(self.__on_bars)
+            self.__feed.get_new_bars_event().unsubscribe(on_bars)
+            if self.__profiler != None:
+                self.__profiler.stop()
+                self.__uninstrument()
             self.__broker.stop()
             self.__feed.stop()
             self.__broker.join()
@@ -15,9 +15,9 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
 
+from __future__ import absolute_import
+
 import numpy as np
-import talib
-from talib import abstract
 from collections import OrderedDict
 
 from pytradelib import dataseries
@@ -52,12 +52,15 @@ def bar_ds_volume_to_numpy(barDs, count):
     return value_ds_to_numpy(barDs.get_volume_data_series(), count)
 
 
-class Function(abstract.Function):
-    ''' A thin wrapper around abstract.Function for converting data inputs of
-    BarDataSeries into the expected input of a dict of numpy arrays.
+class Function(object):
+    ''' A thin wrapper around talib's abstract.Function for converting data
+    inputs of BarDataSeries into the expected input of a dict of numpy arrays.
+    Everything else is delegated to the abstract.Function, and talib only
+    gets imported when the first Function is created.
     '''
     def __init__(self, function_name):
-        abstract.Function.__init__(self, function_name)
+        from talib import abstract
+        self.__function = abstract.Function(function_name)
         self.__bar_ds = None
         # lookup for converting bar price series into numpy arrays
         self.__bar_ds_to_np = { 'open': bar_ds_open_to_numpy,
@@ -66,6 +69,16 @@ class Function(abstract.Function):
                                 'close': bar_ds_close_to_numpy,
                                 'volume': bar_ds_volume_to_numpy }
 
+    def __getattr__(self, name):
+        if name == '_Function__function':
+            raise AttributeError(name) # (not initialized yet)
+        return getattr(self.__function, name)
+
+    def __call__(self, *args, **kwargs):
+        if args and isinstance(args[0], dataseries.BarDataSeries):
+            args = (self.__bar_ds_to_input_arrays(args[0]),) + args[1:]
+        return self.__function(*args, **kwargs)
+
     def get_data_series(self):
         return self.__bar_ds
 
@@ -73,17 +86,21 @@ class Function(abstract.Function):
         self.__bar_ds = bar_ds
         self.set_input_arrays(bar_ds)
 
+    def __bar_ds_to_input_arrays(self, bar_ds):
+        input_arrays = self.__function.get_input_arrays()
+        for input_ in input_arrays:
+            ds_to_np = self.__bar_ds_to_np[input_]
+            input_arrays[input_] = ds_to_np(bar_ds, len(bar_ds))
+        return input_arrays
+
     def set_input_arrays(self, input_data):
-        # first call the super's implementation. If it returns False, check if
+        # first call talib's implementation. If it returns False, check if
         # we can handle the input_data.
-        if abstract.Function.set_input_arrays(self, input_data):
+        if self.__function.set_input_arrays(input_data):
             return True
         elif isinstance(input_data, dataseries.BarDataSeries):
-            input_arrays = abstract.Function.get_input_arrays(self)
-            for input_ in input_arrays:
-                ds_to_np = self.__bar_ds_to_np[input_]
-                input_arrays[input_] = ds_to_np(input_data, len(input_data))
-            abstract.Function.set_input_arrays(self, input_arrays)
+            self.__function.set_input_arrays(
+                self.__bar_ds_to_input_arrays(input_data))
             return True
         return False
 
@@ -302,6 +319,7 @@ class TA(object):
         return ret
 
     def get_groups_of_functions(self):
+        import talib
         ret = talib.get_function_groups()
         ret.pop('Math Operators')
         ret.pop('Math Transform')
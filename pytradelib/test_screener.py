@@ -20,12 +20,14 @@ import datetime
 import numpy as np
 
 from collections import defaultdict
+from collections import OrderedDict
 
 from pytradelib import index as index_
 from pytradelib import utils
 from pytradelib import barfeed
 from pytradelib import screener
 from pytradelib.barfeed import instrumentfeed
+from pytradelib.screener import Field, Value, Column, abs_, floor, mean, median
 from pytradelib.utils import stats as pyalgotrade_utils
 
 
@@ -94,6 +96,24 @@ class MyScreener(screener.StockScreener):
             instrument['MeanPercentChange'] = sum(percent_changes)/float(len(percent_changes))
             instrument['MedianPercentChange'] = np.median(np.asarray(percent_changes))
 
+class MyVectorizedScreener(MyScreener):
+    ''' MyScreener's screen, computed for all instruments at once.
+    '''
+    def screen_columns(self):
+        day_swing_pct = abs_((Field('high') - Field('low')) / Field('low')) * 100
+        return OrderedDict([
+            ('Liquidity', Value('AverageDailyVolume') / (6.5*60)
+                          / floor(CAPITAL / Value('LastTradePriceOnly'))),
+            ('MeanPercentChange', mean(day_swing_pct)),
+            ('MedianPercentChange', median(day_swing_pct)),
+            ])
+
+    def screen_filter(self):
+        return (Column('Liquidity') > 1) & (Column('MedianPercentChange') > 2.5)
+
+    def csv_filter(self, instrument):
+        return True # screen_filter does the filtering
+
 def run_integrity_check():
     index = index_.Factory()
     instruments = index.get_instruments()
@@ -173,6 +193,13 @@ def run_screener():
 
 
 
+def run_vectorized_screener():
+    index = index_.Factory()
+    instruments = index.get_instruments()
+    symbol_screener = MyVectorizedScreener('test_list_vectorized', instruments)
+    symbol_screener.run(save=True)
+
+
 if __name__ == '__main__':
     def profile(cmd):
         import cProfile
@@ -185,6 +212,7 @@ if __name__ == '__main__':
     print start.strftime('%I:%M:%S %p').lower()
 
     #profile('run_screener()')
+    #run_vectorized_screener()
     run_batched_screener(200)
     #run_integrity_check()
 
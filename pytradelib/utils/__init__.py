@@ -15,15 +15,10 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
 
-import gevent.monkey
-gevent.monkey.patch_socket()
-
 import os
 import sys
 import errno
 import time
-import urllib2
-import gevent
 from decorator import decorator
 
 try: import simplejson as json
@@ -152,68 +147,63 @@ def load_from_pickle(file_path):
 ## --- multiprocessing/threading/gevent utils ------------------------------
 def batch(list_, size=None, sleep=None):
     size = size or 100
-    total_batches = len(list_)/size + 1
-    for i in xrange(total_batches):
-        lowerIdx = size * i
-        upperIdx = size * (i+1)
-        if upperIdx == lowerIdx or upperIdx == len(list_):
-            break
-        if upperIdx <= len(list_):
-            yield list_[lowerIdx:upperIdx]
-        else:
-            yield list_[lowerIdx:]
+    for lowerIdx in xrange(0, len(list_), size):
+        upperIdx = lowerIdx + size
+        yield list_[lowerIdx:upperIdx]
 
         if sleep and upperIdx < len(list_):
             time.sleep(sleep)
 
+_process_pool = None
+
+def get_process_pool():
+    ''' Returns the shared processes.ProcessPool for CPU-bound work, or None if
+    settings.PARSE_PROCESSES is 0 (to do the work in this process instead).
+    '''
+    global _process_pool
+    if settings.PARSE_PROCESSES == 0:
+        return None
+    if _process_pool is None:
+        from pytradelib.utils import processes
+        _process_pool = processes.ProcessPool(settings.PARSE_PROCESSES)
+    return _process_pool
+
 
 ## --- downloading utils ---------------------------------------------------
+_downloader = None
+
+def get_downloader():
+    ''' Returns the shared http.Downloader, so that every download reuses the
+    same pool of keep-alive connections.
+    '''
+    global _downloader
+    if _downloader is None:
+        from pytradelib.utils import http
+        _downloader = http.Downloader(
+            concurrency=settings.DOWNLOAD_CONCURRENCY,
+            connections_per_host=settings.DOWNLOAD_CONNECTIONS_PER_HOST,
+            requests_per_second=settings.DOWNLOAD_REQUESTS_PER_SECOND,
+            max_requests_per_second=settings.DOWNLOAD_MAX_REQUESTS_PER_SECOND,
+            retry_policy=http.RetryPolicy(settings.DOWNLOAD_MAX_RETRIES),
+            cooperative=settings.DOWNLOAD_PATCH_SOCKET)
+    return _downloader
+
 def download(url, context=None):
-    context = context or {}
-    if not isinstance(context, dict):
-        printf('WARNING: context should be supplied as a dict! Converting.')
-        context = {'context': context}
-    context['url'] = url
-    context['error'] = None
-
-    # try downloading the url; return on success, retry on various URLErrors and
-    #  (gracefully) fail on HTTP 404 errors. unrecognized exceptions still get raised.
-    while True:
-        try:
-            response = urllib2.urlopen(url)
-        except urllib2.HTTPError as e:
-            if '404' in str(e):
-                context['error'] = str(e)
-                return (None, context)
-            else:
-                printf(context['url'])
-                raise e
-        except (urllib2.URLError, Exception) as e:
-            error = str(e).lower()
-            if 'server failed' in error \
-              or 'misformatted query' in error:
-                time.sleep(0.1)
-                printf('retrying download of %s' % url)
-            elif 'connection reset by peer' in error \
-              or 'request timed out' in error:
-                time.sleep(0.5)
-                printf('retrying download of %s' % url)
-            else:
-                raise e
-        else:
-            data = response.read()
-            return (data, context)
+    ''' Returns tuple(data, context). Transient errors get retried with backoff;
+    HTTP 404s and downloads that run out of retries set context['error'] and
+    return None for data, and other errors get raised.
+    '''
+    return get_downloader().download(url, context)
 
-def bulk_download(urls_andor_contexts):
+def bulk_download(urls_andor_contexts, concurrency=None, maxsize=None):
     '''
-    :type urls_andor_tags_list: a list of urls or a list of tuple(url, tag)s
+    Downloads at most concurrency (default: settings.DOWNLOAD_CONCURRENCY)
+    urls at once, yielding tuple(data, context)s as each download completes.
+    If maxsize is set, downloading pauses while that many results are waiting
+    to be consumed.
+
+    :type urls_andor_contexts: a list of urls or a list of tuple(url, context)s
     '''
-    threads = []
-    for params in urls_andor_contexts:
-        if isinstance(params, tuple):
-            threads.append(gevent.spawn(download, *params))
-        else:
-            threads.append(gevent.spawn(download, params))
-    gevent.joinall(threads)
-    for thread in threads:
-        yield thread.value
+    for data_context in get_downloader().imap(urls_andor_contexts,
+                                              concurrency, maxsize):
+        yield data_context
@@ -0,0 +1,343 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import time
+import random
+import socket
+import httplib
+import urllib2
+import urlparse
+import StringIO
+
+import gevent
+import gevent.pool
+import gevent.lock
+import gevent.monkey
+
+from pytradelib.utils import printf
+
+
+'''
+Downloads urls over pooled keep-alive connections, with a bounded number of
+downloads in flight at once:
+
+    downloader = Downloader(concurrency=20, connections_per_host=10)
+    for data, context in downloader.imap(url_contexts):
+        ... # results are yielded as soon as each download completes
+
+Requests to each host are paced by an adaptive RateLimiter. Downloads return
+the data and context (with its 'url', 'error' and 'retries' keys set) on
+success. HTTP 404s and downloads that still fail after the RetryPolicy's last
+retry "fail gracefully" by setting context['error'] and returning None for the
+data, and unrecognized errors get raised.
+'''
+
+MAX_REDIRECTS = 5
+THROTTLED_STATUSES = [429, 503, 999] # 999 is how Yahoo says slow down
+RETRY_STATUSES = THROTTLED_STATUSES + [500, 502, 504]
+
+
+def patch_socket():
+    ''' Makes the socket module cooperative, so that greenlets waiting on the
+    network let the others run (ie so that downloads really run concurrently).
+    Patching more than once does nothing.
+    '''
+    if not gevent.monkey.is_module_patched('socket'):
+        gevent.monkey.patch_socket()
+
+
+class RateLimiter(object):
+    ''' An adaptive token bucket limiting the request rate to a single host.
+
+    The rate grows additively with every successful request and gets cut
+    multiplicatively when the host throttles us, errors out or slows down
+    (a latency more than latency_factor times its moving average), so bulk
+    downloads settle at about the fastest rate the host tolerates.
+
+    :param rate: the initial requests per second.
+    :param min_rate: the rate never drops below this.
+    :param max_rate: the rate never grows beyond this.
+    :param burst: the maximum number of requests that can be made at once after idling.
+    '''
+    def __init__(self, rate, min_rate=0.5, max_rate=None, burst=None,
+        increase=0.1,
+        decrease=0.5,
+        latency_factor=3.0
+    ):
+        self.__rate = float(rate)
+        self.__min_rate = min_rate
+        self.__max_rate = max_rate or self.__rate * 10
+        self.__burst = burst or max(1, int(rate))
+        self.__increase = increase
+        self.__decrease = decrease
+        self.__latency_factor = latency_factor
+        self.__avg_latency = None
+        self.__tokens = float(self.__burst)
+        self.__last = time.time()
+
+    def get_rate(self):
+        return self.__rate
+
+    def __set_rate(self, rate):
+        self.__rate = min(self.__max_rate, max(self.__min_rate, rate))
+
+    def acquire(self):
+        ''' Blocks the calling greenlet until it may make a request.
+        '''
+        now = time.time()
+        self.__tokens = min(self.__burst,
+                            self.__tokens + (now - self.__last) * self.__rate)
+        self.__last = now
+        # reserve a token; once the bucket runs dry, waiters queue up behind it
+        self.__tokens -= 1
+        if self.__tokens < 0:
+            gevent.sleep(-self.__tokens / self.__rate)
+
+    def on_success(self, latency):
+        if self.__avg_latency is None:
+            self.__avg_latency = latency
+        slow = latency > self.__avg_latency * self.__latency_factor
+        self.__avg_latency = 0.9 * self.__avg_latency + 0.1 * latency
+        if slow:
+            self.__set_rate(self.__rate * (1 + self.__decrease) / 2)
+        else:
+            self.__set_rate(self.__rate + self.__increase)
+
+    def on_error(self, throttled=False):
+        if throttled:
+            self.__set_rate(self.__rate * self.__decrease)
+        else:
+            self.__set_rate(self.__rate * (1 + self.__decrease) / 2)
+
+
+class RetryPolicy(object):
+    ''' Exponential backoff with "full jitter" and a cap on the number of retries.
+
+    :param max_retries: how many times to retry a download before giving up.
+    :param base_delay: the maximum delay (in seconds) before the first retry; it doubles with every attempt.
+    :param max_delay: the maximum delay before any retry.
+    '''
+    def __init__(self, max_retries=5, base_delay=0.25, max_delay=30):
+        self.__max_retries = max_retries
+        self.__base_delay = base_delay
+        self.__max_delay = max_delay
+        self.__random = random.Random()
+
+    def get_max_retries(self):
+        return self.__max_retries
+
+    def get_delay(self, attempt):
+        ''' Returns how long to wait (in seconds) before the given retry (0-indexed).
+        '''
+        return self.__random.uniform(0,
+            min(self.__max_delay, self.__base_delay * 2 ** attempt))
+
+    def is_retryable(self, error):
+        if isinstance(error, urllib2.HTTPError):
+            return error.code in RETRY_STATUSES
+        # connection resets, timeouts, DNS failures ("server failed") and
+        # garbled responses are all worth another try
+        return isinstance(error, (socket.error, httplib.HTTPException,
+                                  urllib2.URLError))
+
+
+class ConnectionPool(object):
+    ''' Keeps idle keep-alive connections to a single host for reuse.
+
+    :param max_connections: the maximum number of connections open to the host at once; None for no limit.
+    '''
+    def __init__(self, scheme, host, port=None, max_connections=None, timeout=None):
+        self.__scheme = scheme
+        self.__host = host
+        self.__port = port
+        self.__timeout = timeout
+        self.__idle = []
+        self.__semaphore = None
+        if max_connections:
+            self.__semaphore = gevent.lock.BoundedSemaphore(max_connections)
+        self.__connections_opened = 0
+
+    def get_connections_opened(self):
+        return self.__connections_opened
+
+    def get(self):
+        ''' Returns a tuple(connection, reused).
+        '''
+        if self.__semaphore is not None:
+            self.__semaphore.acquire()
+        if self.__idle:
+            return self.__idle.pop(), True
+        if self.__scheme == 'https':
+            connection_class = httplib.HTTPSConnection
+        else:
+            connection_class = httplib.HTTPConnection
+        self.__connections_opened += 1
+        return connection_class(self.__host, self.__port,
+                                timeout=self.__timeout), False
+
+    def put(self, connection, reusable=True):
+        if reusable:
+            self.__idle.append(connection)
+        else:
+            connection.close()
+        if self.__semaphore is not None:
+            self.__semaphore.release()
+
+    def close(self):
+        while self.__idle:
+            self.__idle.pop().close()
+
+
+class Downloader(object):
+    ''' Downloads urls with HTTP keep-alive connection pooling.
+
+    :param concurrency: the maximum number of downloads in flight at once (for imap).
+    :param connections_per_host: the maximum number of connections open to any one host; None for no limit.
+    :param timeout: socket timeout, in seconds.
+    :param requests_per_second: the initial rate limit for each host.
+    :param max_requests_per_second: the rate limit for a host never grows beyond this.
+    :param retry_policy: a :class:`RetryPolicy`.
+    :param cooperative: if True, calls :func:`patch_socket` (otherwise downloads only run concurrently if the socket module has already been patched).
+    '''
+    def __init__(self, concurrency=20, connections_per_host=None, timeout=60,
+        requests_per_second=20,
+        max_requests_per_second=None,
+        retry_policy=None,
+        cooperative=False
+    ):
+        if cooperative:
+            patch_socket()
+        self.__concurrency = concurrency
+        self.__connections_per_host = connections_per_host
+        self.__timeout = timeout
+        self.__requests_per_second = requests_per_second
+        self.__max_requests_per_second = max_requests_per_second
+        self.__retry_policy = retry_policy or RetryPolicy()
+        self.__pools = {}
+        self.__rate_limiters = {}
+
+    def get_pool(self, scheme, host, port):
+        key = (scheme, host, port)
+        if key not in self.__pools:
+            self.__pools[key] = ConnectionPool(scheme, host, port,
+                self.__connections_per_host, self.__timeout)
+        return self.__pools[key]
+
+    def get_rate_limiter(self, host):
+        if host not in self.__rate_limiters:
+            self.__rate_limiters[host] = RateLimiter(self.__requests_per_second,
+                max_rate=self.__max_requests_per_second)
+        return self.__rate_limiters[host]
+
+    def close(self):
+        for pool in self.__pools.values():
+            pool.close()
+
+    def imap(self, urls_andor_contexts, concurrency=None, maxsize=None):
+        ''' Downloads the urls, yielding tuple(data, context)s in the order
+        the downloads complete.
+
+        :type urls_andor_contexts: a list of urls or a list of tuple(url, context)s
+        :param concurrency: overrides the downloader's concurrency.
+        :param maxsize: if set, downloading pauses while this many completed downloads wait to be consumed.
+        '''
+        def download(params):
+            if isinstance(params, tuple):
+                return self.download(*params)
+            return self.download(params)
+        pool = gevent.pool.Pool(concurrency or self.__concurrency)
+        for data_context in pool.imap_unordered(download, urls_andor_contexts,
+                                                   maxsize=maxsize):
+            yield data_context
+
+    def download(self, url, context=None):
+        context = context or {}
+        if not isinstance(context, dict):
+            printf('WARNING: context should be supplied as a dict! Converting.')
+            context = {'context': context}
+        context['url'] = url
+        context['error'] = None
+        context['retries'] = 0
+
+        # retry transient errors with exponential backoff and (gracefully) fail
+        # on HTTP 404s or when out of retries. other exceptions still get raised.
+        rate_limiter = self.get_rate_limiter(urlparse.urlsplit(url).netloc)
+        max_retries = self.__retry_policy.get_max_retries()
+        for attempt in xrange(max_retries + 1):
+            rate_limiter.acquire()
+            start = time.time()
+            try:
+                status, reason, headers, data = self.__get(url)
+                if status not in (200, 404):
+                    raise urllib2.HTTPError(url, status, reason, headers,
+                                            StringIO.StringIO(data))
+            except Exception as e:
+                if not self.__retry_policy.is_retryable(e):
+                    raise e
+                rate_limiter.on_error(throttled=isinstance(e, urllib2.HTTPError) \
+                                      and e.code in THROTTLED_STATUSES)
+                if attempt < max_retries:
+                    gevent.sleep(self.__retry_policy.get_delay(attempt))
+                    context['retries'] += 1
+                    printf('retrying download of %s' % url)
+                else:
+                    context['error'] = 'giving up after %i retries: %s' % (
+                                                               max_retries, e)
+            else:
+                rate_limiter.on_success(time.time() - start)
+                if status == 404:
+                    context['error'] = str(urllib2.HTTPError(
+                        url, status, reason, headers, None))
+                    return None, context
+                return data, context
+        return None, context
+
+    def __get(self, url):
+        # returns tuple(status, reason, headers, data), following redirects
+        for i in xrange(MAX_REDIRECTS + 1):
+            parsed = urlparse.urlsplit(url)
+            path = parsed.path or '/'
+            if parsed.query:
+                path = '?'.join([path, parsed.query])
+            pool = self.get_pool(parsed.scheme, parsed.hostname, parsed.port)
+            response = self.__request(pool, path)
+            status, reason, headers, data = response
+            if status in (301, 302, 303, 307) and headers.get('location'):
+                url = urlparse.urljoin(url, headers['location'])
+                continue
+            return response
+        raise urllib2.HTTPError(url, status, 'too many redirects', headers, None)
+
+    def __request(self, pool, path):
+        while True:
+            connection, reused = pool.get()
+            try:
+                connection.request('GET', path, headers={'Connection': 'keep-alive'})
+                response = connection.getresponse()
+                data = response.read()
+            except (httplib.HTTPException, socket.error) as e:
+                pool.put(connection, reusable=False)
+                if reused and not isinstance(e, socket.timeout):
+                    # the server closed the idle connection; try a fresh one
+                    continue
+                raise e
+            except:
+                pool.put(connection, reusable=False)
+                raise
+            pool.put(connection, reusable=not response.will_close)
+            return response.status, response.reason, \
+                dict(response.getheaders()), data
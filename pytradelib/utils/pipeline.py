@@ -0,0 +1,163 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+from timeit import default_timer as timer
+
+import gevent
+import gevent.queue
+
+
+'''
+Runs a generator pipeline as concurrent stages joined by bounded queues:
+
+    pipeline = Pipeline(queue_size=50)
+    pipeline.add_stage('download', utils.bulk_download)
+    pipeline.add_stage('parse', parse_function)
+    pipeline.add_stage('write', write_function)
+    for result in pipeline.run(urls):
+        ...
+    print pipeline.format_metrics()
+
+Every stage is a generator function taking an iterable (exactly like the
+functions of the generator pipelines used throughout pytradelib) and runs in
+its own greenlet, so one stage waiting on the network or the disk doesn't stop
+the others. A full queue blocks the stage feeding it (backpressure), so a slow
+stage can't make the ones before it buffer everything in memory.
+
+Each stage's metrics tell where the bottleneck is: a stage that's rarely
+starved (waiting for input) or blocked (waiting for room in its output queue)
+is the one limiting throughput.
+'''
+
+class _EndOfStream(object):
+    pass
+
+_END = _EndOfStream()
+
+
+class Stage(object):
+    def __init__(self, name, function):
+        self.__name = name
+        self.__function = function
+        self.items = 0
+        self.starved = 0.0
+        self.blocked = 0.0
+        self.elapsed = 0.0
+
+    def get_name(self):
+        return self.__name
+
+    def get_function(self):
+        return self.__function
+
+    def get_metrics(self):
+        ''' Returns a dict with the keys: name, items, elapsed, busy, starved,
+        blocked (all times in seconds) and items_per_second (while busy).
+        '''
+        busy = max(0.0, self.elapsed - self.starved - self.blocked)
+        return {
+            'name': self.__name,
+            'items': self.items,
+            'elapsed': self.elapsed,
+            'busy': busy,
+            'starved': self.starved,
+            'blocked': self.blocked,
+            'items_per_second': self.items / busy if busy else 0.0,
+            }
+
+
+class Pipeline(object):
+    ''' Runs generator function stages concurrently.
+
+    :param queue_size: the maximum number of items waiting between two stages.
+    '''
+    def __init__(self, queue_size=100):
+        self.__queue_size = queue_size
+        self.__stages = []
+        self.__error = None
+
+    def add_stage(self, name, function):
+        ''' Appends a stage. function must take an iterable and yield items.
+        '''
+        self.__stages.append(Stage(name, function))
+
+    def get_stages(self):
+        return self.__stages
+
+    def __input(self, stage, queue):
+        while True:
+            start = timer()
+            item = queue.get()
+            stage.starved += timer() - start
+            if item is _END:
+                return
+            yield item
+
+    def __run_stage(self, stage, input_, output):
+        start = timer()
+        try:
+            for item in stage.get_function()(input_):
+                put_start = timer()
+                output.put(item)
+                stage.blocked += timer() - put_start
+                stage.items += 1
+        except Exception as e:
+            self.__error = self.__error or e
+        finally:
+            stage.elapsed = timer() - start
+            output.put(_END)
+
+    def run(self, iterable):
+        ''' Feeds iterable to the first stage and yields the last stage's items.
+        '''
+        assert self.__stages, 'the pipeline has no stages'
+        self.__error = None
+        queues = [gevent.queue.Queue(self.__queue_size) for x in self.__stages]
+        greenlets = []
+        for i, stage in enumerate(self.__stages):
+            input_ = iterable if i == 0 else self.__input(stage, queues[i-1])
+            greenlets.append(
+                gevent.spawn(self.__run_stage, stage, input_, queues[i]))
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _END:
+                    break
+                yield item
+            if self.__error is not None:
+                raise self.__error
+        finally:
+            gevent.killall(greenlets)
+
+    def get_metrics(self):
+        return [stage.get_metrics() for stage in self.__stages]
+
+    def format_metrics(self):
+        return format_metrics(self.get_metrics())
+
+
+def format_metrics(metrics_list):
+    ''' Formats a list of stage metrics as a table.
+    '''
+    lines = ['%-12s %8s %9s %9s %9s %9s %10s' % (
+        'stage', 'items', 'elapsed', 'busy', 'starved', 'blocked', 'items/sec')]
+    for metrics in metrics_list:
+        lines.append('%-12s %8i %9.3f %9.3f %9.3f %9.3f %10.1f' % (
+            metrics['name'], metrics['items'], metrics['elapsed'],
+            metrics['busy'], metrics['starved'], metrics['blocked'],
+            metrics['items_per_second']))
+    return '\n'.join(lines)
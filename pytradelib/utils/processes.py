@@ -0,0 +1,79 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+import multiprocessing
+
+import gevent.pool
+import gevent.threadpool
+
+
+'''
+Runs CPU-bound functions in worker processes without blocking the gevent hub:
+
+    pool = ProcessPool(processes=4)
+    for result in pool.imap(parse, args_tuples):
+        ... # results are yielded as soon as each call completes
+
+The calling greenlet waits (in a helper thread) for its result, so downloads
+and the other greenlets keep running while the workers parse. Functions and
+their arguments must be picklable (ie module-level functions and plain data).
+'''
+
+class ProcessPool(object):
+    ''' A lazily started multiprocessing.Pool usable from greenlets.
+
+    :param processes: the number of worker processes; None for one per cpu.
+    '''
+    def __init__(self, processes=None):
+        self.__processes = processes or multiprocessing.cpu_count()
+        self.__pool = None
+        self.__threads = None
+
+    def get_processes(self):
+        return self.__processes
+
+    def __start(self):
+        if self.__pool is None:
+            # fork the workers before starting any helper threads
+            self.__pool = multiprocessing.Pool(self.__processes)
+            self.__threads = gevent.threadpool.ThreadPool(self.__processes * 2)
+
+    def apply(self, function, *args):
+        ''' Returns function(*args), run in a worker process. Only the calling
+        greenlet blocks while it runs. Exceptions get re-raised.
+        '''
+        self.__start()
+        result = self.__pool.apply_async(function, args)
+        return self.__threads.apply(result.get)
+
+    def imap(self, function, args_iterable, concurrency=None):
+        ''' Yields function(*args) for every args tuple, in the order the calls
+        complete. At most concurrency (default: twice the number of processes,
+        so the workers never wait on us) calls are in flight at once.
+        '''
+        def apply(args):
+            return self.apply(function, *args)
+        pool = gevent.pool.Pool(concurrency or self.__processes * 2)
+        for result in pool.imap_unordered(apply, args_iterable):
+            yield result
+
+    def close(self):
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool.join()
+            self.__threads.kill()
+            self.__pool = None
+            self.__threads = None
@@ -0,0 +1,111 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+'''
+Runs the benchmark suite and writes the results as json, eg:
+
+    python runbenchmarks.py --quick --output before.json
+    (make some changes)
+    python runbenchmarks.py --quick --output after.json --compare before.json
+
+Everything runs offline against the sample csvs and synthetic data.
+'''
+
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+from benchmarks import backtest_bench
+from benchmarks import optimizer_bench
+from benchmarks import db_bench
+from benchmarks import historical_bench
+from benchmarks import import_bench
+
+def getBenchmarks():
+    ret = []
+    ret += backtest_bench.getBenchmarks()
+    ret += optimizer_bench.getBenchmarks()
+    ret += db_bench.getBenchmarks()
+    ret += historical_bench.getBenchmarks()
+    ret += import_bench.getBenchmarks()
+    return ret
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+            stderr=subprocess.STDOUT).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def result_key(result):
+    return (result['name'], tuple(sorted(result['params'].items())))
+
+def compare(results, baseline_file_path):
+    with open(baseline_file_path) as f:
+        baseline = dict((result_key(x), x) for x in json.load(f)['results'])
+    for result in results:
+        old = baseline.get(result_key(result), None)
+        if old:
+            ratio = result['seconds'] / old['seconds'] if old['seconds'] else 0
+            sys.stderr.write('%-28s %-45s %6.2fx\n' % (result['name'],
+                ' '.join('%s=%s' % x for x in sorted(result['params'].items())),
+                ratio))
+
+def main():
+    parser = argparse.ArgumentParser(description='PyTradeLib benchmarks')
+    parser.add_argument('--quick', action='store_true',
+        help='only run the smallest size of each benchmark')
+    parser.add_argument('--only', action='append', default=[],
+        help='only run benchmarks whose name contains this (repeatable)')
+    parser.add_argument('--output', help='write json results to this file')
+    parser.add_argument('--compare',
+        help='print the time ratio of each result vs this json file')
+    args = parser.parse_args()
+
+    results = []
+    for benchmark in getBenchmarks():
+        if args.only and not [x for x in args.only if x in benchmark.get_name()]:
+            continue
+        for result in benchmark.run(args.quick):
+            sys.stderr.write('%-28s %-45s %10.4fs\n' % (result['name'],
+                ' '.join('%s=%s' % x for x in sorted(result['params'].items())),
+                result['seconds']))
+            results.append(result)
+
+    output = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': int(time.time()),
+        'quick': args.quick,
+        'results': results,
+        }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=1, sort_keys=True)
+    else:
+        json.dump(output, sys.stdout, indent=1, sort_keys=True)
+        sys.stdout.write('\n')
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
@@ -35,6 +35,23 @@ from testcases import sharpe_analyzer_test
 from testcases import drawdown_analyzer_test
 from testcases import utils_test
 from testcases import doc_test
+from testcases import profiler_test
+from testcases import synthetic_test
+from testcases import standin_test
+from testcases import download_test
+from testcases import pipeline_test
+from testcases import chunked_test
+from testcases import safeio_test
+from testcases import processes_test
+from testcases import db_test
+from testcases import sqlitestore_test
+from testcases import crosssection_test
+from testcases import screener_test
+from testcases import index_test
+from testcases import imports_test
+from testcases import recarray_test
+from testcases import barcache_test
+from testcases import parsedcache_test
 
 def getTestCases():
     ret = []
@@ -54,6 +71,23 @@ def getTestCases():
     ret += drawdown_analyzer_test.getTestCases()
     ret += utils_test.getTestCases()
     ret += doc_test.getTestCases()
+    ret += profiler_test.getTestCases()
+    ret += synthetic_test.getTestCases()
+    ret += standin_test.getTestCases()
+    ret += download_test.getTestCases()
+    ret += pipeline_test.getTestCases()
+    ret += chunked_test.getTestCases()
+    ret += safeio_test.getTestCases()
+    ret += processes_test.getTestCases()
+    ret += db_test.getTestCases()
+    ret += sqlitestore_test.getTestCases()
+    ret += crosssection_test.getTestCases()
+    ret += screener_test.getTestCases()
+    ret += index_test.getTestCases()
+    ret += imports_test.getTestCases()
+    ret += recarray_test.getTestCases()
+    ret += barcache_test.getTestCases()
+    ret += parsedcache_test.getTestCases()
 
     return ret
 
@@ -0,0 +1,191 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import os
+import shutil
+import datetime
+import tempfile
+import unittest
+
+from pytradelib import bar
+from pytradelib import barfeed
+from pytradelib import settings
+from pytradelib.data import db
+from pytradelib.data import barcache
+from pytradelib.data import synthetic
+from pytradelib.data import containers
+from pytradelib.data import historical
+from pytradelib.barfeed import instrumentfeed
+
+
+class EvenDaysFilter(barfeed.Filter):
+    def include_bar(self, bar_):
+        return bar_.get_date_time().day % 2 == 0
+
+
+class BarCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.__data_dir = settings.DATA_DIR
+        self.__store_format = settings.DATA_STORE_FORMAT
+        self.__cache_size = settings.HISTORY_CACHE_SIZE
+        settings.DATA_DIR = tempfile.mkdtemp()
+        barcache.get_cache().clear()
+
+    def tearDown(self):
+        historical.Reader().set_bar_filter(None)
+        barcache.get_cache().clear()
+        shutil.rmtree(settings.DATA_DIR)
+        settings.DATA_DIR = self.__data_dir
+        settings.DATA_STORE_FORMAT = self.__store_format
+        settings.HISTORY_CACHE_SIZE = self.__cache_size
+
+    def __get_reader(self, store_format):
+        settings.DATA_STORE_FORMAT = store_format
+        symbols = synthetic.Generator(seed=3, start_date=datetime.date(2012, 1, 3)
+            ).populate(3, db=db.Database())
+        reader = historical.Reader()
+        reader.set_data_provider(store_format)
+        return reader, symbols
+
+    def testLRUCache(self):
+        cache = barcache.LRUCache(10)
+        cache.put('a', 1, 'A', 4)
+        cache.put('b', 1, 'B', 4)
+        self.assertEqual(cache.get('a', 1), 'A')
+        cache.put('c', 1, 'C', 4) # evicts b, the least recently used
+        self.assertEqual(cache.get('b', 1), None)
+        self.assertEqual(cache.get('c', 1), 'C')
+        self.assertEqual(cache.get('a', 2), None) # a stale version is dropped
+        self.assertEqual(cache.get('a', 1), None)
+        cache.put('d', 1, 'D', 11) # too big to cache
+        self.assertEqual(cache.get_stats(), {'hits': 2, 'misses': 3,
+            'evictions': 1, 'entries': 1, 'size': 4, 'max_size': 10})
+        cache.set_max_size(0)
+        self.assertEqual(len(cache), 0)
+
+    def testHits(self):
+        reader, symbols = self.__get_reader('Yahoo')
+        bars = reader.get_bars(symbols[0])
+        self.assertEqual(reader.get_cache_stats()['misses'], 1)
+        self.assertEqual(reader.get_bars(symbols[0]), bars)
+        self.assertEqual(reader.get_newest_bar(symbols[0]), bars[-1])
+        self.assertEqual(reader.get_oldest_bar(symbols[0]), bars[0])
+        stats = reader.get_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (3, 1))
+        self.assertEqual(stats['size'], len(bars) * barcache.BAR_SIZE)
+
+        # instruments and feeds share the cached histories
+        instrument = containers.Instrument(symbols[0], 'Name', 'Sector',
+                                           'Industry', reader)
+        self.assertEqual(len(instrument.get_data_series()), len(bars))
+        self.assertEqual(instrument.get_bar(), bars[-1])
+        self.assertEqual(reader.get_cache_stats()['hits'], 5)
+
+    def testSlices(self):
+        reader, symbols = self.__get_reader('Yahoo')
+        settings.HISTORY_CACHE_SIZE = 0
+        bars = reader.get_bars(symbols[1])
+        from_date_time = bars[10].get_date_time()
+        to_date_time = bars[-10].get_date_time()
+        bar_filters = [barfeed.DateRangeFilter(from_date_time, to_date_time),
+                       barfeed.DateRangeFilter(to_date=to_date_time),
+                       EvenDaysFilter()]
+        expected = []
+        for bar_filter in bar_filters:
+            reader.set_bar_filter(bar_filter)
+            expected.append(reader.get_bars(symbols[1]))
+        reader.set_bar_filter(None)
+        self.assertEqual(reader.get_cache_stats()['entries'], 0)
+
+        # the same bars get sliced from the cached history
+        settings.HISTORY_CACHE_SIZE = self.__cache_size
+        self.assertEqual(reader.get_bars(symbols[1]), bars)
+        self.assertEqual(reader.get_bars(symbols[1], from_date_time=from_date_time,
+            to_date_time=to_date_time), bars[10:-9])
+        for bar_filter, filtered_bars in zip(bar_filters, expected):
+            reader.set_bar_filter(bar_filter)
+            self.assertEqual(reader.get_bars(symbols[1]), filtered_bars)
+        self.assertEqual(reader.get_cache_stats()['misses'], 1)
+
+        # instruments' data series respect their bar filter
+        instrument = containers.Instrument(symbols[1], 'Name', 'Sector',
+                                           'Industry', reader)
+        data_series = instrument.get_data_series(bar_filter=EvenDaysFilter())
+        self.assertEqual(len(data_series), len(expected[2]))
+        self.assertTrue(all(data_series.get_value_absolute(i).get_date_time().day
+                            % 2 == 0 for i in xrange(len(data_series))))
+        self.assertEqual(len(instrument.get_data_series()), len(bars))
+
+    def testInvalidation(self):
+        reader, symbols = self.__get_reader('Yahoo')
+        bars = reader.get_bars(symbols[2])
+        file_path = reader._data_reader.get_file_path(symbols[2], bar.Frequency.DAY)
+        with open(file_path) as f:
+            rows = f.read().strip().split('\n')
+        with open(file_path, 'w') as f:
+            f.write('%s\n' % '\n'.join(rows[:-1]))
+        os.utime(file_path, (1, 1))
+        self.assertEqual(reader.get_bars(symbols[2]), bars[:-1])
+        self.assertEqual(reader.get_cache_stats()['misses'], 2)
+
+    def testSQLiteStore(self):
+        reader, symbols = self.__get_reader('SQLite')
+        bars = reader.get_bars_dict(symbols)
+        self.assertEqual(reader.get_bars_dict(symbols), bars)
+        stats = reader.get_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (3, 3))
+
+    def testFeedsGetTheirOwnBars(self):
+        # three sessions of four minute bars
+        reader, symbols = self.__get_reader('Yahoo')
+        provider = reader._data_reader
+        rows = [provider.get_csv_column_labels(bar.Frequency.MINUTE)]
+        for day_bar in reader.get_bars(symbols[0])[:3]:
+            for i in xrange(4):
+                rows.append(provider.bar_to_row(bar.Bar(day_bar.get_date_time()
+                    + datetime.timedelta(hours=10, minutes=i), day_bar.get_open(),
+                    day_bar.get_high(), day_bar.get_low(), day_bar.get_close(),
+                    day_bar.get_volume(), day_bar.get_close()), bar.Frequency.MINUTE))
+        with open(provider.get_file_path(symbols[0], bar.Frequency.MINUTE), 'w') as f:
+            f.write('%s\n' % '\n'.join(rows))
+        minute_bars = reader.get_bars(symbols[0], bar.Frequency.MINUTE)
+
+        def run_feed(bar_filter=None):
+            feed = instrumentfeed.Feed(bar.Frequency.MINUTE, bar_filter)
+            feed.add_bars_from_symbol(symbols[0])
+            feed.start()
+            return [(x[symbols[0]].get_session_close(),
+                     x[symbols[0]].get_bars_until_session_close()) for x in feed]
+
+        # a feed ending mid session closes it early, but only for its own bars
+        self.assertEqual(run_feed(barfeed.DateRangeFilter(
+            to_date=minute_bars[5].get_date_time()))[4:],
+            [(False, 1), (True, 0)])
+        session_closes = run_feed()
+        self.assertEqual([x[0] for x in session_closes], [False, False, False, True] * 3)
+        self.assertEqual(session_closes[4:6], [(False, None), (False, None)])
+        self.assertEqual(reader.get_cache_stats()['misses'], 2)
+
+def getTestCases():
+    ret = []
+    ret.append(BarCacheTestCase("testLRUCache"))
+    ret.append(BarCacheTestCase("testHits"))
+    ret.append(BarCacheTestCase("testSlices"))
+    ret.append(BarCacheTestCase("testInvalidation"))
+    ret.append(BarCacheTestCase("testSQLiteStore"))
+    ret.append(BarCacheTestCase("testFeedsGetTheirOwnBars"))
+    return ret
@@ -0,0 +1,150 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import os
+import gzip
+import shutil
+import datetime
+import tempfile
+import unittest
+
+from pytradelib import bar
+from pytradelib import settings
+from pytradelib.data import chunked
+from pytradelib.data import synthetic
+from pytradelib.data import providers
+from pytradelib.data.providers import ProviderFactory
+
+HEADER = 'Date,Open,High,Low,Close,Volume,Adj Close'
+
+
+class ChunkedTestCase(unittest.TestCase):
+    def setUp(self):
+        self.__dir = tempfile.mkdtemp()
+        self.__rows = synthetic.Generator(seed=1,
+            start_date=datetime.date(1995, 1, 2)).generate_rows('aaa', min_bars=5000)
+        self.__path = os.path.join(self.__dir, 'aaa.csv.gz')
+
+    def tearDown(self):
+        shutil.rmtree(self.__dir)
+
+    def __write(self, rows, codec='gz'):
+        with open(self.__path, 'wb') as f:
+            chunked.write(f, codec, HEADER, rows)
+
+    def testRoundTrip(self):
+        for codec in ['gz', 'lz4']:
+            self.__write(self.__rows, codec)
+            with open(self.__path, 'rb') as f:
+                self.assertTrue(chunked.is_chunked(f))
+                data = chunked.read(f)
+                index = chunked.read_index(f)
+            self.assertEqual(data, '\n'.join([HEADER] + self.__rows) + '\n')
+            self.assertEqual(index.codec, codec)
+            self.assertEqual(index.get_row_count(), len(self.__rows))
+            self.assertTrue(len(index.blocks) > 1)
+
+    def testAppendOnlyWritesNewRows(self):
+        self.__write(self.__rows[:-10])
+        with open(self.__path, 'rb') as f:
+            before = f.read()
+            index_offset = chunked.read_index(f).offset
+        with open(self.__path, 'r+b') as f:
+            self.assertEqual(chunked.get_last_key(f), self.__rows[-11][:10])
+            chunked.append(f, 'gz', self.__rows[-10:])
+        with open(self.__path, 'rb') as f:
+            after = f.read()
+            self.assertEqual(chunked.read_rows(f)[1], self.__rows)
+            self.assertEqual(chunked.get_last_key(f), self.__rows[-1][:10])
+        # the existing blocks weren't touched
+        self.assertEqual(after[:index_offset], before[:index_offset])
+
+    def testManySmallAppendsGetMerged(self):
+        self.__write(self.__rows[:-500])
+        for i in xrange(len(self.__rows) - 500, len(self.__rows)):
+            with open(self.__path, 'r+b') as f:
+                chunked.append(f, 'gz', self.__rows[i:i + 1])
+        with open(self.__path, 'rb') as f:
+            index = chunked.read_index(f)
+            self.assertEqual(chunked.read_rows(f)[1], self.__rows)
+        full_blocks = len(self.__rows) / chunked.BLOCK_ROWS
+        self.assertTrue(len(index.blocks) <= full_blocks + chunked.MAX_SMALL_BLOCKS)
+
+    def testDateRange(self):
+        self.__write(self.__rows)
+        from_key, to_key = self.__rows[1000][:10], self.__rows[1500][:10]
+        with open(self.__path, 'rb') as f:
+            header, rows = chunked.read_rows(f, from_key, to_key)
+        self.assertEqual(header, HEADER)
+        self.assertEqual(rows, self.__rows[1000:1501])
+
+    def testLegacyFilesGetConverted(self):
+        f = gzip.open(self.__path, 'wb')
+        f.write('\n'.join([HEADER] + self.__rows[:-1]) + '\n')
+        f.close()
+        with open(self.__path, 'r+b') as f:
+            self.assertFalse(chunked.is_chunked(f))
+            self.assertEqual(chunked.get_last_key(f, 'gz'), self.__rows[-2][:10])
+            chunked.append(f, 'gz', self.__rows[-1:])
+        with open(self.__path, 'rb') as f:
+            self.assertTrue(chunked.is_chunked(f))
+            self.assertEqual(chunked.read_rows(f)[1], self.__rows)
+
+
+class CompressedStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.__data_dir = settings.DATA_DIR
+        self.__compression = settings.DATA_COMPRESSION
+        settings.DATA_DIR = tempfile.mkdtemp()
+        settings.DATA_COMPRESSION = 'gz'
+
+    def tearDown(self):
+        shutil.rmtree(settings.DATA_DIR)
+        settings.DATA_DIR = self.__data_dir
+        settings.DATA_COMPRESSION = self.__compression
+
+    def testSaveAndUpdate(self):
+        provider = ProviderFactory.get_data_provider('yahoo')
+        files = providers.OpenFilesMixin()
+        rows = synthetic.Generator(seed=3,
+            start_date=datetime.date(2010, 1, 4)).generate_rows('aaa')
+        file_path = provider.get_file_path('aaa', bar.Frequency.DAY)
+        self.assertTrue(file_path.endswith('.csv.gz'))
+        context = {'symbol': 'aaa', 'frequency': bar.Frequency.DAY,
+                   'file_path': file_path}
+
+        initial = [HEADER] + rows[:-5]
+        [x for x in provider.save_data(
+            files.open_files_writeable([(initial, dict(context))]))]
+        # updates overlap the stored rows; only the new ones get appended
+        [x for x in provider.save_data(provider.update_data(
+            files.open_files_updatable([(rows[-20:], dict(context))])))]
+
+        with open(file_path, 'rb') as f:
+            self.assertEqual(chunked.read_rows(f)[1], rows)
+        symbol, bars = provider.rows_to_bars('aaa', rows, bar.Frequency.DAY, False)
+        self.assertEqual(len(bars), len(rows))
+
+def getTestCases():
+    ret = []
+    ret.append(ChunkedTestCase("testRoundTrip"))
+    ret.append(ChunkedTestCase("testAppendOnlyWritesNewRows"))
+    ret.append(ChunkedTestCase("testManySmallAppendsGetMerged"))
+    ret.append(ChunkedTestCase("testDateRange"))
+    ret.append(ChunkedTestCase("testLegacyFilesGetConverted"))
+    ret.append(CompressedStoreTestCase("testSaveAndUpdate"))
+    return ret
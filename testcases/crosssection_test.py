@@ -0,0 +1,171 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import shutil
+import datetime
+import tempfile
+import unittest
+
+import numpy as np
+
+from pytradelib import settings
+from pytradelib.data import db
+from pytradelib.data import synthetic
+from pytradelib.data import historical
+from pytradelib.data import crosssection
+
+
+class CrossSectionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.__data_dir = settings.DATA_DIR
+        self.__store_format = settings.DATA_STORE_FORMAT
+        settings.DATA_DIR = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(settings.DATA_DIR)
+        settings.DATA_DIR = self.__data_dir
+        settings.DATA_STORE_FORMAT = self.__store_format
+
+    def __populate(self, store_format):
+        settings.DATA_STORE_FORMAT = store_format
+        return synthetic.Generator(seed=6, start_date=datetime.date(2011, 1, 3)
+            ).populate(6, db=db.Database())
+
+    def __get_reader(self, store_format):
+        reader = historical.Reader()
+        reader.set_data_provider(store_format)
+        return reader
+
+    def testAssemble(self):
+        date_keys, matrices = crosssection.assemble(['a', 'b'],
+            [0, 1, 0], ['2013-01-03', '2013-01-02', '2013-01-02'],
+            {'close': [3.0, 2.0, 1.0]})
+        self.assertEqual(list(date_keys), ['2013-01-02', '2013-01-03'])
+        self.assertEqual(matrices['close'][0].tolist(), [1.0, 2.0])
+        self.assertEqual(matrices['close'][1, 0], 3.0)
+        self.assertTrue(np.isnan(matrices['close'][1, 1]))
+
+    def testMatchesBars(self):
+        symbols = self.__populate('Yahoo')
+        reader = self.__get_reader('yahoo')
+        bars = reader.get_bars_dict(symbols)
+        from_date_time = bars[symbols[0]][-60].get_date_time()
+        cross_section = reader.get_cross_section(symbols + ['zzz'],
+            from_date_time=from_date_time, fields=['close', 'adj_close', 'volume'])
+        self.assertEqual(cross_section.get_symbols(), symbols + ['zzz'])
+        self.assertEqual(cross_section.get_fields(), ['adj_close', 'close', 'volume'])
+        self.assertEqual(cross_section.get_date_times()[0], from_date_time)
+        self.assertEqual(len(cross_section), 60)
+        self.assertEqual(cross_section['close'].shape, (60, len(symbols) + 1))
+
+        for symbol in symbols:
+            closes = cross_section.get_symbol_values(symbol, 'close')
+            symbol_bars = dict((x.get_date_time(), x) for x in bars[symbol])
+            for date_time, close in zip(cross_section.get_date_times(), closes):
+                if date_time in symbol_bars:
+                    self.assertAlmostEqual(symbol_bars[date_time].get_close(), close)
+                else:
+                    self.assertTrue(np.isnan(close))
+            self.assertAlmostEqual(cross_section.get_last_values('volume')[
+                symbols.index(symbol)], bars[symbol][-1].get_volume())
+        # symbols without bars are all NaN
+        self.assertTrue(np.isnan(cross_section.get_symbol_values('zzz', 'close')).all())
+        self.assertTrue(np.isnan(cross_section.get_last_values('close')[-1]))
+
+    def testSQLiteMatchesTheFileStore(self):
+        symbols = self.__populate('Yahoo')
+        self.__populate('SQLite')
+        to_date_time = self.__get_reader('yahoo').get_bars(symbols[0])[-10].get_date_time()
+        file_cross_section = self.__get_reader('yahoo').get_cross_section(
+            symbols, to_date_time=to_date_time, fields=['open', 'volume'])
+        sqlite_cross_section = self.__get_reader('sqlite').get_cross_section(
+            to_date_time=to_date_time, fields=['open', 'volume'])
+        self.assertEqual(sqlite_cross_section.get_symbols(), symbols)
+        self.assertEqual(sqlite_cross_section.get_date_times(),
+                         file_cross_section.get_date_times())
+        self.assertEqual(sqlite_cross_section.get_date_times()[-1], to_date_time)
+        for field in ['open', 'volume']:
+            self.assertTrue(np.allclose(sqlite_cross_section[field],
+                file_cross_section[field], equal_nan=True))
+        self.assertEqual(self.__get_reader('sqlite').get_cross_section(
+            to_date_time=datetime.datetime(1990, 1, 1))['close'].shape, (0, 6))
+    def testFill(self):
+        nan = np.nan
+        matrix = np.array([[nan, 1.0, nan], [2.0, nan, nan], [nan, 3.0, 5.0]])
+        self.assertTrue(np.allclose(crosssection.fill(matrix.copy(), 'ffill'),
+            [[nan, 1, nan], [2, 1, nan], [2, 3, 5]], equal_nan=True))
+        self.assertTrue(np.allclose(crosssection.fill(matrix.copy(), 'bfill'),
+            [[2, 1, 5], [2, 3, 5], [nan, 3, 5]], equal_nan=True))
+        self.assertTrue(np.allclose(crosssection.fill(matrix.copy(), 0),
+            [[0, 1, 0], [2, 0, 0], [0, 3, 5]]))
+        self.assertTrue(np.allclose(crosssection.fill(matrix.copy(), None),
+            matrix, equal_nan=True))
+        self.assertRaises(ValueError, crosssection.fill, matrix, 'nearest')
+
+    def testPanel(self):
+        symbols = self.__populate('Yahoo')
+        reader = self.__get_reader('yahoo')
+        bars = reader.get_bars_dict(symbols)
+        from_date_time = bars[symbols[0]][-80].get_date_time()
+        to_date_time = bars[symbols[0]][-5].get_date_time()
+        panel = reader.get_panel([x.upper() for x in symbols] + ['zzz'],
+            from_date_time=from_date_time, to_date_time=to_date_time)
+        self.assertEqual(panel.get_symbols(), symbols + ['zzz'])
+        self.assertEqual(panel.get_fields(), sorted(crosssection.FIELDS))
+
+        # the panel is aligned exactly like a cross section
+        cross_section = reader.get_cross_section(symbols + ['zzz'],
+            from_date_time=from_date_time, to_date_time=to_date_time,
+            fields=crosssection.FIELDS)
+        self.assertEqual(panel.get_date_times(), cross_section.get_date_times())
+        self.assertEqual(panel.get_date_times()[-1], to_date_time)
+        for field in crosssection.FIELDS:
+            self.assertTrue(np.allclose(panel[field], cross_section[field],
+                                        equal_nan=True))
+
+        # filled in, the missing closes carry the last close forward and
+        # volumes are zero
+        filled = reader.get_panel(symbols, from_date_time=from_date_time,
+            to_date_time=to_date_time, fields=['close', 'volume'],
+            fill={'close': 'ffill', 'volume': 0})
+        closes = panel['close'][:, :-1]
+        for column in xrange(len(symbols)):
+            for row in xrange(len(closes)):
+                if not np.isnan(closes[row, column]):
+                    last_close = closes[row, column]
+                elif not np.isnan(closes[:row, column]).all():
+                    self.assertEqual(filled['close'][row, column], last_close)
+                    self.assertEqual(filled['volume'][row, column], 0)
+
+        # the SQLite store loads the same panel
+        self.__populate('SQLite')
+        sqlite_panel = self.__get_reader('sqlite').get_panel(symbols + ['zzz'],
+            from_date_time=from_date_time, to_date_time=to_date_time)
+        self.assertEqual(sqlite_panel.get_date_times(), panel.get_date_times())
+        for field in crosssection.FIELDS:
+            self.assertTrue(np.allclose(sqlite_panel[field], panel[field],
+                                        equal_nan=True))
+        self.assertEqual(reader.get_panel(['zzz'])['close'].shape, (0, 1))
+
+def getTestCases():
+    ret = []
+    ret.append(CrossSectionTestCase("testAssemble"))
+    ret.append(CrossSectionTestCase("testMatchesBars"))
+    ret.append(CrossSectionTestCase("testSQLiteMatchesTheFileStore"))
+    ret.append(CrossSectionTestCase("testFill"))
+    ret.append(CrossSectionTestCase("testPanel"))
+    return ret
@@ -0,0 +1,297 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+import gevent
+import numpy as np
+
+from pytradelib.data import db
+from pytradelib.data import synthetic
+
+
+def save_index(db_, index):
+    with db_.transaction():
+        db_.insert_or_update_sectors(list(index['sectors']))
+        db_.insert_or_update_industries([dict(x) for x in index['industries']])
+        db_.insert_or_update_symbols([dict(x) for x in index['symbols']])
+
+
+class DatabaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.__dir = tempfile.mkdtemp()
+        self.__db = db.Database(os.path.join(self.__dir, 'test.sqlite'))
+        self.__index = synthetic.Generator(seed=1).get_index(500)
+
+    def tearDown(self):
+        db.close_connection_managers(self.__dir)
+        shutil.rmtree(self.__dir)
+
+    def testSaveIndex(self):
+        save_index(self.__db, self.__index)
+        index = self.__db.get_index()
+        self.assertEqual(sorted(index['sectors']), sorted(self.__index['sectors']))
+        self.assertEqual(sorted(x['symbol'] for x in index['symbols']),
+                         sorted(x['symbol'] for x in self.__index['symbols']))
+        self.assertEqual(index['symbols'][0]['industry'],
+                         self.__index['symbols'][0]['industry'])
+
+    def testUpsert(self):
+        symbols = self.__index['symbols']
+        save_index(self.__db, {'sectors': self.__index['sectors'],
+                               'industries': self.__index['industries'],
+                               'symbols': symbols[::2]})
+        aaa_id = self.__db.get_symbol_id('aaa')
+
+        # existing and new rows in the same batch; rows without a name only
+        # update the columns they have
+        updates = [{'symbol': x['symbol']} for x in symbols[:10]]
+        updates[0]['name'] = 'Renamed'
+        self.__db.insert_or_update_symbols(updates + [dict(x) for x in symbols])
+
+        self.assertEqual(len(self.__db.get_symbols()), len(symbols))
+        self.assertEqual(self.__db.get_symbol_id('aaa'), aaa_id)
+        names = dict((x['symbol'], x['name']) for x in self.__db.get_index()['symbols'])
+        self.assertEqual(names['aaa'], symbols[0]['name'])
+        self.__db.insert_or_update_symbols([{'symbol': 'aab'}])
+        names = dict((x['symbol'], x['name']) for x in self.__db.get_index()['symbols'])
+        self.assertEqual(names['aab'], symbols[1]['name'])
+
+    def testUpsertWithoutOnConflict(self):
+        # SQLite < 3.24 updates and inserts rows separately
+        has_upsert = db.HAS_UPSERT
+        db.HAS_UPSERT = False
+        try:
+            self.testUpsert()
+            version = self.__db.get_index_version()
+            save_index(self.__db, self.__index)
+            self.assertEqual(self.__db.get_index_version(), version)
+            self.__db.insert_or_update_symbols([{'symbol': 'dup', 'name': 'A'},
+                                                {'symbol': 'dup', 'name': 'B'}])
+            self.assertEqual(self.__db.get_symbol_info('dup'), None) # no industry
+            self.assertEqual(self.__db._db.select_row(
+                "SELECT name FROM symbol WHERE symbol='dup'"), {'name': 'B'})
+            self.__db.insert_or_update_stats([{'symbol': 'aab', 'pe_ratio': 2.0}])
+            self.__db.insert_or_update_stats([{'symbol': 'aab', 'pe_ratio': 3.0}])
+            self.assertEqual(self.__db.get_stats(['pe_ratio'], row_type='tuple'),
+                             [('aab', 3.0)])
+            self.__db.set_index_updated()
+            self.assertTrue(self.__db.get_updated('symbol_index') is not None)
+        finally:
+            db.HAS_UPSERT = has_upsert
+
+    def testSymbolIds(self):
+        save_index(self.__db, self.__index)
+        new_id = self.__db.get_symbol_id('NEW')
+        self.assertEqual(self.__db.get_symbol_id('new'), new_id)
+        self.assertEqual(len(set(self.__db.get_symbol_id(x['symbol'])
+            for x in self.__index['symbols'])), len(self.__index['symbols']))
+
+    def testTransactionRollsBack(self):
+        save_index(self.__db, self.__index)
+        try:
+            with self.__db.transaction():
+                self.__db.get_symbol_id('new')
+                self.__db.insert_or_update_symbols([{'symbol': 'newer'}])
+                raise ValueError()
+        except ValueError:
+            pass
+        symbols = self.__db.get_symbols()
+        self.assertEqual(len(symbols), len(self.__index['symbols']))
+        self.assertFalse('new' in symbols or 'newer' in symbols)
+
+    def testConnectionProfile(self):
+        connection = sqlite3.connect(os.path.join(self.__dir, 'test.sqlite'))
+        self.assertEqual(connection.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(connection.execute('PRAGMA user_version').fetchone()[0],
+                         db.SCHEMA_VERSION)
+        indexes = [x[0] for x in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type='index'")]
+        self.assertTrue('symbol_industry_id_idx' in indexes)
+        connection.close()
+
+    def testMigration(self):
+        # make the database look like one created before schema versioning
+        save_index(self.__db, self.__index)
+        db_file_path = os.path.join(self.__dir, 'test.sqlite')
+        connection = sqlite3.connect(db_file_path)
+        for name, in connection.execute(
+          "SELECT name FROM sqlite_master WHERE name LIKE '%_idx'").fetchall():
+            connection.execute('DROP INDEX %s' % name)
+        for name, in connection.execute(
+          "SELECT name FROM sqlite_master WHERE type='trigger'").fetchall():
+            connection.execute('DROP TRIGGER %s' % name)
+        connection.execute('DROP TABLE index_version')
+        connection.execute('PRAGMA user_version=0')
+        connection.commit()
+        connection.close()
+
+        migrated = db.BaseDatabase(db_file_path)
+        self.assertEqual(migrated.get_schema_version(), db.SCHEMA_VERSION)
+        rows = migrated.select_rows("SELECT name FROM sqlite_master "
+            "WHERE type='index' AND name LIKE '%_idx'")
+        self.assertEqual(len(rows), 5)
+        migrated = db.Database(db_file_path)
+        self.assertEqual(len(migrated.get_symbols()), len(self.__index['symbols']))
+        version = migrated.get_index_version()
+        migrated.insert_or_update_symbols([{'symbol': 'new'}])
+        self.assertNotEqual(migrated.get_index_version(), version)
+
+    def testIndexVersion(self):
+        version = self.__db.get_index_version()
+        save_index(self.__db, self.__index)
+        self.assertNotEqual(self.__db.get_index_version(), version)
+
+        # upserting unchanged rows, stats and update times leave it alone
+        version = self.__db.get_index_version()
+        save_index(self.__db, self.__index)
+        self.__db.insert_or_update_stats([{'symbol': 'aab', 'pe_ratio': 1.0,
+            'name': self.__index['symbols'][1]['name']}])
+        self.__db.set_index_updated()
+        self.__db.set_symbol_updated([{'symbol_id': 1, 'day': '2013-01-02'}])
+        self.assertEqual(self.__db.get_index_version(), version)
+
+        # renaming, moving, adding or removing symbols changes it
+        for change in [
+          lambda: self.__db.insert_or_update_symbols(
+            [{'symbol': 'aab', 'name': 'Renamed'}]),
+          lambda: self.__db.insert_or_update_symbols(
+            [{'symbol': 'aab', 'industry': 'Industry 209'}]),
+          lambda: self.__db.get_symbol_id('new'),
+          lambda: self.__db.delete_symbol('new'),
+          lambda: self.__db.insert_or_update_sectors('Sector 99'),
+          ]:
+            change()
+            self.assertNotEqual(self.__db.get_index_version(), version)
+            version = self.__db.get_index_version()
+
+        # a database recreated at the same path has another index id
+        other = db.Database(os.path.join(self.__dir, 'other.sqlite'))
+        self.assertNotEqual(other.get_index_version()[0], version[0])
+
+    def testRecreatedFile(self):
+        save_index(self.__db, self.__index)
+        db_file_path = os.path.join(self.__dir, 'test.sqlite')
+        for suffix in ['', '-wal', '-shm']:
+            if os.path.exists(db_file_path + suffix):
+                os.remove(db_file_path + suffix)
+
+        # a new database at the same path connects to a new file
+        recreated = db.Database(db_file_path)
+        self.assertTrue(os.path.exists(db_file_path))
+        self.assertEqual(recreated.get_sectors(), [])
+        save_index(recreated, self.__index)
+        connection = sqlite3.connect(db_file_path)
+        self.assertEqual(connection.execute('SELECT COUNT(*) FROM sector'
+            ).fetchone()[0], len(self.__index['sectors']))
+        connection.close()
+
+        manager = db.get_connection_manager(db_file_path)
+        db.close_connection_managers(self.__dir)
+        self.assertFalse(manager.is_current())
+        self.assertTrue(db.get_connection_manager(db_file_path) is not manager)
+
+    def testSelectRowTypes(self):
+        save_index(self.__db, self.__index)
+        stats = [{'symbol': x['symbol'], 'pe_ratio': i * 0.5,
+                  'market_cap': None if i == 2 else 1e9}
+                 for i, x in enumerate(self.__index['symbols'])]
+        self.__db.insert_or_update_stats(stats)
+
+        dicts = self.__db.get_stats(['pe_ratio', 'market_cap'], row_type='dict')
+        self.assertEqual(dicts[1], {'symbol': 'aab', 'pe_ratio': 0.5,
+                                    'market_cap': 1e9})
+        tuples = self.__db.get_stats(['pe_ratio', 'market_cap'], row_type='tuple')
+        self.assertEqual(tuples[1], ('aab', 0.5, 1e9))
+        named = self.__db.get_stats(['pe_ratio', 'market_cap'], row_type='named')
+        self.assertEqual(named[1].symbol, 'aab')
+        self.assertEqual(named[1].pe_ratio, 0.5)
+
+        array = self.__db.get_stats(['pe_ratio', 'market_cap'])
+        self.assertEqual(len(array), len(stats))
+        self.assertEqual(array['pe_ratio'].dtype, np.float64)
+        self.assertEqual(list(array['symbol'][:2]), ['aaa', 'aab'])
+        self.assertTrue(np.isnan(array['market_cap'][2]))
+        self.assertEqual((array['pe_ratio'] > 100).sum(), len(stats) - 201)
+
+        # falsy values can be left out of dict rows
+        row = self.__db._db.select_row('SELECT symbol, stats.market_cap AS cap '
+            'FROM stats JOIN symbol ON (stats.symbol_id = symbol.symbol_id) '
+            'WHERE symbol=?', ('aac',))
+        self.assertEqual(row, {'symbol': 'aac', 'cap': None})
+        rows = self.__db._db.select_rows('SELECT stats.market_cap AS cap '
+            'FROM stats', include_none=False)
+        self.assertEqual(rows[2], {})
+
+    def testConcurrentAccess(self):
+        save_index(self.__db, self.__index)
+        symbols = [x['symbol'] for x in self.__index['symbols']]
+        db_file_path = os.path.join(self.__dir, 'test.sqlite')
+        errors = []
+
+        def write(offset):
+            # every writer uses its own Database, like the updaters do
+            db_ = db.Database(db_file_path)
+            try:
+                for i in xrange(offset, len(symbols), 4):
+                    db_.insert_or_update_stats([{'symbol': symbols[i], 'pe_ratio': i}])
+                    db_.get_symbol_id('new%i' % (i % 20)) # racing inserts
+                    gevent.sleep(0)
+            except Exception as e:
+                errors.append(e)
+
+        def read():
+            db_ = db.Database(db_file_path)
+            try:
+                for i in xrange(50):
+                    db_.get_stats(['pe_ratio'])
+                    gevent.sleep(0)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write, args=(i,)) for i in (0, 1)]
+        for thread in threads:
+            thread.start()
+        greenlets = [gevent.spawn(write, i) for i in (2, 3)] + \
+            [gevent.spawn(read) for i in xrange(3)]
+        gevent.joinall(greenlets)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        stats = self.__db.get_stats(['pe_ratio'], row_type='tuple')
+        self.assertEqual(sorted(x[1] for x in stats), range(len(symbols)))
+        self.assertEqual(len(self.__db.get_symbols()), len(symbols) + 20)
+
+def getTestCases():
+    ret = []
+    ret.append(DatabaseTestCase("testSaveIndex"))
+    ret.append(DatabaseTestCase("testUpsert"))
+    ret.append(DatabaseTestCase("testUpsertWithoutOnConflict"))
+    ret.append(DatabaseTestCase("testSymbolIds"))
+    ret.append(DatabaseTestCase("testTransactionRollsBack"))
+    ret.append(DatabaseTestCase("testConnectionProfile"))
+    ret.append(DatabaseTestCase("testMigration"))
+    ret.append(DatabaseTestCase("testIndexVersion"))
+    ret.append(DatabaseTestCase("testRecreatedFile"))
+    ret.append(DatabaseTestCase("testSelectRowTypes"))
+    ret.append(DatabaseTestCase("testConcurrentAccess"))
+    return ret
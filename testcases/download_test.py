@@ -0,0 +1,125 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import time
+import socket
+import datetime
+import unittest
+
+from pytradelib.data import standin
+from pytradelib.data import synthetic
+from pytradelib.utils import http
+
+
+class DownloaderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.__server = None
+
+    def tearDown(self):
+        self.__server.stop()
+
+    def __start(self, **kwargs):
+        self.__server = standin.Server(symbol_count=20, seed=1,
+            start_date=datetime.date(2013, 1, 1), **kwargs)
+        self.__server.start()
+        return self.__server
+
+    def __urls(self, count):
+        return [(self.__server.get_ichart_url() + '?s=%s' % synthetic.symbol_name(i),
+                 {'symbol': synthetic.symbol_name(i)}) for i in xrange(count)]
+
+    def testConnectionsGetReused(self):
+        self.__start()
+        downloader = http.Downloader(concurrency=4)
+        results = [x for x in downloader.imap(self.__urls(20))]
+        self.assertEqual(len(results), 20)
+        for data, context in results:
+            self.assertEqual(context['error'], None)
+            self.assertTrue(data.startswith('Date,'))
+        pool = downloader.get_pool('http', '127.0.0.1', self.__server.server_address[1])
+        self.assertTrue(pool.get_connections_opened() <= 4)
+        downloader.close()
+
+    def testResultsYieldedAsCompleted(self):
+        server = self.__start(latency=0.05)
+        downloader = http.Downloader(concurrency=2)
+        results = downloader.imap(self.__urls(10))
+        results.next()
+        self.assertTrue(server.get_stats()['requests'] < 10)
+        self.assertEqual(len([x for x in results]), 9)
+
+    def testTransientErrorsGetRetried(self):
+        server = self.__start(error_rates={'reset': 0.2, 'server_failed': 0.2})
+        downloader = http.Downloader(concurrency=5)
+        results = [x for x in downloader.imap(self.__urls(20))]
+        self.assertEqual(len([x for x in results if x[0]]), 20)
+        stats = server.get_stats()
+        self.assertTrue(stats['reset'] + stats['server_failed'] > 0)
+        self.assertEqual(stats['ok'], 20)
+
+    def testGiveUpAfterMaxRetries(self):
+        server = self.__start(error_rates={'reset': 1})
+        downloader = http.Downloader(
+            retry_policy=http.RetryPolicy(max_retries=2, base_delay=0.01))
+        data, context = downloader.download(self.__urls(1)[0][0])
+        self.assertEqual(data, None)
+        self.assertTrue('giving up after 2 retries' in context['error'])
+        self.assertEqual(context['retries'], 2)
+        self.assertEqual(server.get_stats()['reset'], 3)
+
+
+class RateLimiterTestCase(unittest.TestCase):
+    def testAdapts(self):
+        rate_limiter = http.RateLimiter(10, min_rate=1, max_rate=20)
+        rate_limiter.on_success(0.1)
+        self.assertAlmostEqual(rate_limiter.get_rate(), 10.1)
+        rate_limiter.on_error(throttled=True)
+        self.assertAlmostEqual(rate_limiter.get_rate(), 5.05)
+        rate_limiter.on_success(1.0) # way slower than usual
+        self.assertTrue(rate_limiter.get_rate() < 5.05)
+        for i in xrange(10):
+            rate_limiter.on_error(throttled=True)
+        self.assertEqual(rate_limiter.get_rate(), 1)
+        for i in xrange(1000):
+            rate_limiter.on_success(0.1)
+        self.assertEqual(rate_limiter.get_rate(), 20)
+
+    def testLimitsRate(self):
+        rate_limiter = http.RateLimiter(50, burst=1)
+        start = time.time()
+        for i in xrange(11):
+            rate_limiter.acquire()
+        self.assertTrue(time.time() - start >= 0.18)
+
+    def testBackoff(self):
+        policy = http.RetryPolicy(max_retries=3, base_delay=1, max_delay=5)
+        for attempt in xrange(5):
+            delay = policy.get_delay(attempt)
+            self.assertTrue(0 <= delay <= min(5, 2 ** attempt))
+        self.assertTrue(policy.is_retryable(socket.error('Connection reset by peer')))
+        self.assertFalse(policy.is_retryable(ValueError()))
+
+def getTestCases():
+    ret = []
+    ret.append(DownloaderTestCase("testConnectionsGetReused"))
+    ret.append(DownloaderTestCase("testResultsYieldedAsCompleted"))
+    ret.append(DownloaderTestCase("testTransientErrorsGetRetried"))
+    ret.append(DownloaderTestCase("testGiveUpAfterMaxRetries"))
+    ret.append(RateLimiterTestCase("testAdapts"))
+    ret.append(RateLimiterTestCase("testLimitsRate"))
+    ret.append(RateLimiterTestCase("testBackoff"))
+    return ret
@@ -0,0 +1,63 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import os
+import sys
+import subprocess
+import unittest
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def imported_modules(module):
+    # the modules loaded by importing module in a fresh interpreter
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT_DIR
+    output = subprocess.check_output([sys.executable, '-c',
+        'import sys, %s; print " ".join(sys.modules.keys())' % module], env=env)
+    return set(output.split())
+
+
+class ImportsTestCase(unittest.TestCase):
+    def testHeavyDependenciesAreLazy(self):
+        for module in ['pytradelib.strategy',
+                       'pytradelib.barfeed.instrumentfeed',
+                       'pytradelib.technical.talib',
+                       'pytradelib.screener']:
+            modules = imported_modules(module)
+            self.assertTrue(module in modules)
+            for dependency in ['gevent', 'matplotlib', 'talib', 'lz4']:
+                self.assertFalse(dependency in modules,
+                                 '%s imports %s' % (module, dependency))
+
+    def testSocketIsOnlyPatchedForDownloads(self):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = ROOT_DIR
+        output = subprocess.check_output([sys.executable, '-c',
+            'import gevent.monkey\n'
+            'from pytradelib import utils\n'
+            'print gevent.monkey.is_module_patched("socket")\n'
+            'utils.get_downloader()\n'
+            'print gevent.monkey.is_module_patched("socket")\n'], env=env)
+        self.assertEqual(output.split(), ['False', 'True'])
+
+def getTestCases():
+    ret = []
+    ret.append(ImportsTestCase("testHeavyDependenciesAreLazy"))
+    ret.append(ImportsTestCase("testSocketIsOnlyPatchedForDownloads"))
+    return ret
@@ -0,0 +1,146 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import os
+import shutil
+import datetime
+import tempfile
+import unittest
+
+from pytradelib import index
+from pytradelib import settings
+from pytradelib.data import db
+from pytradelib.data import indexsnapshot
+from pytradelib.data import synthetic
+
+
+class FactoryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.__data_dir = settings.DATA_DIR
+        settings.DATA_DIR = tempfile.mkdtemp()
+        self.__db = database = db.Database()
+        generated = synthetic.Generator(seed=0).get_index(250)
+        with database.transaction():
+            database.insert_or_update_sectors(generated['sectors'])
+            database.insert_or_update_industries(generated['industries'])
+            database.insert_or_update_symbols(generated['symbols'])
+            database.set_index_updated()
+
+    def tearDown(self):
+        shutil.rmtree(settings.DATA_DIR)
+        settings.DATA_DIR = self.__data_dir
+
+    def testInstrumentsLoadOnDemand(self):
+        factory = index.Factory()
+        instrument = factory.get_instrument('AAB')
+        self.assertEqual(instrument.symbol(), 'aab')
+        self.assertEqual(instrument.name(), 'AAB Corp.')
+        self.assertEqual(instrument.industry(), 'Industry 101')
+        self.assertEqual(instrument.sector(), 'Sector 01')
+        self.assertTrue(factory.get_instrument('aab') is instrument)
+        self.assertRaises(KeyError, factory.get_instrument, 'zzzz')
+        # the update manager (and its historical updater) is never needed
+        self.assertEqual(factory._Factory__update_manager, None)
+
+        instruments = factory.get_instruments()
+        self.assertEqual(len(instruments), 250)
+        self.assertTrue(instrument in instruments)
+        self.assertEqual(len(factory.symbols()), 250)
+        self.assertEqual(len(factory.sectors()), 10)
+        self.assertEqual(len(factory.industries()), 100)
+
+    def testSectorsAndIndustriesLoadOnDemand(self):
+        factory = index.Factory()
+        industry = factory.get_industry('Industry 100')
+        self.assertEqual(industry.sector(), 'Sector 01')
+        self.assertEqual(industry.symbols(), ['aaa', 'adw', 'ahs'])
+        self.assertRaises(KeyError, factory.get_industry, 'Industry 0')
+
+        sector = factory.get_sector('Sector 02')
+        self.assertEqual(sector.industries(),
+                         ['Industry %i' % x for x in xrange(200, 210)])
+        self.assertEqual(len(sector.symbols()), 30)
+        self.assertTrue(sector.get_industry('Industry 200') is
+                        factory.get_industry('Industry 200'))
+        self.assertTrue(sector.get_instrument('aak') is factory.get_instrument('aak'))
+    def testSnapshot(self):
+        self.assertEqual(indexsnapshot.load(self.__db), None)
+        self.assertTrue(indexsnapshot.save(self.__db))
+        snapshot = indexsnapshot.load(self.__db)
+        self.assertTrue(snapshot is not None)
+
+        # the snapshot answers the index queries exactly like the database
+        for database in [snapshot, self.__db]:
+            self.assertEqual(len(database.get_symbols()), 250)
+            self.assertEqual(len(database.get_sectors()), 10)
+            self.assertEqual(len(database.get_industries()), 100)
+        self.assertEqual(snapshot.get_symbol_infos(), self.__db.get_symbol_infos())
+        for symbol in ['aab', 'AHS', 'zzzz']:
+            self.assertEqual(snapshot.get_symbol_info(symbol),
+                             self.__db.get_symbol_info(symbol))
+        for industry in ['Industry 100', 'Industry 209', 'Industry 0']:
+            self.assertEqual(snapshot.get_symbol_infos(industry),
+                             self.__db.get_symbol_infos(industry))
+            self.assertEqual(snapshot.get_industry_sector(industry),
+                             self.__db.get_industry_sector(industry))
+        for sector in ['Sector 02', 'Sector 0']:
+            self.assertEqual(sorted(snapshot.get_sector_industries(sector)),
+                             sorted(self.__db.get_sector_industries(sector)))
+
+        factory = index.Factory()
+        self.assertEqual(factory.get_instrument('aab').industry(), 'Industry 101')
+        self.assertTrue(factory._Factory__index.__class__ is indexsnapshot.Snapshot)
+
+        # writing stats and update times keeps the snapshot current
+        self.__db.insert_or_update_stats([{'symbol': 'aab', 'pe_ratio': 10.0}])
+        self.__db.set_index_updated()
+        self.assertTrue(indexsnapshot.load(self.__db) is not None)
+
+        # changing the index makes it stale (and the factory falls back to the
+        # database) until the index gets saved again
+        self.__db.insert_or_update_symbols([{'symbol': 'new',
+                                             'industry': 'Industry 100'}])
+        self.assertEqual(indexsnapshot.load(self.__db), None)
+        factory = index.Factory()
+        self.assertTrue(factory.get_industry('Industry 100').get_instrument('new'))
+        self.assertEqual(len(factory.get_instruments()), 251)
+        self.assertTrue(factory._Factory__index is factory._Factory__db)
+        self.assertEqual(indexsnapshot.load(self.__db), None)
+        self.assertTrue(indexsnapshot.save(self.__db))
+        self.assertEqual(len(indexsnapshot.load(self.__db).get_symbols()), 251)
+
+    def testReadingDoesNotSaveSnapshots(self):
+        snapshot_path = indexsnapshot.get_snapshot_path(
+            self.__db.get_db_file_path())
+        factory = index.Factory()
+        self.assertEqual(len(factory.get_instruments()), 250)
+        self.assertFalse(os.path.exists(snapshot_path))
+
+    def testPopulateSavesSnapshot(self):
+        database = db.Database()
+        synthetic.Generator(seed=0, start_date=datetime.date(2012, 1, 2),
+            end_date=datetime.date(2013, 1, 2)).populate(3, db=database)
+        self.assertEqual(len(indexsnapshot.load(database).get_symbols()), 250)
+
+def getTestCases():
+    ret = []
+    ret.append(FactoryTestCase("testInstrumentsLoadOnDemand"))
+    ret.append(FactoryTestCase("testSectorsAndIndustriesLoadOnDemand"))
+    ret.append(FactoryTestCase("testSnapshot"))
+    ret.append(FactoryTestCase("testReadingDoesNotSaveSnapshots"))
+    ret.append(FactoryTestCase("testPopulateSavesSnapshot"))
+    return ret
@@ -0,0 +1,217 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import os
+import shutil
+import datetime
+import tempfile
+import unittest
+
+from pytradelib import bar
+from pytradelib import settings
+from pytradelib.data import db
+from pytradelib.data import safeio
+from pytradelib.data import barcache
+from pytradelib.data import synthetic
+from pytradelib.data import historical
+from pytradelib.data import parsedcache
+from pytradelib.utils import processes
+from pytradelib.data.providers import historical as providers_historical
+
+
+class ParsedCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.__data_dir = settings.DATA_DIR
+        self.__cache_size = settings.HISTORY_CACHE_SIZE
+        settings.DATA_DIR = tempfile.mkdtemp()
+        settings.HISTORY_CACHE_SIZE = 0 # so every read goes to the files
+        self.__symbols = synthetic.Generator(seed=5,
+            start_date=datetime.date(2012, 1, 3)).populate(3, db=db.Database())
+        self.__reader = historical.Reader()
+        self.__reader.set_data_provider('Yahoo')
+
+    def tearDown(self):
+        shutil.rmtree(settings.DATA_DIR)
+        settings.DATA_DIR = self.__data_dir
+        settings.HISTORY_CACHE_SIZE = self.__cache_size
+        barcache.get_cache().clear()
+
+    def __get_file_path(self, symbol):
+        return self.__reader._data_reader.get_file_path(symbol, bar.Frequency.DAY)
+
+    def __rewrite(self, file_path, data, mtime):
+        with open(file_path, 'wb') as f:
+            f.write(data)
+        os.utime(file_path, (mtime, mtime))
+
+    def testBars(self):
+        symbol = self.__symbols[0]
+        file_path = self.__get_file_path(symbol)
+        mtime = int(os.path.getmtime(file_path)) - 100 # (floats lose precision)
+        os.utime(file_path, (mtime, mtime))
+        bars = self.__reader.get_bars(symbol)
+        self.assertTrue(os.path.exists(parsedcache.get_parsed_path(file_path)))
+        self.assertEqual(self.__reader.get_bars(symbol), bars)
+        from_date_time = bars[5].get_date_time()
+        self.assertEqual(self.__reader.get_bars(symbol,
+            from_date_time=from_date_time), bars[5:])
+
+        # while the csv file's size and mtime match, it doesn't get parsed
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        self.__rewrite(file_path, data.replace('.', '5'), mtime)
+        self.assertEqual(self.__reader.get_bars(symbol), bars)
+
+        # with another mtime, the csv text's checksum gets compared
+        self.__rewrite(file_path, data, mtime + 10)
+        self.assertEqual(self.__reader.get_bars(symbol), bars)
+        rows = data.strip().split('\n')
+        rows[-1] = rows[-1][:-1] + ('1' if rows[-1][-1] != '1' else '2') # adj close
+        self.__rewrite(file_path, '%s\n' % '\n'.join(rows), mtime + 20)
+        new_bars = self.__reader.get_bars(symbol)
+        self.assertEqual(new_bars[:-1], bars[:-1])
+        self.assertNotEqual(new_bars[-1], bars[-1])
+
+    def testRecarrays(self):
+        symbols = self.__symbols
+        recarrays = self.__reader.get_recarrays(symbols)
+        for symbol, recarray in zip(symbols, recarrays):
+            loaded = self.__reader._data_reader.read_parsed(symbol,
+                                                            bar.Frequency.DAY)
+            self.assertEqual(loaded.dtype, recarray.dtype)
+            self.assertTrue((loaded == recarray).all())
+        # loaded recarrays match the parsed ones, and so do their bars
+        self.assertTrue(all((x == y).all() for x, y in
+                            zip(self.__reader.get_recarrays(symbols), recarrays)))
+        self.assertEqual(self.__reader._data_reader.recarray_to_bars(
+            recarrays[1], bar.Frequency.DAY), self.__reader.get_bars(symbols[1]))
+
+        # the parallel (panel) loader slices parsed files by date
+        date_times = recarrays[2].date.astype('M8[s]').tolist()
+        from_date_time, to_date_time = date_times[3], date_times[-3]
+        provider = self.__reader._data_reader
+        for parsed_cache in [False, True]:
+            recarray = provider.read_file_recarray(
+                self.__get_file_path(symbols[2]), bar.Frequency.DAY,
+                from_date_time, to_date_time, None, parsed_cache)
+            self.assertTrue((recarray == recarrays[2][3:-2]).all())
+
+    def testCorruptParsedFile(self):
+        symbol = self.__symbols[1]
+        bars = self.__reader.get_bars(symbol)
+        parsed_path = parsedcache.get_parsed_path(self.__get_file_path(symbol))
+        with open(parsed_path, 'r+b') as f:
+            f.seek(-8, 2)
+            f.write('garbage!')
+        self.assertEqual(self.__reader._data_reader.read_parsed(
+            symbol, bar.Frequency.DAY), None)
+        self.assertEqual(self.__reader.get_bars(symbol), bars)
+        self.assertTrue(self.__reader._data_reader.read_parsed(
+            symbol, bar.Frequency.DAY) is not None)
+
+        # the data store check leaves parsed files alone
+        self.assertEqual(safeio.check_data_store(), [])
+        self.assertTrue(os.path.exists(parsed_path))
+
+    def testMinuteBars(self):
+        # minute bars have no adj close column
+        provider = self.__reader._data_reader
+        symbol = self.__symbols[2]
+        day_bars = self.__reader.get_bars(symbol)[:50]
+        file_path = provider.get_file_path(symbol, bar.Frequency.MINUTE)
+        rows = [provider.get_csv_column_labels(bar.Frequency.MINUTE)]
+        for i, bar_ in enumerate(day_bars):
+            rows.append(provider.bar_to_row(bar.Bar(
+                bar_.get_date_time() + datetime.timedelta(hours=9, minutes=30 + i),
+                bar_.get_open(), bar_.get_high(), bar_.get_low(),
+                bar_.get_close(), bar_.get_volume(), bar_.get_close()),
+                bar.Frequency.MINUTE))
+        with open(file_path, 'w') as f:
+            f.write('%s\n' % '\n'.join(rows))
+
+        bars = self.__reader.get_bars(symbol, bar.Frequency.MINUTE)
+        self.assertEqual(len(bars), len(day_bars))
+        self.assertTrue(provider.read_parsed(symbol, bar.Frequency.MINUTE)
+                        is not None)
+        barcache.get_cache().clear()
+        self.assertEqual(self.__reader.get_bars(symbol, bar.Frequency.MINUTE), bars)
+        self.assertEqual([x.get_adj_close() for x in bars],
+                         [x.get_close() for x in bars])
+
+    def testConcurrentColdReads(self):
+        provider = self.__reader._data_reader
+        file_path = self.__get_file_path(self.__symbols[0])
+        parsed_path = parsedcache.get_parsed_path(file_path)
+        expected = provider.read_file_recarray(file_path, bar.Frequency.DAY)
+        args = (provider.name, self.__symbols[0], file_path, bar.Frequency.DAY,
+                None, None, None, True)
+        pool = processes.ProcessPool(8)
+        try:
+            for i in xrange(5):
+                if os.path.exists(parsed_path):
+                    os.remove(parsed_path)
+                # every worker parses the file and races to save it
+                for symbol, recarray in pool.imap(
+                  providers_historical.load_recarray, [args] * 8):
+                    self.assertTrue((recarray == expected).all())
+        finally:
+            pool.close()
+        self.assertTrue(parsedcache.load(file_path, expected.dtype) is not None)
+        self.assertEqual([x for x in os.listdir(os.path.dirname(file_path))
+                          if x.endswith(safeio.TEMP_SUFFIX)], [])
+
+    def testUnwritableCache(self):
+        symbol = self.__symbols[1]
+        file_path = self.__get_file_path(symbol)
+        bars = self.__reader.get_bars(symbol)
+        recarrays = self.__reader.get_recarrays([symbol])
+        barcache.get_cache().clear()
+        parsed_path = parsedcache.get_parsed_path(file_path)
+
+        # parsed files that can't be replaced (here by a directory in the
+        # way, which even root can't rename a file over) don't fail reads
+        os.remove(parsed_path)
+        os.mkdir(parsed_path)
+        with open(os.path.join(parsed_path, 'x'), 'w') as f:
+            f.write('x')
+        self.assertEqual(self.__reader.get_bars(symbol), bars)
+        self.assertTrue((self.__reader.get_recarrays([symbol])[0] ==
+                         recarrays[0]).all())
+        self.assertFalse(parsedcache.save(file_path, (0, 0), 0, recarrays[0]))
+        self.assertTrue(os.path.isdir(parsed_path))
+        shutil.rmtree(parsed_path)
+
+        # neither do directories temporary files can't be created in
+        symbols_dir = os.path.dirname(file_path)
+        os.chmod(symbols_dir, 0555)
+        try:
+            barcache.get_cache().clear()
+            self.assertEqual(self.__reader.get_bars(symbol), bars)
+        finally:
+            os.chmod(symbols_dir, 0755)
+        self.assertEqual([x for x in os.listdir(symbols_dir)
+                          if x.endswith(safeio.TEMP_SUFFIX)], [])
+
+def getTestCases():
+    ret = []
+    ret.append(ParsedCacheTestCase("testBars"))
+    ret.append(ParsedCacheTestCase("testRecarrays"))
+    ret.append(ParsedCacheTestCase("testCorruptParsedFile"))
+    ret.append(ParsedCacheTestCase("testMinuteBars"))
+    ret.append(ParsedCacheTestCase("testConcurrentColdReads"))
+    ret.append(ParsedCacheTestCase("testUnwritableCache"))
+    return ret
@@ -0,0 +1,89 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import unittest
+
+import gevent
+
+from pytradelib.utils import pipeline
+
+
+def double(items):
+    for item in items:
+        yield item * 2
+
+def slow(items):
+    for item in items:
+        gevent.sleep(0.01)
+        yield item
+
+
+class PipelineTestCase(unittest.TestCase):
+    def testStages(self):
+        pipeline_ = pipeline.Pipeline(queue_size=2)
+        pipeline_.add_stage('double', double)
+        pipeline_.add_stage('slow', slow)
+        self.assertEqual([x for x in pipeline_.run(xrange(10))],
+                         [x * 2 for x in xrange(10)])
+        metrics = pipeline_.get_metrics()
+        self.assertEqual([x['items'] for x in metrics], [10, 10])
+        # the slow stage is the bottleneck, which keeps the first one blocked
+        self.assertTrue(metrics[0]['blocked'] > metrics[0]['busy'])
+        self.assertTrue(metrics[1]['busy'] > metrics[1]['starved'])
+        self.assertTrue('items/sec' in pipeline_.format_metrics())
+
+    def testBackpressure(self):
+        produced = []
+        def producer(items):
+            for item in items:
+                produced.append(item)
+                yield item
+
+        pipeline_ = pipeline.Pipeline(queue_size=1)
+        pipeline_.add_stage('producer', producer)
+        pipeline_.add_stage('slow', slow)
+        results = pipeline_.run(xrange(100))
+        results.next()
+        # at most one item in each queue, one in each stage and the result
+        self.assertTrue(len(produced) <= 5)
+
+    def testErrorsGetRaised(self):
+        def fail(items):
+            for item in items:
+                if item == 5:
+                    raise ValueError('bad item')
+                yield item
+
+        pipeline_ = pipeline.Pipeline()
+        pipeline_.add_stage('fail', fail)
+        pipeline_.add_stage('double', double)
+        results = []
+        try:
+            for item in pipeline_.run(xrange(10)):
+                results.append(item)
+        except ValueError:
+            pass
+        else:
+            self.fail('the error should have been raised')
+        self.assertEqual(results, [0, 2, 4, 6, 8])
+
+def getTestCases():
+    ret = []
+    ret.append(PipelineTestCase("testStages"))
+    ret.append(PipelineTestCase("testBackpressure"))
+    ret.append(PipelineTestCase("testErrorsGetRaised"))
+    return ret
@@ -0,0 +1,129 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+import time
+import datetime
+import unittest
+
+import gevent
+
+from pytradelib import bar
+from pytradelib.data import synthetic
+from pytradelib.data.providers import ProviderFactory
+from pytradelib.data.providers import historical
+from pytradelib.utils import processes
+
+HEADER = 'Date,Open,High,Low,Close,Volume,Adj Close'
+
+
+def square(x):
+    return x * x
+
+def spin(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+    return seconds
+
+def fail():
+    raise ValueError('failed in a worker')
+
+
+class ProcessPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.__pool = processes.ProcessPool(2)
+
+    def tearDown(self):
+        self.__pool.close()
+
+    def testImap(self):
+        results = self.__pool.imap(square, [(x,) for x in range(20)])
+        self.assertEqual(sorted(results), [x * x for x in range(20)])
+
+    def testErrorsGetRaised(self):
+        self.assertRaises(ValueError, self.__pool.apply, fail)
+
+    def testHubKeepsRunning(self):
+        ticks = []
+        def tick():
+            while True:
+                ticks.append(time.time())
+                gevent.sleep(0.01)
+        ticker = gevent.spawn(tick)
+        gevent.sleep(0)
+        self.__pool.apply(spin, 0.5)
+        ticker.kill()
+        # the other greenlets ran while the worker was busy
+        self.assertTrue(len(ticks) > 10)
+
+
+class ParseDownloadTestCase(unittest.TestCase):
+    def setUp(self):
+        self.__rows = synthetic.Generator(seed=1,
+            start_date=datetime.date(2010, 1, 4)).generate_rows('aaa')
+        self.__context = {'symbol': 'zzzz', 'frequency': bar.Frequency.DAY,
+                          'error': None}
+
+    def __download(self, rows):
+        # yahoo serves the newest rows first
+        return '\n'.join([HEADER] + list(reversed(rows))) + '\n'
+
+    def testParse(self):
+        rows, context = historical.parse_download('yahoo', 'yahoo',
+            self.__download(self.__rows), dict(self.__context))
+        self.assertEqual(rows, self.__rows)
+        self.assertEqual(context['error'], None)
+
+    def testInvalidRows(self):
+        rows = list(self.__rows)
+        rows[3] = rows[3].rsplit(',', 2)[0] + ',abc,1.0'
+        result, context = historical.parse_download('yahoo', 'yahoo',
+            self.__download(rows), dict(self.__context))
+        self.assertEqual(result, None)
+        # line numbers count the stored (oldest first) rows, after the header
+        self.assertEqual(context['error'].keys(), ['5'])
+
+    def testVerifyRows(self):
+        provider = ProviderFactory.get_data_provider('yahoo')
+        self.assertTrue(provider.verify_rows(self.__rows, bar.Frequency.DAY))
+        for invalid in ['2010-01-04,10.00,9.00,8.00,9.50,1000,9.50', # high < open
+                        '2010-01-04,10.00,11.00,8.00,9.50,,9.50',
+                        '2010-01-04,10.00,11.00,8.00,9.50,1000']:
+            rows = self.__rows[:5] + [invalid] + self.__rows[5:]
+            self.assertFalse(provider.verify_rows(rows, bar.Frequency.DAY))
+
+    def testParseInWorkers(self):
+        provider = ProviderFactory.get_data_provider('yahoo')
+        pool = processes.ProcessPool(2)
+        try:
+            data_contexts = [(self.__download(self.__rows), dict(self.__context))
+                             for i in range(4)]
+            results = list(provider.parse_downloaded_data(
+                data_contexts, provider, pool))
+        finally:
+            pool.close()
+        self.assertEqual([rows for rows, context in results], [self.__rows] * 4)
+
+def getTestCases():
+    ret = []
+    ret.append(ProcessPoolTestCase("testImap"))
+    ret.append(ProcessPoolTestCase("testErrorsGetRaised"))
+    ret.append(ProcessPoolTestCase("testHubKeepsRunning"))
+    ret.append(ParseDownloadTestCase("testParse"))
+    ret.append(ParseDownloadTestCase("testInvalidRows"))
+    ret.append(ParseDownloadTestCase("testVerifyRows"))
+    ret.append(ParseDownloadTestCase("testParseInWorkers"))
+    return ret
@@ -0,0 +1,117 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import unittest
+import datetime
+
+from pytradelib import bar
+from pytradelib import barfeed
+from pytradelib import profiler
+from pytradelib import strategy
+
+
+class BuyAndSellStrategy(strategy.Strategy):
+    def __init__(self, feed):
+        strategy.Strategy.__init__(self, feed, 1000)
+        self.__bars = 0
+        self.__position = None
+
+    def on_bars(self, bars):
+        if self.__bars == 1:
+            self.__position = self.enter_long('ORCL', 10)
+        elif self.__bars == 6:
+            self.exit_position(self.__position)
+        self.__bars += 1
+
+
+def build_feed():
+    feed = barfeed.BarFeed(bar.Frequency.DAY)
+    bars = []
+    for i in range(10):
+        price = 10 + i % 4
+        bars.append(bar.Bar(datetime.datetime(2011, 1, 3) + datetime.timedelta(days=i),
+            price, price + 1, price - 1, price + 0.5, 1000, price + 0.5))
+    feed.add_bars_from_sequence('ORCL', bars)
+    return feed
+
+
+class ProfilerTestCase(unittest.TestCase):
+    def testPhaseTimers(self):
+        prof = profiler.Profiler(log_report=False)
+        prof.start()
+        feed_fn = prof.wrap(profiler.Phase.FEED, lambda x: x * 2)
+        for i in range(10):
+            prof.on_bars(None)
+            self.assertEqual(feed_fn(i), i * 2)
+        prof.stop()
+
+        report = prof.get_report()
+        self.assertEqual(report['bars'], 10)
+        self.assertEqual(report['phases'][profiler.Phase.FEED]['calls'], 10)
+        self.assertEqual(report['phases'][profiler.Phase.BROKER]['calls'], 0)
+        self.assertTrue(report['elapsed'] >= report['phases'][profiler.Phase.FEED]['total'])
+
+    def testExceptionsStillTimed(self):
+        prof = profiler.Profiler(log_report=False)
+        def fail():
+            raise ValueError()
+        self.assertRaises(ValueError, prof.wrap(profiler.Phase.STRATEGY, fail))
+        self.assertEqual(prof.get_timer(profiler.Phase.STRATEGY).get_calls(), 1)
+
+    def testProfileWindow(self):
+        prof = profiler.Profiler(profile_from_bar=2, profile_bars=3, log_report=False)
+        prof.start()
+        self.assertEqual(prof.get_profile_stats(), None)
+        for i in range(10):
+            prof.on_bars(None)
+        prof.stop()
+        self.assertNotEqual(prof.get_profile_stats(), None)
+        self.assertTrue('bars/sec' in prof.format_report())
+
+    def testStrategyRun(self):
+        strat = BuyAndSellStrategy(build_feed())
+        strat.run()
+
+        feed = build_feed()
+        profiled = BuyAndSellStrategy(feed)
+        prof = profiler.Profiler(log_report=False)
+        profiled.set_profiler(prof)
+        # Another subscriber that, like the strategy, comes after the broker.
+        feed.get_new_bars_event().subscribe(lambda bars: None)
+        handlers = feed.get_new_bars_event().get_handlers()
+        profiled.run()
+
+        self.assertEqual(profiled.get_result(), strat.get_result())
+        self.assertEqual(profiled.get_broker().get_cash(), strat.get_broker().get_cash())
+        self.assertNotEqual(strat.get_result(), 1000)
+        self.assertEqual(feed.get_new_bars_event().get_handlers(), handlers)
+        self.assertFalse('get_next_bars' in feed.__dict__)
+
+        report = prof.get_report()
+        self.assertEqual(report['bars'], 10)
+        for phase in profiler.Phase.ALL:
+            self.assertTrue(report['phases'][phase]['calls'] > 0, phase)
+            self.assertTrue(report['phases'][phase]['total'] > 0, phase)
+        self.assertTrue(report['elapsed'] > 0)
+
+def getTestCases():
+    ret = []
+    ret.append(ProfilerTestCase("testPhaseTimers"))
+    ret.append(ProfilerTestCase("testExceptionsStillTimed"))
+    ret.append(ProfilerTestCase("testProfileWindow"))
+    ret.append(ProfilerTestCase("testStrategyRun"))
+    return ret
@@ -0,0 +1,108 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import os
+import shutil
+import datetime
+import tempfile
+import unittest
+
+import numpy as np
+
+from pytradelib import bar
+from pytradelib import settings
+from pytradelib.data import db
+from pytradelib.data import synthetic
+from pytradelib.data import historical
+from pytradelib.data.providers import ProviderFactory
+
+
+class RecarrayTestCase(unittest.TestCase):
+    def setUp(self):
+        self.__data_dir = settings.DATA_DIR
+        self.__store_format = settings.DATA_STORE_FORMAT
+        settings.DATA_DIR = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(settings.DATA_DIR)
+        settings.DATA_DIR = self.__data_dir
+        settings.DATA_STORE_FORMAT = self.__store_format
+
+    def __get_reader(self, store_format):
+        settings.DATA_STORE_FORMAT = store_format
+        symbols = synthetic.Generator(seed=7, start_date=datetime.date(2012, 1, 3)
+            ).populate(3, db=db.Database())
+        reader = historical.Reader()
+        reader.set_data_provider(store_format)
+        return reader, symbols
+
+    def __assertMatchesBars(self, recarray, bars, date_field):
+        self.assertEqual(len(recarray), len(bars))
+        self.assertTrue((recarray[date_field] ==
+            np.array([x.get_date_time() for x in bars], 'M8[s]')).all())
+        for field in ['open', 'high', 'low', 'close', 'adj_close']:
+            np.testing.assert_allclose(recarray[field],
+                [getattr(x, 'get_%s' % field)() for x in bars])
+        self.assertEqual(recarray.volume.tolist(), [x.get_volume() for x in bars])
+
+    def testYahooStore(self):
+        reader, symbols = self.__get_reader('Yahoo')
+        recarray = reader.get_recarray(symbols[0])
+        self.assertEqual(recarray.dtype.names, ('date', 'open', 'high', 'low',
+            'close', 'volume', 'adj_close'))
+        self.assertEqual(recarray.dtype['date'], np.dtype('M8[D]'))
+        self.assertEqual(recarray.dtype['volume'], np.dtype(np.int64))
+        self.__assertMatchesBars(recarray, reader.get_bars(symbols[0]), 'date')
+
+        # memory-mapped, the recarrays are backed by .npy files
+        mmap_dir = os.path.join(settings.DATA_DIR, 'mmap')
+        os.mkdir(mmap_dir)
+        recarrays = reader.get_recarrays(symbols, mmap_dir=mmap_dir)
+        self.assertEqual(len(recarrays), len(symbols))
+        for symbol, recarray in zip(symbols, recarrays):
+            self.assertTrue(isinstance(recarray.base, np.memmap))
+            self.__assertMatchesBars(recarray, reader.get_bars(symbol), 'date')
+            loaded = np.load(os.path.join(mmap_dir, '%s_day.npy' % symbol))
+            self.assertTrue((loaded == recarray).all())
+
+    def testSQLiteStore(self):
+        reader, symbols = self.__get_reader('SQLite')
+        recarray = reader.get_recarray(symbols[1])
+        # the same fields as the file stores' for the same frequency
+        file_provider = ProviderFactory.get_data_provider('Yahoo')
+        self.assertEqual(recarray.dtype,
+                         file_provider.get_recarray_dtype(bar.Frequency.DAY))
+        self.assertEqual(recarray.dtype['date'], np.dtype('M8[D]'))
+        self.__assertMatchesBars(recarray, reader.get_bars(symbols[1]), 'date')
+        provider = ProviderFactory.get_data_provider('SQLite')
+        self.assertEqual(
+            provider.get_recarray_dtype(bar.Frequency.MINUTE).names[0],
+            file_provider.get_recarray_dtype(bar.Frequency.MINUTE).names[0])
+
+    def testMalformedRows(self):
+        provider = ProviderFactory.get_data_provider('Yahoo')
+        self.assertRaises(ValueError, provider.rows_to_recarray,
+            ['2013-01-02,1.0,2.0,0.5,1.5,100,1.5', '2013-01-03,1.0,2.0'],
+            bar.Frequency.DAY)
+        self.assertEqual(len(provider.rows_to_recarray([], bar.Frequency.DAY)), 0)
+
+def getTestCases():
+    ret = []
+    ret.append(RecarrayTestCase("testYahooStore"))
+    ret.append(RecarrayTestCase("testSQLiteStore"))
+    ret.append(RecarrayTestCase("testMalformedRows"))
+    return ret
@@ -0,0 +1,130 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+import os
+import shutil
+import datetime
+import tempfile
+import unittest
+
+from pytradelib.data import safeio
+from pytradelib.data import chunked
+from pytradelib.data import synthetic
+
+HEADER = 'Date,Open,High,Low,Close,Volume,Adj Close'
+
+
+class SafeIOTestCase(unittest.TestCase):
+    def setUp(self):
+        self.__dir = tempfile.mkdtemp()
+        self.__symbols_dir = os.path.join(self.__dir, 'symbols')
+        os.mkdir(self.__symbols_dir)
+        self.__rows = synthetic.Generator(seed=1,
+            start_date=datetime.date(2005, 1, 3)).generate_rows('aaa', min_bars=3000)
+        self.__path = os.path.join(self.__symbols_dir, 'aaa.csv')
+        self.__data = '\n'.join([HEADER] + self.__rows[:-10]) + '\n'
+        with open(self.__path, 'w') as f:
+            f.write(self.__data)
+
+    def tearDown(self):
+        shutil.rmtree(self.__dir)
+
+    def __read(self, path=None):
+        with open(path or self.__path, 'rb') as f:
+            return f.read()
+
+    def testAtomicFile(self):
+        f = safeio.AtomicFile(self.__path)
+        f.write('garbage')
+        # until it's closed (eg if we crash), the original file is untouched
+        self.assertEqual(self.__read(), self.__data)
+        self.assertTrue(safeio.recover(self.__path))
+        self.assertEqual(self.__read(), self.__data)
+        self.assertFalse(os.path.exists(self.__path + safeio.TEMP_SUFFIX))
+
+        with safeio.AtomicFile(self.__path) as f:
+            f.write('new data\n')
+        self.assertEqual(self.__read(), 'new data\n')
+
+    def testJournaledAppendRollsBack(self):
+        f = safeio.JournaledFile(self.__path)
+        f.seek(0, 2)
+        f.write('\n'.join(self.__rows[-10:]) + '\n')
+        f.flush()
+        self.assertNotEqual(self.__read(), self.__data)
+        # simulate a crash: the file never gets closed
+        self.assertTrue(safeio.recover(self.__path))
+        self.assertEqual(self.__read(), self.__data)
+        self.assertFalse(os.path.exists(self.__path + safeio.JOURNAL_SUFFIX))
+
+        with safeio.JournaledFile(self.__path) as f:
+            f.seek(0, 2)
+            f.write('\n'.join(self.__rows[-10:]) + '\n')
+        self.assertEqual(self.__read(), '\n'.join([HEADER] + self.__rows) + '\n')
+        self.assertFalse(os.path.exists(self.__path + safeio.JOURNAL_SUFFIX))
+
+    def testJournaledContainerAppendRollsBack(self):
+        path = os.path.join(self.__symbols_dir, 'aaa.csv.gz')
+        with safeio.AtomicFile(path, 'wb') as f:
+            chunked.write(f, 'gz', HEADER, self.__rows[:-10])
+        before = self.__read(path)
+
+        # appends rewrite the container's index (and sometimes its last blocks)
+        f = safeio.JournaledFile(path, 'r+b')
+        chunked.append(f, 'gz', self.__rows[-10:])
+        f.flush()
+        safeio.recover(path)
+        self.assertEqual(self.__read(path), before)
+
+        with safeio.JournaledFile(path, 'r+b') as f:
+            chunked.append(f, 'gz', self.__rows[-10:])
+        with open(path, 'rb') as f:
+            self.assertEqual(chunked.read_rows(f)[1], self.__rows)
+
+    def testCheckTail(self):
+        self.assertTrue(safeio.check_tail(self.__path))
+        with open(self.__path, 'a') as f:
+            f.write(self.__rows[-10][:15])
+        self.assertFalse(safeio.check_tail(self.__path, repair=False))
+        self.assertTrue(safeio.check_tail(self.__path))
+        self.assertEqual(self.__read(), self.__data)
+
+    def testCheckDataStore(self):
+        interrupted = safeio.JournaledFile(self.__path)
+        interrupted.seek(0, 2)
+        interrupted.write(self.__rows[-10])
+        interrupted.flush()
+
+        truncated = os.path.join(self.__symbols_dir, 'bbb.csv.gz')
+        with open(truncated, 'wb') as f:
+            chunked.write(f, 'gz', HEADER, self.__rows)
+        with open(truncated, 'r+b') as f:
+            f.truncate(os.path.getsize(truncated) - 5)
+
+        self.assertEqual(safeio.check_data_store(self.__dir), [truncated])
+        self.assertEqual(self.__read(), self.__data)
+        self.assertFalse(os.path.exists(truncated))
+        self.assertTrue(os.path.exists(truncated + safeio.CORRUPT_SUFFIX))
+        self.assertEqual(safeio.check_data_store(self.__dir), [])
+
+def getTestCases():
+    ret = []
+    ret.append(SafeIOTestCase("testAtomicFile"))
+    ret.append(SafeIOTestCase("testJournaledAppendRollsBack"))
+    ret.append(SafeIOTestCase("testJournaledContainerAppendRollsBack"))
+    ret.append(SafeIOTestCase("testCheckTail"))
+    ret.append(SafeIOTestCase("testCheckDataStore"))
+    return ret
@@ -0,0 +1,149 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import os
+import shutil
+import datetime
+import tempfile
+import unittest
+
+import numpy as np
+
+from collections import OrderedDict
+
+from pytradelib import barfeed
+from pytradelib import settings
+from pytradelib import screener
+from pytradelib.data import db
+from pytradelib.data import synthetic
+from pytradelib.data import historical
+from pytradelib.data import containers
+from pytradelib.data import crosssection
+from pytradelib.screener import Field, Value, Column
+
+
+class SwingScreener(screener.StockScreener):
+    def screen_columns(self):
+        swing = screener.abs_((Field('high') - Field('low')) / Field('low')) * 100
+        return OrderedDict([
+            ('Liquidity', Value('AverageDailyVolume') / (6.5 * 60)
+                          / screener.floor(10000 / Value('LastTradePriceOnly'))),
+            ('MeanPercentChange', screener.mean(swing)),
+            ('MedianPercentChange', screener.median(swing, window=20)),
+            ('LastClose', Field('close')),
+            ])
+
+    def screen_filter(self):
+        return Column('Liquidity') > 1
+
+    def csv_column_order(self):
+        return ['Symbol', 'Liquidity', 'MeanPercentChange', 'MedianPercentChange']
+
+    def csv_sort_column(self):
+        return 'MeanPercentChange'
+
+    def csv_sort_descending(self):
+        return True
+
+
+class ScreenerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.__data_dir = settings.DATA_DIR
+        settings.DATA_DIR = tempfile.mkdtemp()
+
+    def tearDown(self):
+        # bar filters are set on the (shared) store provider
+        historical.Reader().set_bar_filter(None)
+        db.close_connection_managers(settings.DATA_DIR)
+        shutil.rmtree(settings.DATA_DIR)
+        settings.DATA_DIR = self.__data_dir
+
+    def testRollingAndReductions(self):
+        matrix = np.array([[1.0, 4.0], [2.0, np.nan], [3.0, 6.0], [5.0, 8.0]])
+        cross_section = crosssection.CrossSection(
+            range(4), ['a', 'b'], {'close': matrix})
+        data = screener.ScreenData(cross_section, [])
+        close = Field('close')
+        rolling = screener.rolling_mean(close, 2).evaluate(data)
+        self.assertTrue(np.isnan(rolling[0]).all())
+        self.assertEqual(rolling[1:].tolist(), [[1.5, 4.0], [2.5, 6.0], [4.0, 7.0]])
+        self.assertEqual(screener.rolling_median(close, 3).evaluate(data)[-1].tolist(),
+                         [3.0, 7.0])
+        self.assertEqual(screener.pct_change(close).evaluate(data)[-1].tolist(),
+                         [5.0 / 3 - 1, 8.0 / 6 - 1])
+        self.assertEqual(screener.mean(close, window=2).evaluate(data).tolist(), [4.0, 7.0])
+        self.assertEqual(screener.count(close).evaluate(data).tolist(), [4, 3])
+        self.assertEqual(screener.last(close).evaluate(data).tolist(), [5.0, 8.0])
+        self.assertEqual((close * 2 + 1).get_fields(), set(['close']))
+        mask = ((screener.last(close) > 6) | (screener.minimum(close) < 1)).evaluate(data)
+        self.assertEqual(mask.tolist(), [False, True])
+
+    def testVectorizedScreen(self):
+        symbols = synthetic.Generator(seed=7, start_date=datetime.date(2011, 1, 3)
+            ).populate(8, db=db.Database())
+        reader = historical.Reader()
+        instruments = []
+        for i, symbol in enumerate(symbols + ['zzz']):
+            instrument = containers.Instrument(symbol, symbol.upper(),
+                                               'Sector', 'Industry', reader)
+            instrument.update_stats({symbol: {
+                'AverageDailyVolume': 10000000 * (i % 3),
+                'LastTradePriceOnly': 20.0}})
+            instruments.append(instrument)
+
+        from_date = datetime.datetime.now() - datetime.timedelta(days=90)
+        screen = SwingScreener('swings', instruments,
+                               bar_filter=barfeed.DateRangeFilter(from_date))
+        screen.run(save=True)
+
+        reader.set_bar_filter(barfeed.DateRangeFilter(from_date))
+        bars = reader.get_bars_dict(symbols)
+        # windows are the last dates of the cross section, not of each symbol
+        window_start = reader.get_cross_section(symbols,
+            from_date_time=from_date).get_date_times()[-20]
+        expected = []
+        for i, symbol in enumerate(symbols):
+            swings = [abs((x.get_high() - x.get_low()) / x.get_low()) * 100
+                      for x in bars[symbol]]
+            liquidity = 10000000 * (i % 3) / (6.5 * 60) / 500
+            instrument = screen.get_instrument(symbol)
+            self.assertAlmostEqual(instrument['Liquidity'], liquidity)
+            self.assertAlmostEqual(instrument['MeanPercentChange'], np.mean(swings))
+            self.assertAlmostEqual(instrument['MedianPercentChange'],
+                np.median([swing for swing, x in zip(swings, bars[symbol])
+                           if x.get_date_time() >= window_start]))
+            self.assertAlmostEqual(instrument['LastClose'], bars[symbol][-1].get_close())
+            if liquidity > 1:
+                expected.append((np.mean(swings), symbol))
+
+        # symbols without bars get None columns (and get sorted last)
+        self.assertEqual(screen.get_instrument('zzz')['MeanPercentChange'], None)
+        self.assertTrue(screen.get_instrument('zzz')['Liquidity'] > 1)
+        screened = [x.symbol() for x in screen.get_screened_instruments()]
+        self.assertEqual(screened,
+                         [x[1] for x in sorted(expected, reverse=True)] + ['zzz'])
+
+        with open(os.path.join(screen.data_folder(), 'swings.csv')) as f:
+            rows = f.read().strip().split('\r\n')
+        self.assertEqual(rows[0], 'Symbol,Liquidity,MeanPercentChange,MedianPercentChange')
+        self.assertEqual([x.split(',')[0] for x in rows[1:]], screened)
+
+def getTestCases():
+    ret = []
+    ret.append(ScreenerTestCase("testRollingAndReductions"))
+    ret.append(ScreenerTestCase("testVectorizedScreen"))
+    return ret
@@ -0,0 +1,159 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import shutil
+import datetime
+import tempfile
+import unittest
+
+from pytradelib import bar
+from pytradelib import settings
+from pytradelib.data import db
+from pytradelib.data import synthetic
+from pytradelib.data import historical
+from pytradelib.data.providers import ProviderFactory
+
+
+class SQLiteStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.__data_dir = settings.DATA_DIR
+        self.__store_format = settings.DATA_STORE_FORMAT
+        settings.DATA_DIR = tempfile.mkdtemp()
+
+    def tearDown(self):
+        db.close_connection_managers(settings.DATA_DIR)
+        shutil.rmtree(settings.DATA_DIR)
+        settings.DATA_DIR = self.__data_dir
+        settings.DATA_STORE_FORMAT = self.__store_format
+
+    def __populate(self, store_format, symbol_count=5):
+        settings.DATA_STORE_FORMAT = store_format
+        return synthetic.Generator(seed=4, start_date=datetime.date(2011, 1, 3)
+            ).populate(symbol_count, db=db.Database())
+
+    def __assertBarsEqual(self, bars, other_bars):
+        self.assertEqual(len(bars), len(other_bars))
+        for bar_, other_bar in zip(bars, other_bars):
+            self.assertEqual(bar_.get_date_time(), other_bar.get_date_time())
+            self.assertEqual(bar_.get_close(), other_bar.get_close())
+            self.assertEqual(bar_.get_adj_close(), other_bar.get_adj_close())
+            self.assertEqual(bar_.get_volume(), other_bar.get_volume())
+
+    def testMatchesTheFileStore(self):
+        symbols = self.__populate('Yahoo')
+        self.__populate('SQLite')
+        provider = ProviderFactory.get_data_provider('sqlite')
+        self.assertTrue(provider.symbol_initialized(symbols[0], bar.Frequency.DAY))
+        self.assertFalse(provider.symbol_initialized('zzz', bar.Frequency.DAY))
+
+        file_reader = historical.Reader()
+        file_reader.set_data_provider('yahoo')
+        reader = historical.Reader()
+        reader.set_data_provider('sqlite')
+        file_bars = file_reader.get_bars_dict(symbols)
+        sqlite_bars = reader.get_bars_dict(symbols)
+        self.assertEqual(sorted(sqlite_bars.keys()), symbols)
+        for symbol in symbols:
+            self.__assertBarsEqual(file_bars[symbol], sqlite_bars[symbol])
+
+        # date ranges (inclusive) are only a slice of the bars
+        all_bars = sqlite_bars[symbols[0]]
+        from_date_time = all_bars[100].get_date_time()
+        to_date_time = all_bars[130].get_date_time()
+        file_bars = file_reader.get_bars(symbols[0], None, from_date_time, to_date_time)
+        sqlite_bars = reader.get_bars(symbols[0], None, from_date_time, to_date_time)
+        self.__assertBarsEqual(file_bars, sqlite_bars)
+        self.__assertBarsEqual(file_bars, all_bars[100:131])
+
+        date_time = all_bars[-50].get_date_time()
+        file_bars = file_reader.get_bars_on_date(date_time, symbols)
+        sqlite_bars = reader.get_bars_on_date(date_time)
+        self.assertEqual(sorted(sqlite_bars.keys()), symbols)
+        for symbol in symbols:
+            self.__assertBarsEqual([file_bars[symbol]], [sqlite_bars[symbol]])
+        self.assertEqual(reader.get_bars_on_date(datetime.datetime(1990, 1, 1)), {})
+
+        self.assertEqual(reader.get_newest_bar(symbols[0]).get_date_time(),
+                         file_reader.get_newest_bar(symbols[0]).get_date_time())
+
+    def testUpdateOnlyAddsNewRows(self):
+        provider = ProviderFactory.get_data_provider('sqlite')
+        generator = synthetic.Generator(seed=5, start_date=datetime.date(2012, 1, 2))
+        yahoo = ProviderFactory.get_data_provider('yahoo')
+        symbol, bars = yahoo.rows_to_bars('aaa', generator.generate_rows('aaa'),
+                                          bar.Frequency.DAY, False)
+        rows = [provider.bar_to_row(x, bar.Frequency.DAY) for x in bars]
+        context = {'symbol': 'aaa', 'frequency': bar.Frequency.DAY}
+
+        initial = [provider.get_csv_column_labels(bar.Frequency.DAY)] + rows[:-5]
+        [x for x in provider.save_data([(initial, dict(context))])]
+        # updates overlap the stored rows; only the new ones get added
+        updated = [x for x in provider.save_data(provider.update_data(
+            [(rows[-20:], dict(context))]))]
+        self.assertEqual(updated[0]['to_date_time'], bars[-1].get_date_time())
+
+        [(stored, context)] = provider.read_rows([('aaa', dict(context))])
+        self.assertEqual(len(stored), len(rows))
+        self.__assertBarsEqual(
+            provider.rows_to_bars('aaa', stored, bar.Frequency.DAY, False)[1], bars)
+
+        # initializing again replaces the stored bars
+        [x for x in provider.save_data([(initial[:11], dict(context))])]
+        [(stored, context)] = provider.read_rows([('aaa', dict(context))])
+        self.assertEqual(len(stored), 10)
+
+    def testPricesReadBackExactly(self):
+        provider = ProviderFactory.get_data_provider('sqlite')
+        date_time = datetime.datetime(2013, 1, 2)
+        bars = [bar.Bar(date_time + datetime.timedelta(days=i),
+            0.30000000000000004 + i, 12.345678901234567 + i, 0.1 + i,
+            1.0 / 3 + i, 100, 2.0 / 3 + i) for i in range(3)]
+        rows = [provider.get_csv_column_labels(bar.Frequency.DAY)] + \
+            [provider.bar_to_row(x, bar.Frequency.DAY) for x in bars]
+        context = {'symbol': 'aaa', 'frequency': bar.Frequency.DAY}
+        [x for x in provider.save_data([(rows, dict(context))])]
+
+        [(stored, context)] = provider.read_rows([('aaa', dict(context))])
+        self.assertEqual(stored, rows[1:])
+        [(symbol, row)] = provider.get_database().get_date_rows(
+            bar.FrequencyToStr[bar.Frequency.DAY],
+            date_time.strftime(settings.DATE_FORMAT))
+        self.assertEqual(row, rows[1])
+        recarray = provider.rows_to_recarray(stored, bar.Frequency.DAY)
+        self.assertEqual(recarray.high.tolist(), [x.get_high() for x in bars])
+
+    def testQueriesUseTheIndexes(self):
+        database = ProviderFactory.get_data_provider('sqlite').get_database()
+        queries = [
+            ('SELECT * FROM bar WHERE symbol_id=? AND frequency=? '
+             'AND date_time >= ? AND date_time <= ?', (1, 'day', '2011', '2012')),
+            ('SELECT * FROM bar WHERE frequency=? AND date_time=?',
+             ('day', '2011-06-01 00:00:00')),
+            ]
+        with database.transaction() as connection:
+            for sql, params in queries:
+                plan = ' '.join(x[-1] for x in connection.execute(
+                    'EXPLAIN QUERY PLAN %s' % sql, params))
+                self.assertTrue(plan.startswith('SEARCH'), plan)
+
+def getTestCases():
+    ret = []
+    ret.append(SQLiteStoreTestCase("testMatchesTheFileStore"))
+    ret.append(SQLiteStoreTestCase("testUpdateOnlyAddsNewRows"))
+    ret.append(SQLiteStoreTestCase("testPricesReadBackExactly"))
+    ret.append(SQLiteStoreTestCase("testQueriesUseTheIndexes"))
+    return ret
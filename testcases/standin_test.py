@@ -0,0 +1,96 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import datetime
+import unittest
+
+try: import simplejson as json
+except: import json
+
+from pytradelib import bar
+from pytradelib import utils
+from pytradelib import settings
+from pytradelib.data import standin
+from pytradelib.utils import http
+from pytradelib.data.providers import ProviderFactory
+from pytradelib.data.providers import index
+
+
+class StandInTestCase(unittest.TestCase):
+    def __start(self, **kwargs):
+        self.__server = standin.Server(symbol_count=20, seed=1,
+            start_date=datetime.date(2012, 1, 2), **kwargs)
+        self.__server.start()
+        self.__server.install()
+        return self.__server
+
+    def tearDown(self):
+        self.__server.stop()
+        self.assertFalse(settings.YAHOO_ICHART_URL.startswith('http://127.0.0.1'))
+
+    def testHistoricalCsv(self):
+        server = self.__start()
+        provider = ProviderFactory.get_data_provider('yahoo')
+        context = {'frequency': bar.Frequency.DAY,
+                   'from_date_time': datetime.date(2013, 1, 1)}
+        data, context = utils.download(provider.get_url('aaa', context), context)
+        self.assertEqual(context['error'], None)
+        rows = data.strip().split('\n')
+        self.assertEqual(rows[0], 'Date,Open,High,Low,Close,Volume,Adj Close')
+        self.assertTrue(rows[1] > rows[-1]) # most recent first
+        self.assertTrue(rows[-1] >= '2013-01-01')
+        # every request for a symbol returns the same data
+        self.assertEqual(utils.download(provider.get_url('aaa', context))[0], data)
+
+        data, context = utils.download(provider.get_url('zzzz', context))
+        self.assertTrue('404' in context['error'])
+        self.assertEqual(server.get_stats()['ok'], 2)
+
+    def testYql(self):
+        self.__start()
+        url, context = index.Sectors().get_url()
+        sectors = json.loads(utils.download(url)[0])['query']['results']['sector']
+        self.assertEqual(len(sectors), 10)
+        url, context = index.Industries().get_url([100, 101])
+        industries = json.loads(utils.download(url)[0])['query']['results']['industry']
+        self.assertEqual([x['id'] for x in industries], ['100', '101'])
+        self.assertEqual(industries[0]['company']['symbol'], 'AAA')
+
+    def testFailures(self):
+        server = self.__start(error_rates={'404': 1})
+        data, context = utils.download(server.get_ichart_url() + '?s=aaa')
+        self.assertTrue('404' in context['error'])
+        self.assertEqual(server.get_stats()['404'], 1)
+        server.stop()
+
+        # throttled downloads back off and slow down until they get through
+        server = self.__start(max_requests_per_second=1)
+        downloader = http.Downloader(requests_per_second=20,
+            retry_policy=http.RetryPolicy(max_retries=10, base_delay=0.5))
+        for i in xrange(2):
+            data, context = downloader.download(server.get_ichart_url() + '?s=aaa')
+            self.assertNotEqual(data, None)
+        self.assertTrue(server.get_stats()['throttled'] >= 1)
+        rate_limiter = downloader.get_rate_limiter(server.get_url()[len('http://'):])
+        self.assertTrue(rate_limiter.get_rate() < 20)
+
+def getTestCases():
+    ret = []
+    ret.append(StandInTestCase("testHistoricalCsv"))
+    ret.append(StandInTestCase("testYql"))
+    ret.append(StandInTestCase("testFailures"))
+    return ret
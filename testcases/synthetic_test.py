@@ -0,0 +1,82 @@
+# This file is part of PyTradeLib.
+#
+# Copyright 2013 Brian A Cappello <briancappello at gmail>
+#
+# PyTradeLib is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyTradeLib is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyTradeLib.  If not, see http://www.gnu.org/licenses/
+
+import os
+import shutil
+import datetime
+import tempfile
+import unittest
+
+from pytradelib import bar
+from pytradelib import settings
+from pytradelib.data import db
+from pytradelib.data import synthetic
+from pytradelib.data.providers import ProviderFactory
+
+
+class SyntheticTestCase(unittest.TestCase):
+    def setUp(self):
+        self.__data_dir = settings.DATA_DIR
+        settings.DATA_DIR = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(settings.DATA_DIR)
+        settings.DATA_DIR = self.__data_dir
+
+    def testSymbolNames(self):
+        self.assertEqual(synthetic.symbol_name(0), 'aaa')
+        self.assertEqual(synthetic.symbol_name(27), 'abb')
+        names = [synthetic.symbol_name(i) for i in xrange(5000)]
+        self.assertEqual(len(set(names)), 5000)
+
+    def testRowsAreValidBars(self):
+        generator = synthetic.Generator(seed=1,
+            start_date=datetime.date(2000, 1, 3), split_probability=5)
+        provider = ProviderFactory.get_data_provider('yahoo')
+        for symbol in ['aaa', 'aab', 'aac']:
+            rows = generator.generate_rows(symbol)
+            self.assertTrue(len(rows) >= 250)
+            self.assertTrue(rows[0] < rows[-1])
+            symbol, bars = provider.rows_to_bars(symbol, rows, bar.Frequency.DAY, False)
+            self.assertNotEqual(bars, None)
+            # with that many splits the oldest close can't be the adjusted one
+            self.assertNotEqual(bars[0].get_close(), bars[0].get_adj_close())
+            self.assertEqual(bars[-1].get_close(), bars[-1].get_adj_close())
+
+    def testPopulate(self):
+        database = db.Database()
+        symbols = synthetic.Generator(seed=2,
+            start_date=datetime.date(2010, 1, 4)).populate(20, db=database)
+        self.assertEqual(len(symbols), 20)
+
+        index = database.get_index()
+        self.assertEqual(sorted(x['symbol'] for x in index['symbols']), symbols)
+        self.assertEqual(len(index['sectors']), 10)
+        self.assertNotEqual(database.get_updated('symbol_index'), None)
+        self.assertNotEqual(database.get_updated('day', symbols[0]), None)
+
+        writer = ProviderFactory.get_data_provider(settings.DATA_STORE_FORMAT)
+        for symbol in symbols:
+            self.assertTrue(os.path.exists(
+                writer.get_file_path(symbol, bar.Frequency.DAY)))
+
+def getTestCases():
+    ret = []
+    ret.append(SyntheticTestCase("testSymbolNames"))
+    ret.append(SyntheticTestCase("testRowsAreValidBars"))
+    ret.append(SyntheticTestCase("testPopulate"))
+    return ret